@@ -2,6 +2,7 @@ import os
 import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
 
@@ -40,6 +41,34 @@ with app.app_context():
     import models
     db.create_all()
     
+    # create_all skips columns and indexes added to tables that already exist
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logging.info(f"Added column {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    
+    # Build TradingStats rollups for databases that predate them
+    try:
+        from services.stats_rollup import stats_rollup
+        stats_rollup.ensure_unique_buckets()
+        stats_rollup.ensure_backfilled()
+    except Exception as e:
+        logging.error(f"Error backfilling stats rollups: {e}")
+    
+    # Full-text index for /api/logs/search
+    try:
+        from services.log_search import log_search
+        log_search.ensure_index()
+    except Exception as e:
+        logging.error(f"Error creating log search index: {e}")
+    
     # Initialize live trading simulator
     try:
         from services.live_trading_simulator import live_simulator
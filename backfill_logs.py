@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Archived Log Backfill
+Imports rotated strategy manager logs (strategy.log.N.gz) and trading bot
+container logs into the dashboard database
+
+Usage: python backfill_logs.py logs/archive/ [--workers 8]
+       python backfill_logs.py Yuva_bot.log.gz --user Yuva
+"""
+
+import argparse
+import logging
+import sys
+
+from app import app
+from services.log_archive import CHUNK_SIZE
+from services.log_backfill import LogBackfill
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import archived strategy and bot logs')
+    parser.add_argument('paths', nargs='+', help='log files (plain, .gz or .zst) or directories of them')
+    parser.add_argument('--user', help='user for bot logs whose file name does not name the container')
+    parser.add_argument('--workers', type=int, help='parser processes (default: one per CPU)')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_SIZE // (1024 * 1024), help='chunk size per task')
+    parser.add_argument('--close-after', type=int, default=300,
+                        help='seconds a position must be missing before the last scan to count as closed')
+    parser.add_argument('--force', action='store_true', help='re-import archives recorded as imported')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    backfill = LogBackfill(workers=args.workers, chunk_size=args.chunk_mb * 1024 * 1024,
+                           close_after=args.close_after)
+    try:
+        with app.app_context():
+            summary = backfill.run(args.paths, user=args.user, force=args.force)
+    except (ValueError, OSError) as e:
+        logging.error(f"Backfill failed: {e}")
+        sys.exit(1)
+
+    print(f"✅ Imported {summary['archives']} archives: {summary['lines']:,} lines, "
+          f"{summary['positions']} positions, {summary['status_blocks']} status blocks")
+
+
+if __name__ == '__main__':
+    main()
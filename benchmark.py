@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Trading Dashboard Benchmarks
+Measures throughput of the log and analytics hot paths on synthetic data
+
+Usage: python benchmark.py tokenizer [--lines 2000000]
+       python benchmark.py positions [--per-bot 500]
+       python benchmark.py risk [--trades 1000000] [--with-db]
+       python benchmark.py marks [--positions 200] [--symbols 20]
+       python benchmark.py backfill [--lines 4000000] [--workers N]
+       python benchmark.py logsearch [--entries 500000]
+"""
+
+import argparse
+import math
+import os
+import random
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SAMPLE_BLOCKS = [
+    [
+        "2025-08-05 07:19:05 - 🔴 Containers detected running - DISABLING API calls",
+        "2025-08-05 07:19:43 - Starting Trading Strategy Manager...",
+        "2025-08-05 07:19:43 - 🔄 LIVE TRADING DETECTED - STARTING FRESH MONITORING",
+        "2025-08-05 07:19:43 - 🚀 Live trading detected - starting monitoring from 07:19:43",
+    ],
+    [
+        "=== Current Status ===",
+        "2025-08-05 07:19:44 - BUY Coins Tracking: 2",
+        "2025-08-05 07:19:44 - -   AVAUSDT: Entry 0.5615 (Added: 2025-08-05 16:07:50)",
+        "2025-08-05 07:19:44 - -   STEEMUSDT: Entry 0.1343 (Added: 2025-08-05 16:08:15)",
+        "2025-08-05 07:19:44 - SELL Coins Tracking: 1",
+        "2025-08-05 07:19:44 - -   ZECUSDT: Entry 36.19 (Added: 2025-08-05 16:13:59)",
+        "2025-08-05 07:19:44 - BUY Success Count: 2",
+        "2025-08-05 07:19:44 - BUY Stop Loss Count: 1",
+        "2025-08-05 07:19:44 - SELL Success Count: 1",
+        "2025-08-05 07:19:44 - SELL Stop Loss Count: 0",
+        "2025-08-05 07:19:44 - Live Trade Success Count: 3",
+        "2025-08-05 07:19:44 - Live Trade Failure Count: 1",
+        "2025-08-05 07:19:44 - BUY Container Running: True",
+        "2025-08-05 07:19:44 - SELL Container Running: True",
+        "2025-08-05 07:19:44 - Waiting for BUY start: False",
+        "2025-08-05 07:19:44 - Waiting for SELL start: False",
+        "2025-08-05 07:19:44 - API Calls Enabled: False",
+        "2025-08-05 07:19:44 - Weekly Reset In Progress: False",
+        "2025-08-05 07:19:44 - Current IST Time: Tuesday 2025-08-05 16:19:44",
+        "2025-08-05 07:19:44 - Next Weekly Reset: Monday 2025-08-11 05:30:00 IST",
+    ],
+    [
+        "2025-08-05T07:19:44.123456789Z 🔄 Checking dynamic positions and orders",
+        "2025-08-05T07:19:44.123456789Z Fetching all open positions",
+        "2025-08-05T07:19:44.123456789Z 📈 Managing LONG position for AVAUSDT:",
+        "2025-08-05T07:19:44.123456789Z Position Size: 268.5",
+        "2025-08-05T07:19:44.123456789Z Entry Price: 0.5615128119181",
+        "2025-08-05T07:19:44.123456789Z Current Price: 0.5585000",
+        "2025-08-05T07:19:44.123456789Z Price Movement: 0.54%",
+        "2025-08-05T07:19:44.123456789Z ✅ Orders already correctly set for AVAUSDT",
+        "2025-08-05T07:19:44.123456789Z ⏰ Sleeping for 1 minute",
+    ],
+]
+
+
+def generate_lines(count, seed=42):
+    """Build a synthetic log mixing status blocks, events and position blocks"""
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < count:
+        lines.extend(rng.choice(SAMPLE_BLOCKS))
+    return lines[:count]
+
+
+# --- Classification as it was done before the shared tokenizer ---------------
+
+LEGACY_STATUS_PATTERNS = [
+    r'BUY Coins Tracking:', r'SELL Coins Tracking:', r'BUY Success Count:',
+    r'BUY Stop Loss Count:', r'SELL Success Count:', r'SELL Stop Loss Count:',
+    r'Live Trade Success Count:', r'Live Trade Failure Count:',
+    r'BUY Container Running:', r'SELL Container Running:',
+    r'Waiting for BUY start:', r'Waiting for SELL start:', r'API Calls Enabled:',
+    r'Weekly Reset In Progress:', r'Current IST Time:', r'Next Weekly Reset:'
+]
+
+LEGACY_POSITION_PATTERNS = {
+    'position_entry': r'📈 Managing (LONG|SHORT) position for ([A-Z]+USDT):',
+    'position_size': r'Position Size: ([\d.]+)',
+    'entry_price': r'Entry Price: ([\d.]+)',
+    'current_price': r'Current Price: ([\d.]+)',
+    'price_movement': r'Price Movement: ([\d.-]+)%',
+    'new_position': r'🆕 New position detected - Original size: ([\d.]+)',
+}
+
+LEGACY_STATUS_KEYS = [
+    'BUY Coins Tracking:', 'SELL Coins Tracking:', 'BUY Success Count:', 'BUY Stop Loss Count:',
+    'SELL Success Count:', 'SELL Stop Loss Count:', 'Live Trade Success Count:',
+    'Live Trade Failure Count:', 'BUY Container Running:', 'SELL Container Running:',
+    'API Calls Enabled:', 'Weekly Reset In Progress:', 'Current IST Time:', 'Next Weekly Reset:'
+]
+
+
+def legacy_log_reader(line):
+    match = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z)\s+(.+)$', line)
+    message = match.group(2) if match else line
+    message = re.sub(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - ', '', message)
+    if '🔴 Containers detected running - DISABLING API calls' in message:
+        return 'system_alert'
+    if 'Starting Trading Strategy Manager' in message:
+        return 'system_start'
+    if '🔄 LIVE TRADING DETECTED' in message:
+        return 'trading_mode'
+    if '🚀 Live trading detected' in message:
+        return 'monitoring_start'
+    if '=== Current Status ===' in message:
+        return 'status_header'
+    if any(re.search(pattern, message) for pattern in LEGACY_STATUS_PATTERNS):
+        return re.match(r'^(.+?):\s*(.+)$', message)
+    return 'general'
+
+
+def legacy_position_parser(line):
+    line = line.strip()
+    match = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z)', line)
+    if match:
+        line = line[len(match.group(1)):].strip()
+    for pattern in LEGACY_POSITION_PATTERNS.values():
+        found = re.search(pattern, line)
+        if found:
+            return found
+    return None
+
+
+def legacy_status_parser(line):
+    for key in LEGACY_STATUS_KEYS:
+        if key in line:
+            return key
+    if line.strip().startswith('-') and 'Entry' in line:
+        return 'coin'
+    return None
+
+
+def bench_tokenizer(args):
+    from services.log_tokenizer import tokenize
+
+    lines = generate_lines(args.lines)
+    print(f"📊 Classifying {len(lines):,} lines")
+
+    def run(label, passes):
+        started = time.perf_counter()
+        for line in lines:
+            for classify in passes:
+                classify(line)
+        elapsed = time.perf_counter() - started
+        print(f"   {label:<45} {elapsed:8.2f}s  {len(lines) / elapsed:>12,.0f} lines/sec")
+        return elapsed
+
+    before = run('before: three separate parsers', [legacy_log_reader, legacy_position_parser, legacy_status_parser])
+    after = run('after: shared single-pass tokenizer', [tokenize])
+    print(f"   speedup: {before / after:.1f}x")
+
+
+def use_scratch_database():
+    """Point the app at a throwaway SQLite file before it is imported"""
+    path = os.path.join(tempfile.mkdtemp(prefix='dashboard-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    return path
+
+
+def count_commits():
+    """Return a dict whose 'commits' entry counts session commits from now on"""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    counter = {'commits': 0}
+
+    @event.listens_for(Session, 'after_commit')
+    def _count(session):
+        counter['commits'] += 1
+
+    return counter
+
+
+def legacy_save_position(parser, symbol, side, data, user):
+    """Per-position select + commit, as EnhancedLogParser did before batching"""
+    from app import db
+    from models import TradingSession
+
+    existing_position = TradingSession.query.filter_by(user=user, symbol=symbol, status='OPEN').first()
+    if existing_position:
+        if 'current_price' in data:
+            existing_position.unrealized_pnl = parser._calculate_pnl(
+                existing_position.entry_price, data['current_price'],
+                existing_position.position_size, existing_position.side
+            )
+            existing_position.pnl = existing_position.unrealized_pnl
+        if 'price_movement' in data:
+            existing_position.notes = f"Price Movement: {data['price_movement']}%"
+        db.session.commit()
+    else:
+        position = TradingSession(
+            user=user, symbol=symbol, side=side,
+            entry_price=data.get('entry_price', 0), position_size=data.get('size', 0),
+            status='OPEN', trade_type='AUTO', strategy='Binance Futures Bot'
+        )
+        db.session.add(position)
+        db.session.commit()
+
+
+def bench_positions(args):
+    use_scratch_database()
+    from app import app, db
+    from models import TradingSession
+    from services.enhanced_log_parser import EnhancedLogParser
+
+    parser = EnhancedLogParser()
+    rng = random.Random(7)
+    users = ['Yuva', 'Shan']
+
+    def cycle(move):
+        positions = []
+        for user in users:
+            for i in range(args.per_bot):
+                entry = 1.0 + i / 1000
+                price = entry * (1 + rng.uniform(-0.05, 0.05)) if move else entry
+                positions.append((f'C{i}USDT', 'LONG', {
+                    'size': 100.0, 'entry_price': entry, 'current_price': price,
+                    'price_movement': round((price - entry) / entry * 100, 2)
+                }, user))
+        return positions
+
+    with app.app_context():
+        TradingSession.query.delete()
+        db.session.commit()
+        parser._save_positions(cycle(move=False))
+        counter = count_commits()
+        print(f"📊 One parse cycle over {args.per_bot} open positions per bot ({len(users)} bots)")
+
+        def run(label, save):
+            counter['commits'] = 0
+            started = time.perf_counter()
+            save()
+            elapsed = time.perf_counter() - started
+            print(f"   {label:<40} {elapsed * 1000:9.1f} ms  {counter['commits']:5d} commits")
+            return elapsed
+
+        prices = cycle(move=True)
+        before = run('before: select + commit per position',
+                     lambda: [legacy_save_position(parser, *p) for p in prices])
+        prices = cycle(move=True)
+        after = run('after: one query, bulk update, 1 commit', lambda: parser._save_positions(prices))
+        run('after: unchanged cycle (skipped rows)', lambda: parser._save_positions(prices))
+        print(f"   speedup: {before / after:.1f}x")
+
+
+def bench_marks(args):
+    use_scratch_database()
+    from app import app, db
+    from models import TradingSession
+    from services.enhanced_log_parser import EnhancedLogParser
+    from services.mark_to_market import mark_to_market
+
+    parser = EnhancedLogParser()
+    rng = random.Random(5)
+    symbols = [f'C{i}USDT' for i in range(args.symbols)]
+
+    with app.app_context():
+        TradingSession.query.delete()
+        db.session.add_all([
+            TradingSession(user='Yuva' if i % 2 else 'Shan', symbol=symbols[i % len(symbols)],
+                           side='LONG' if i % 3 else 'SHORT', entry_price=1.0 + i / 1000,
+                           position_size=100.0, status='OPEN')
+            for i in range(args.positions)
+        ])
+        db.session.commit()
+        counter = count_commits()
+        print(f"📊 One price tick over {args.positions} open positions in {len(symbols)} symbols")
+
+        def tick():
+            return {symbol: rng.uniform(0.9, 1.3) for symbol in symbols}
+
+        def legacy(prices):
+            # Per-row _calculate_pnl and a commit per position
+            for position in TradingSession.query.filter_by(status='OPEN').all():
+                position.unrealized_pnl = position.pnl = parser._calculate_pnl(
+                    position.entry_price, prices[position.symbol], position.position_size, position.side
+                )
+                db.session.commit()
+
+        def batched(prices):
+            mark_to_market.update_prices(prices)
+            mark_to_market.revalue(list(prices))
+            db.session.commit()
+
+        def run(label, revalue):
+            counter['commits'] = 0
+            prices = tick()
+            started = time.perf_counter()
+            revalue(prices)
+            elapsed = time.perf_counter() - started
+            print(f"   {label:<40} {elapsed * 1000:9.1f} ms  {counter['commits']:5d} commits")
+            return elapsed
+
+        before = run('before: per-position loop + commit', legacy)
+        after = run('after: vectorized, one UPDATE', batched)
+        print(f"   speedup: {before / after:.1f}x")
+
+
+def legacy_risk_metrics(trades):
+    """Per-object Python loop over closed trades, in the style of trading_analytics.py"""
+    equity = peak = max_drawdown = 0.0
+    wins = losses = win_streak = loss_streak = longest_win = longest_loss = 0
+    gross_profit = gross_loss = 0.0
+    daily = {}
+    for pnl, closed_at in trades:
+        equity += pnl
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, peak - equity)
+        if pnl > 0:
+            wins += 1
+            gross_profit += pnl
+            win_streak, loss_streak = win_streak + 1, 0
+        else:
+            if pnl < 0:
+                losses += 1
+                gross_loss -= pnl
+            win_streak, loss_streak = 0, loss_streak + 1
+        longest_win = max(longest_win, win_streak)
+        longest_loss = max(longest_loss, loss_streak)
+        day = closed_at.date()
+        daily[day] = daily.get(day, 0.0) + pnl
+
+    first, last = min(daily), max(daily)
+    series = [daily.get(first + timedelta(days=i), 0.0) for i in range((last - first).days + 1)]
+    mean = sum(series) / len(series)
+    std = math.sqrt(sum((x - mean) ** 2 for x in series) / (len(series) - 1))
+    downside = math.sqrt(sum(min(x, 0.0) ** 2 for x in series) / len(series))
+    return {
+        'total_pnl': equity, 'max_drawdown': max_drawdown,
+        'win_rate': wins / len(trades) * 100, 'expectancy': equity / len(trades),
+        'profit_factor': gross_profit / gross_loss,
+        'sharpe_ratio': mean / std * math.sqrt(365), 'sortino_ratio': mean / downside * math.sqrt(365),
+        'longest_win_streak': longest_win, 'longest_loss_streak': longest_loss
+    }
+
+
+def bench_risk(args):
+    import numpy as np
+
+    use_scratch_database()
+    from app import app, db
+    from models import TradingSession
+    from services.risk_metrics import compute_metrics, risk_metrics
+
+    rng = np.random.default_rng(11)
+    start = np.datetime64('2024-01-01T00:00:00', 'us')
+    offsets = np.sort(rng.integers(0, 2 * 365 * 86400, args.trades)) * 1_000_000
+    closed_at = start + offsets.astype('timedelta64[us]')
+    pnl = np.round(rng.normal(0.2, 5.0, args.trades), 2)
+    print(f"📊 Risk metrics over {args.trades:,} closed trades")
+
+    trades = list(zip(pnl.tolist(), closed_at.astype(datetime).tolist()))
+    started = time.perf_counter()
+    expected = legacy_risk_metrics(trades)
+    before = time.perf_counter() - started
+    print(f"   {'before: per-trade Python loop':<40} {before * 1000:9.1f} ms")
+
+    started = time.perf_counter()
+    metrics = compute_metrics(pnl, closed_at)
+    after = time.perf_counter() - started
+    print(f"   {'after: vectorized NumPy':<40} {after * 1000:9.1f} ms")
+    print(f"   speedup: {before / after:.1f}x")
+
+    for key, value in expected.items():
+        assert math.isclose(metrics[key], value, rel_tol=1e-6, abs_tol=1e-6), (key, metrics[key], value)
+
+    if args.with_db:
+        with app.app_context():
+            rows = [
+                {'user': 'Yuva' if i % 2 else 'Shan', 'symbol': 'BTCUSDT', 'side': 'LONG' if i % 3 else 'SHORT',
+                 'entry_price': 1.0, 'position_size': 1.0, 'pnl': value, 'status': 'CLOSED',
+                 'created_at': moment, 'closed_at': moment}
+                for i, (value, moment) in enumerate(trades)
+            ]
+            db.session.execute(TradingSession.__table__.insert(), rows)
+            db.session.commit()
+
+            started = time.perf_counter()
+            risk_metrics.load_closed_trades()
+            loaded = time.perf_counter() - started
+            started = time.perf_counter()
+            risk_metrics.get_user_risk('all')
+            total = time.perf_counter() - started
+            print(f"   {'single Core query into arrays':<40} {loaded * 1000:9.1f} ms")
+            print(f"   {'/api/risk/all/all end to end':<40} {total * 1000:9.1f} ms")
+
+
+def bench_backfill(args):
+    use_scratch_database()
+    from app import app
+    from services.log_backfill import LogBackfill
+    from services.log_tokenizer import tokenize
+
+    directory = tempfile.mkdtemp(prefix='dashboard-backfill-')
+    lines = generate_lines(args.lines)
+    paths = []
+    for name in ('strategy.log.1', 'Yuva_bot.log.1'):
+        paths.append(os.path.join(directory, name))
+        with open(paths[-1], 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    total = 2 * len(lines)
+    print(f"📊 Parsing {total:,} archived lines")
+
+    started = time.perf_counter()
+    for _ in paths:
+        for line in lines:
+            tokenize(line)
+    before = time.perf_counter() - started
+    print(f"   {'before: sequential tokenize':<40} {before:8.2f}s  {total / before:>12,.0f} lines/sec")
+
+    backfill = LogBackfill(workers=args.workers, chunk_size=args.chunk_mb * 1024 * 1024,
+                           state_dir=os.path.join(directory, '.backfill'))
+    with app.app_context():
+        archives = [(path, *backfill.archive_kind(path), backfill._fingerprint(path)) for path in paths]
+        _, parsed, after = backfill._parse_archives(archives)
+    label = f"after: chunked pool, {backfill.workers} workers"
+    print(f"   {label:<40} {after:8.2f}s  {parsed / after:>12,.0f} lines/sec")
+    print(f"   speedup: {before / after:.1f}x")
+
+
+def bench_logsearch(args):
+    use_scratch_database()
+    from app import app
+    from models import LogEntry
+    from services.log_entry_store import log_entries
+    from services.log_reader_service import LogReaderService
+    from services.log_search import log_search
+
+    reader = LogReaderService()
+    started_at = datetime(2025, 1, 1)
+    with app.app_context():
+        batch = []
+        lines = generate_lines(args.entries)
+        # A rare symbol, like looking up when one coin was tracked over months of logs
+        for i in range(0, len(lines), max(len(lines) // 20, 1)):
+            lines[i] = "2025-01-01 00:00:00 - -   NEEDLEUSDT: Entry 1.2345 (Added: 2025-01-01 00:00:00)"
+        for i, line in enumerate(lines):
+            moment = started_at + timedelta(seconds=15 * i)
+            batch.append(reader._parse_line(f"{moment.isoformat()}.000000000Z {line}"))
+            if len(batch) == 50_000:
+                log_entries.append('log-reader', batch)
+                batch = []
+        log_entries.append('log-reader', batch)
+        print(f"📊 Searching {LogEntry.query.count():,} stored log entries")
+
+        def legacy(term):
+            # Substring scan over every stored line, for the page and its total
+            query = LogEntry.query.filter(LogEntry.raw_message.ilike(f'%{term}%'))
+            return query.order_by(LogEntry.seq.desc()).limit(100).all(), query.count()
+
+        for term in ('NEEDLEUSDT', 'DISABLING'):
+            started = time.perf_counter()
+            legacy(term)
+            before = time.perf_counter() - started
+            started = time.perf_counter()
+            result = log_search.search(term, limit=100)
+            after = time.perf_counter() - started
+            print(f"   '{term}' ({result['total']:,} matches, with facets)")
+            print(f"      {'before: LIKE scan + count':<37} {before * 1000:9.1f} ms")
+            print(f"      {'after: full-text index':<37} {after * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Trading dashboard benchmarks')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    tokenizer = subparsers.add_parser('tokenizer', help='log line classification throughput')
+    tokenizer.add_argument('--lines', type=int, default=2_000_000)
+    tokenizer.set_defaults(func=bench_tokenizer)
+
+    positions = subparsers.add_parser('positions', help='position upserts per parse cycle')
+    positions.add_argument('--per-bot', type=int, default=500)
+    positions.set_defaults(func=bench_positions)
+
+    risk = subparsers.add_parser('risk', help='risk metrics over closed trades')
+    risk.add_argument('--trades', type=int, default=1_000_000)
+    risk.add_argument('--with-db', action='store_true', help='also time loading the trades from SQLite')
+    risk.set_defaults(func=bench_risk)
+
+    marks = subparsers.add_parser('marks', help='mark-to-market revaluation of open positions')
+    marks.add_argument('--positions', type=int, default=200)
+    marks.add_argument('--symbols', type=int, default=20)
+    marks.set_defaults(func=bench_marks)
+
+    backfill = subparsers.add_parser('backfill', help='archived log parse throughput')
+    backfill.add_argument('--lines', type=int, default=4_000_000, help='lines per archive')
+    backfill.add_argument('--workers', type=int, help='parser processes (default: one per CPU)')
+    backfill.add_argument('--chunk-mb', type=int, default=16)
+    backfill.set_defaults(func=bench_backfill)
+
+    logsearch = subparsers.add_parser('logsearch', help='full-text search over stored log entries')
+    logsearch.add_argument('--entries', type=int, default=500_000)
+    logsearch.set_defaults(func=bench_logsearch)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
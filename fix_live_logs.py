@@ -8,20 +8,22 @@ import docker
 import time
 from datetime import datetime
 
+from services.docker_client import docker_clients
+
 def test_live_log_streaming():
     """Test live log streaming from containers"""
     print("🔄 Testing live log streaming...")
     
     try:
-        client = docker.from_env()
-        client.ping()
+        if docker_clients.get() is None:
+            raise RuntimeError("no connection method reached the Docker daemon")
         print("✅ Docker connection successful")
         
         target_containers = ['Yuva_Positions_trading_bot', 'Shan_Positions_trading_bot', 'log-reader']
         
         for container_name in target_containers:
             try:
-                container = client.containers.get(container_name)
+                container = docker_clients.container(container_name)
                 print(f"\n📋 Testing {container_name}:")
                 print(f"   Status: {container.status}")
                 
@@ -68,13 +70,14 @@ def show_container_logs_sample():
     print("\n📋 Container Logs Analysis:")
     
     try:
-        client = docker.from_env()
+        if docker_clients.get() is None:
+            raise RuntimeError("Docker daemon is not reachable")
         
         containers = ['Yuva_Positions_trading_bot', 'Shan_Positions_trading_bot', 'log-reader']
         
         for container_name in containers:
             try:
-                container = client.containers.get(container_name)
+                container = docker_clients.container(container_name)
                 if container.status == 'running':
                     print(f"\n🔍 {container_name} (Recent logs):")
                     logs = container.logs(tail=10, timestamps=True).decode('utf-8')
@@ -7,7 +7,12 @@ backlog = 2048
 
 # Worker processes
 workers = 4
-worker_class = "sync"
+# Threaded workers so long-lived /api/stream (SSE) connections do not pin a whole worker.
+# Each open stream still holds one thread, so a worker accepts at most
+# STREAM_MAX_SUBSCRIBERS (default 8) of them and answers 503 past that, leaving
+# the other threads for page and API requests. Keep it below threads.
+worker_class = "gthread"
+threads = 16
 worker_connections = 1000
 timeout = 30
 keepalive = 2
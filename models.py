@@ -30,8 +30,10 @@ class TradingSession(db.Model):
     # Add indexes for better query performance
     __table_args__ = (
         Index('idx_user_created', 'user', 'created_at'),
+        Index('idx_created', 'created_at'),
         Index('idx_symbol_status', 'symbol', 'status'),
         Index('idx_user_side', 'user', 'side'),
+        Index('idx_user_status', 'user', 'status'),
     )
 
 class ContainerStatus(db.Model):
@@ -62,8 +64,76 @@ class TradingStats(db.Model):
     avg_win = db.Column(Float, default=0.0)
     avg_loss = db.Column(Float, default=0.0)
     max_drawdown = db.Column(Float, default=0.0)
+    # Running sums kept by the incremental rollups so rows can be combined exactly
+    losing_trades = db.Column(Integer, default=0)
+    gross_profit = db.Column(Float, default=0.0)
+    gross_loss = db.Column(Float, default=0.0)
+    peak_pnl = db.Column(Float, default=0.0)
     last_updated = db.Column(DateTime, default=datetime.utcnow)
     
     __table_args__ = (
-        Index('idx_user_period', 'user', 'period', 'period_date'),
+        # One row per bucket; the rollups upsert on it
+        Index('idx_user_period', 'user', 'period', 'period_date', unique=True),
+    )
+
+class StatusHistory(db.Model):
+    """Strategy manager status blocks over time, keyed by log time"""
+    id = db.Column(Integer, primary_key=True)
+    recorded_at = db.Column(DateTime, nullable=False)
+    status = db.Column(Text, nullable=False)  # JSON: the full block, or only the fields that differ from the keyframe
+    keyframe_at = db.Column(DateTime)  # recorded_at of the full block this row is a delta against; NULL for full blocks
+    
+    __table_args__ = (
+        Index('idx_status_recorded', 'recorded_at'),
+    )
+
+class PriceMark(db.Model):
+    """Mark prices and unrealized PnL of open positions as the bots report them"""
+    id = db.Column(Integer, primary_key=True)
+    symbol = db.Column(String(20), nullable=False)
+    user = db.Column(String(50), nullable=False)
+    side = db.Column(String(10), nullable=False)
+    recorded_at = db.Column(DateTime, nullable=False)
+    price = db.Column(Float, nullable=False)
+    unrealized_pnl = db.Column(Float)
+    
+    __table_args__ = (
+        Index('idx_mark_symbol_recorded', 'symbol', 'recorded_at'),
+        Index('idx_mark_user_symbol_recorded', 'user', 'symbol', 'recorded_at'),
+    )
+
+class PriceBar(db.Model):
+    """OHLC rollups of PriceMark per symbol at 1m, 1h and 1d resolution"""
+    id = db.Column(Integer, primary_key=True)
+    symbol = db.Column(String(20), nullable=False)
+    resolution = db.Column(String(5), nullable=False)  # '1m', '1h', '1d'
+    bucket_start = db.Column(DateTime, nullable=False)
+    open = db.Column(Float, nullable=False)
+    high = db.Column(Float, nullable=False)
+    low = db.Column(Float, nullable=False)
+    close = db.Column(Float, nullable=False)
+    marks = db.Column(Integer, default=0)
+    
+    __table_args__ = (
+        Index('idx_bar_symbol_resolution_start', 'symbol', 'resolution', 'bucket_start', unique=True),
+    )
+
+class LogEntry(db.Model):
+    """Parsed container log lines in log order; seq is the client cursor"""
+    seq = db.Column(Integer, primary_key=True)
+    container = db.Column(String(100), nullable=False)
+    logged_at = db.Column(DateTime, nullable=False)
+    docker_ts = db.Column(String(40))  # Docker RFC3339Nano timestamp, for exact resume
+    type = db.Column(String(30), nullable=False)
+    level = db.Column(String(20), nullable=False)
+    icon = db.Column(String(40))
+    message = db.Column(Text, nullable=False)
+    raw_message = db.Column(Text)
+    data = db.Column(Text)  # JSON of status_update fields
+    
+    __table_args__ = (
+        Index('idx_log_container_seq', 'container', 'seq'),
+        Index('idx_log_container_logged', 'container', 'logged_at'),
+        # Never reuse the seq of a deleted row, so cursors stay monotonic
+        {'sqlite_autoincrement': True},
     )
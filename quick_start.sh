@@ -31,7 +31,7 @@ source venv/bin/activate
 # Install dependencies
 echo "📥 Installing dependencies..."
 pip install --upgrade pip
-pip install flask flask-sqlalchemy gunicorn psycopg2-binary python-dotenv docker werkzeug
+pip install flask flask-sqlalchemy gunicorn numpy psycopg2-binary python-dotenv docker werkzeug
 
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then
@@ -1,13 +1,28 @@
-from flask import render_template, jsonify, request
+from flask import render_template, jsonify, request, Response, stream_with_context
 from app import app, db
 from models import TradingSession, ContainerStatus, TradingStats
 from services.docker_monitor import DockerMonitor
 from services.enhanced_log_parser import EnhancedLogParser
 from services.trading_analytics import TradingAnalytics
 from services.historical_analytics import historical_analytics
+from services.risk_metrics import risk_metrics
+from services.price_store import RESOLUTIONS, price_store
+from services.status_history import status_history
+from services.log_entry_store import log_entries
+from services.log_search import FACET_FIELDS, log_search
 from services.log_reader_service import LogReaderService
 from services.trading_status_service import TradingStatusService
+from services.ingestion_worker import IngestionWorker
+from services.log_upload import stream_log_upload
+from services.event_stream import EventBroker, DeltaPublisher, format_sse
+from services.data_version import etag_cached
+from services.docker_client import docker_clients
+from services.panel_composer import PanelComposer
+from services.single_flight import app_context
+from datetime import datetime, timedelta, timezone
+import json
 import logging
+import queue
 
 # Initialize services
 docker_monitor = DockerMonitor()
@@ -15,6 +30,8 @@ log_parser = EnhancedLogParser()
 trading_analytics = TradingAnalytics()
 log_reader_service = LogReaderService()
 trading_status_service = TradingStatusService()
+ingestion_worker = IngestionWorker(log_parser, trading_status_service, trading_analytics, log_reader_service)
+dashboard_composer = PanelComposer('dashboard', context=app_context)
 
 # Import coin info service
 try:
@@ -32,52 +49,145 @@ except ImportError as e:
     logging.warning(f"RealDockerService import failed: {e}")
     real_docker_service = None
 
+def _status_snapshot():
+    """Status counters pushed to the dashboard as 'status' deltas"""
+    status = trading_status_service.get_current_status()
+    counts = trading_status_service.get_trading_counts()
+    return {
+        'buy_success': counts['demo_counts']['buy_success'],
+        'buy_stop_loss': counts['demo_counts']['buy_stop_loss'],
+        'sell_success': counts['demo_counts']['sell_success'],
+        'sell_stop_loss': counts['demo_counts']['sell_stop_loss'],
+        'live_success': counts['live_counts']['success'],
+        'live_failure': counts['live_counts']['failure'],
+        'buy_coins': len(status.get('buy_coins_tracking', [])),
+        'sell_coins': len(status.get('sell_coins_tracking', [])),
+        'api_calls_enabled': status.get('api_calls_enabled', False),
+        'weekly_reset_in_progress': status.get('weekly_reset_in_progress', False),
+        'mode': status.get('mode', 'Demo')
+    }
+
+def _positions_snapshot():
+    """Open positions keyed by id, pushed as 'positions' deltas"""
+    with app.app_context():
+        try:
+            positions = {}
+            for position in trading_analytics.get_current_positions():
+                # The list is shared with other callers; don't mutate it
+                position = dict(position)
+                if coin_info_service:
+                    position['coin_name'] = coin_info_service.get_coin_name(position['symbol'])
+                positions[str(position['id'])] = position
+            return positions
+        finally:
+            db.session.remove()
+
+def _containers_snapshot():
+    """Container running state, pushed as 'containers' deltas"""
+    if not real_docker_service:
+        return {}
+    containers = real_docker_service.get_real_container_status()
+    return {
+        name: {'running': info.get('running', False), 'status': info.get('status', 'Unknown')}
+        for name, info in containers.items()
+    }
+
+event_broker = EventBroker()
+event_publisher = DeltaPublisher(event_broker, {
+    'status': _status_snapshot,
+    'positions': _positions_snapshot,
+    'containers': _containers_snapshot
+})
+# Container state changes are pushed as soon as their Docker event arrives
+if real_docker_service:
+    docker_clients.add_listener(
+        lambda event: event_publisher.poll(['containers']) if event_broker.subscriber_count else None
+    )
+# New log-reader lines are pushed as they arrive rather than diffed
+log_reader_service.streams['log-reader'].on_entry = lambda entry: event_broker.publish('log', entry)
+
+def _hour_bucket():
+    """Sliding period windows (today/week/...) move with the clock; revalidate hourly"""
+    return datetime.utcnow().strftime('%Y-%m-%d %H')
+
+def _price_window():
+    """Price windows without an explicit end move with the clock; revalidate per bar"""
+    if request.args.get('to'):
+        return None
+    return int(datetime.utcnow().timestamp() // RESOLUTIONS.get(request.args.get('res', '1m'), 60))
+
+def _parse_time(value):
+    """Naive UTC datetime from ISO 8601 or Unix seconds"""
+    try:
+        return datetime.utcfromtimestamp(float(value))
+    except ValueError:
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if moment.tzinfo:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return moment
+
+def _dashboard_state():
+    """Non-database inputs of the dashboard page"""
+    trading_status_service.get_current_status()
+    containers = real_docker_service.get_status_version() if real_docker_service else None
+    return (trading_status_service.status_version, containers, log_reader_service.streams['log-reader'].last_ts)
+
+@app.before_request
+def start_ingestion_worker():
+    """Make sure this process runs (or competes for) the ingestion loop"""
+    ingestion_worker.ensure_started()
+
+def _dashboard_containers():
+    """Container statuses and their summary for the dashboard"""
+    if real_docker_service:
+        containers = real_docker_service.get_real_container_status()
+        return containers, real_docker_service.get_container_summary(containers)
+    return docker_monitor.get_container_status(), {}
+
+def _dashboard_trading_status(status=None):
+    """Real-time trading status panel, for the current status unless one is given"""
+    status = status or trading_status_service.get_current_status()
+    return {
+        'status': status,
+        'mode_indicator': trading_status_service.get_mode_indicator(status),
+        'container_status': trading_status_service.get_container_status_summary(status),
+        'trading_counts': trading_status_service.get_trading_counts(status)
+    }
+
 @app.route('/')
+@etag_cached(_dashboard_state, _hour_bucket, scopes=('trades', 'marks'))
 def dashboard():
     """Enhanced dashboard route"""
     try:
-        # Get real container statuses
-        if real_docker_service:
-            containers = real_docker_service.get_real_container_status()
-            container_summary = real_docker_service.get_container_summary()
-        else:
-            containers = docker_monitor.get_container_status()
-            container_summary = {}
-        
-        # Get trading statistics
-        yuva_stats = trading_analytics.get_user_stats('Yuva')
-        shan_stats = trading_analytics.get_user_stats('Shan')
-        
-        # Get recent trading sessions (increased limit)
-        recent_trades = TradingSession.query.order_by(TradingSession.created_at.desc()).limit(50).all()
-        
-        # Get current positions
-        current_positions = trading_analytics.get_current_positions()
-        
-        # Parse latest logs for real-time data
-        log_parser.parse_latest_logs()
-        
-        # Get trading summary from log-reader
-        trading_summary = log_reader_service.get_trading_summary()
-        
-        # Get real-time trading status
-        trading_status = trading_status_service.get_current_status()
-        mode_indicator = trading_status_service.get_mode_indicator()
-        container_status = trading_status_service.get_container_status_summary()
-        trading_counts = trading_status_service.get_trading_counts()
+        values, panel_states = dashboard_composer.compose({
+            'containers': (_dashboard_containers, ({}, {})),
+            'user_stats': (lambda: trading_analytics.get_users_stats(['Yuva', 'Shan']), {'Yuva': {}, 'Shan': {}}),
+            # Recent trading sessions (increased limit)
+            'recent_trades': (
+                lambda: TradingSession.query.order_by(TradingSession.created_at.desc()).limit(50).all(), []
+            ),
+            'current_positions': (trading_analytics.get_current_positions, []),
+            'trading_summary': (log_reader_service.get_trading_summary, {}),
+            'trading_status': (_dashboard_trading_status,
+                               _dashboard_trading_status(trading_status_service.empty_status()))
+        })
+        containers, container_summary = values['containers']
+        user_stats = values['user_stats']
+        trading_status = values['trading_status']
         
         return render_template('phoenix_dashboard.html',
                              containers=containers,
                              container_summary=container_summary,
-                             yuva_stats=yuva_stats,
-                             shan_stats=shan_stats,
-                             recent_trades=recent_trades,
-                             current_positions=current_positions,
-                             trading_summary=trading_summary,
-                             trading_status=trading_status,
-                             mode_indicator=mode_indicator,
-                             container_status=container_status,
-                             trading_counts=trading_counts,
+                             yuva_stats=user_stats['Yuva'],
+                             shan_stats=user_stats['Shan'],
+                             recent_trades=values['recent_trades'],
+                             current_positions=values['current_positions'],
+                             trading_summary=values['trading_summary'],
+                             trading_status=trading_status['status'],
+                             mode_indicator=trading_status['mode_indicator'],
+                             container_status=trading_status['container_status'],
+                             trading_counts=trading_status['trading_counts'],
+                             panel_states=panel_states,
                              coin_info=coin_info_service)
     except Exception as e:
         logging.error(f"Dashboard error: {e}")
@@ -110,11 +220,13 @@ def api_container_status():
         return jsonify([])
 
 @app.route('/api/trading-stats')
+@etag_cached(scopes=('trades', 'marks'))
 def api_trading_stats():
     """API endpoint for trading statistics"""
     try:
-        yuva_stats = trading_analytics.get_user_stats('Yuva')
-        shan_stats = trading_analytics.get_user_stats('Shan')
+        user_stats = trading_analytics.get_users_stats(['Yuva', 'Shan'])
+        yuva_stats = user_stats['Yuva']
+        shan_stats = user_stats['Shan']
         
         return jsonify({
             'yuva': yuva_stats,
@@ -135,14 +247,40 @@ def api_logs():
         return jsonify([])
 
 @app.route('/api/trade-history/<period>')
+@etag_cached(_hour_bucket, scopes=('trades', 'marks'))
 def api_trade_history(period):
-    """API endpoint for trade history by period"""
+    """
+    API endpoint for trade history by period, newest first.
+    
+    Returns one page of `limit` trades (default 100, max 1000) and a
+    `next_cursor` to pass back as `cursor`. With `format=ndjson` the whole
+    range is streamed one trade per line instead. Optional filters: user,
+    symbol, side, status.
+    """
+    filters = {field: request.args.get(field) for field in trading_analytics.TRADE_HISTORY_FILTERS}
+    cursor = request.args.get('cursor')
+    try:
+        if cursor:
+            trading_analytics.decode_cursor(cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        def generate():
+            try:
+                for trade in trading_analytics.iter_trade_history(period, cursor, **filters):
+                    yield json.dumps(trade) + '\n'
+            except Exception as e:
+                logging.error(f"Trade history stream error: {e}")
+        
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
     try:
-        trades = trading_analytics.get_trade_history_by_period(period)
-        return jsonify(trades)
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+        return jsonify(trading_analytics.get_trade_history_page(period, limit, cursor, **filters))
     except Exception as e:
         logging.error(f"Trade history API error: {e}")
-        return jsonify([])
+        return jsonify({'trades': [], 'next_cursor': None, 'limit': 0})
 
 @app.route('/upload-logs', methods=['GET', 'POST'])
 def upload_logs():
@@ -157,22 +295,18 @@ def upload_logs():
         
         if file:
             try:
-                # Read file content
-                content = file.read().decode('utf-8')
-                
-                # Save to logs directory
-                import os
-                os.makedirs('logs', exist_ok=True)
-                
-                with open('logs/strategy.log', 'w') as f:
-                    f.write(content)
-                
-                # Parse the logs immediately to update status
-                trading_status_service.parse_status_from_logs(content)
+                # Stream to the logs directory (plain, gzip or zstd), parsing
+                # the status as lines are written
+                log_path = trading_status_service.upload_path()
+                lines = stream_log_upload(file.stream, log_path)
+                trading_status_service.parse_status_from_upload(lines, log_path)
                 
                 logging.info("Log file uploaded and processed successfully")
                 return jsonify({'success': 'Log file uploaded and processed', 'redirect': '/'})
                 
+            except ValueError as e:
+                logging.error(f"Invalid uploaded file: {e}")
+                return jsonify({'error': f'Invalid file: {str(e)}'}), 400
             except Exception as e:
                 logging.error(f"Error processing uploaded file: {e}")
                 return jsonify({'error': f'Error processing file: {str(e)}'}), 500
@@ -198,7 +332,7 @@ def upload_logs():
                             <form method="post" enctype="multipart/form-data">
                                 <div class="mb-3">
                                     <label for="logfile" class="form-label">Select Log File</label>
-                                    <input type="file" class="form-control" id="logfile" name="logfile" accept=".log,.txt">
+                                    <input type="file" class="form-control" id="logfile" name="logfile" accept=".log,.txt,.gz,.zst">
                                 </div>
                                 <button type="submit" class="btn btn-primary">Upload and Process</button>
                                 <a href="/" class="btn btn-secondary">Back to Dashboard</a>
@@ -214,17 +348,24 @@ def upload_logs():
 
 @app.route('/refresh-logs')
 def refresh_logs():
-    """Refresh trading data from log files"""
+    """
+    Ask the ingestion worker for a cycle now and return the current status.
+    Parsing stays on the worker; the cycle has finished once served in
+    /api/ingestion-status reaches the returned request.
+    """
     try:
-        # Force refresh of trading status from log files
-        trading_status_service.parse_status_from_logs()
-        logging.info("Trading data refreshed from log files")
-        return jsonify({'success': 'Data refreshed from log files'})
+        request_number = ingestion_worker.trigger()
+        return jsonify({
+            'success': 'Refresh requested',
+            'request': request_number,
+            'status': trading_status_service.get_current_status()
+        })
     except Exception as e:
         logging.error(f"Error refreshing logs: {e}")
         return jsonify({'error': f'Error refreshing: {str(e)}'}), 500
 
 @app.route('/api/statistics/<user>/<period>')
+@etag_cached(_hour_bucket, scopes=('trades', 'marks'))
 def api_user_statistics(user, period):
     """API endpoint for user statistics by period"""
     try:
@@ -234,6 +375,75 @@ def api_user_statistics(user, period):
         logging.error(f"User statistics API error: {e}")
         return jsonify({})
 
+@app.route('/api/risk/<user>/<period>')
+@etag_cached(_hour_bucket)
+def api_risk_metrics(user, period):
+    """API endpoint for drawdown, Sharpe/Sortino, expectancy and streaks ('all' for every user)"""
+    start_date = trading_analytics.get_period_start(period)
+    risk = risk_metrics.get_user_risk(user, start_date)
+    risk['period'] = period
+    return jsonify(risk)
+
+@app.route('/api/prices/<symbol>')
+@etag_cached(_price_window, scopes=('prices',))
+def api_prices(symbol):
+    """
+    API endpoint for OHLC mark price bars of a symbol.
+    
+    `res` is 1m, 1h or 1d (default 1m). `from` and `to` are ISO 8601 times
+    or Unix seconds (UTC); by default the last 500 bars up to now.
+    """
+    resolution = request.args.get('res', '1m')
+    if resolution not in RESOLUTIONS:
+        return jsonify({'error': f"res must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        end = _parse_time(request.args['to']) if request.args.get('to') else datetime.utcnow()
+        start = _parse_time(request.args['from']) if request.args.get('from') else \
+            end - timedelta(seconds=RESOLUTIONS[resolution] * 500)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time: {e}'}), 400
+    
+    try:
+        bars = price_store.get_bars(symbol.upper(), resolution, start, end)
+    except Exception as e:
+        logging.error(f"Price history API error: {e}")
+        bars = []
+    return jsonify({'symbol': symbol.upper(), 'resolution': resolution, 'from': start.isoformat(),
+                    'to': end.isoformat(), 'bars': bars})
+
+@app.route('/api/status-history')
+@etag_cached(_hour_bucket, scopes=('status',))
+def api_status_history():
+    """
+    API endpoint for strategy manager status blocks over log time.
+    
+    With `at`, returns the block in effect at that time. Otherwise returns
+    the blocks between `from` and `to` (default: the last 24 hours),
+    optionally narrowed to a comma-separated list of `fields`, with counter
+    totals that carry across weekly resets. Times are ISO 8601 or Unix seconds.
+    """
+    try:
+        if request.args.get('at'):
+            at = _parse_time(request.args['at'])
+            snapshot = status_history.as_of(at)
+            if snapshot is None:
+                return jsonify({'error': f'No status recorded at or before {at.isoformat()}'}), 404
+            return jsonify(snapshot)
+        end = _parse_time(request.args['to']) if request.args.get('to') else datetime.utcnow()
+        start = _parse_time(request.args['from']) if request.args.get('from') else end - timedelta(days=1)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time: {e}'}), 400
+    
+    fields = [field for field in request.args.get('fields', '').split(',') if field]
+    limit = min(max(request.args.get('limit', 5000, type=int), 1), 50000)
+    try:
+        history = status_history.get_range(start, end, fields, limit)
+    except Exception as e:
+        logging.error(f"Status history API error: {e}")
+        history = {'snapshots': [], 'counter_totals': {}, 'resets': 0}
+    history.update({'from': start.isoformat(), 'to': end.isoformat()})
+    return jsonify(history)
+
 @app.route('/api/refresh-data')
 def api_refresh_data():
     """Refresh all data"""
@@ -241,20 +451,74 @@ def api_refresh_data():
         # Update container statuses
         docker_monitor.update_container_status()
         
-        # Parse latest logs
-        log_parser.parse_latest_logs()
+        # Log parsing and analytics run in the ingestion worker; just wake it
+        request_number = ingestion_worker.trigger()
         
-        # Recalculate analytics
-        trading_analytics.update_statistics()
-        
-        return jsonify({'status': 'success'})
+        return jsonify({'status': 'success', 'request': request_number, 'ingestion': ingestion_worker.get_stats()})
     except Exception as e:
         logging.error(f"Refresh data error: {e}")
         return jsonify({'status': 'error', 'message': str(e)})
 
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events stream of dashboard deltas"""
+    event_publisher.ensure_started()
+    if log_reader_service.client:
+        log_reader_service.streams['log-reader'].ensure_started()
+    
+    subscriber, initial_events = event_publisher.subscribe()
+    if subscriber is None:
+        # Every stream pins a worker thread; past the cap the dashboard polls instead
+        return jsonify({'error': 'Too many live update streams'}), 503
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            for event_type, data in initial_events:
+                yield format_sse(event_type, data)
+            while True:
+                try:
+                    event_type, data = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event_type, data)
+                if event_type == 'resync':
+                    break
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/ingestion-status')
+def api_ingestion_status():
+    """API endpoint for ingestion worker lag and throughput counters"""
+    return jsonify(ingestion_worker.get_stats())
+
 @app.route('/api/log-reader')
 def api_log_reader():
-    """API endpoint for log-reader container logs"""
+    """
+    API endpoint for log-reader container logs.
+    
+    With `since_seq`, returns only the stored entries after that sequence
+    number (newest first, at most `limit`) and the `last_seq` to send next.
+    Otherwise returns the last `lines` entries from the container.
+    """
+    if 'since_seq' in request.args:
+        since_seq = request.args.get('since_seq', type=int)
+        if since_seq is None:
+            return jsonify({'error': 'since_seq must be an integer'}), 400
+        limit = min(max(request.args.get('limit', 200, type=int), 1), 2000)
+        try:
+            return jsonify(log_entries.since('log-reader', since_seq, limit))
+        except Exception as e:
+            logging.error(f"Log reader API error: {e}")
+            return jsonify({'entries': [], 'last_seq': since_seq, 'truncated': False})
+    
     try:
         lines = request.args.get('lines', 100, type=int)
         logs = log_reader_service.get_log_reader_logs(lines=lines)
@@ -263,6 +527,32 @@ def api_log_reader():
         logging.error(f"Log reader API error: {e}")
         return jsonify([])
 
+@app.route('/api/logs/search')
+def api_logs_search():
+    """
+    API endpoint for full-text search over stored log entries.
+    
+    `q` matches entries containing every word (a trailing * matches a
+    prefix); `type`, `level` and `icon` narrow to comma-separated values;
+    `from` and `to` bound the log time (ISO 8601 or Unix seconds). Returns
+    the newest `limit` matches, the total, and per-facet counts.
+    """
+    try:
+        start = _parse_time(request.args['from']) if request.args.get('from') else None
+        end = _parse_time(request.args['to']) if request.args.get('to') else None
+    except ValueError as e:
+        return jsonify({'error': f'Invalid time: {e}'}), 400
+    
+    facets = {field: [value for value in request.args.get(field, '').split(',') if value] for field in FACET_FIELDS}
+    limit = min(max(request.args.get('limit', 100, type=int), 1), 1000)
+    try:
+        results = log_search.search(request.args.get('q', ''), request.args.get('container', 'log-reader'),
+                                    start, end, facets, limit)
+    except Exception as e:
+        logging.error(f"Log search API error: {e}")
+        return jsonify({'error': 'Search failed'}), 500
+    return jsonify(results)
+
 @app.route('/api/trading-summary')
 def api_trading_summary():
     """API endpoint for trading summary from log-reader"""
@@ -277,17 +567,23 @@ def api_trading_summary():
 def logs_viewer():
     """Dedicated logs viewer page"""
     try:
-        # Get log reader logs
-        logs = log_reader_service.get_log_reader_logs(lines=200)
+        # Stored entries carry the seq the page polls from; before the first
+        # ingestion cycle has stored any, fall back to the container
+        logs = log_entries.latest('log-reader', 200)
+        last_seq = logs[0]['seq'] if logs else 0
+        if not logs:
+            logs = log_reader_service.get_log_reader_logs(lines=200)
         trading_summary = log_reader_service.get_trading_summary()
         
         return render_template('logs_viewer.html',
                              logs=logs,
+                             last_seq=last_seq,
                              trading_summary=trading_summary)
     except Exception as e:
         logging.error(f"Logs viewer error: {e}")
         return render_template('logs_viewer.html',
                              logs=[],
+                             last_seq=0,
                              trading_summary={})
 
 @app.route('/upload-container-status', methods=['POST'])
@@ -0,0 +1,150 @@
+"""
+Persistent follow stream over a Docker container's logs
+Keeps the most recent parsed entries in a bounded in-memory ring buffer
+"""
+
+import itertools
+import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+
+
+def timestamp_key(docker_ts):
+    """Sortable key for Docker RFC3339Nano timestamps (trailing zeros are trimmed by Docker)"""
+    seconds, _, fraction = docker_ts.rstrip('Z').partition('.')
+    return seconds + '.' + fraction.ljust(9, '0')
+
+
+def timestamp_to_datetime(docker_ts):
+    """Naive UTC datetime for a Docker timestamp, to microseconds"""
+    seconds, _, fraction = docker_ts.rstrip('Z').partition('.')
+    parsed = datetime.strptime(seconds[:19], '%Y-%m-%dT%H:%M:%S')
+    return parsed.replace(microsecond=int(fraction[:6].ljust(6, '0')) if fraction else 0)
+
+
+def timestamp_to_unix(docker_ts):
+    """Whole-second Unix time for a Docker timestamp, used as the `since` cursor"""
+    parsed = datetime.strptime(docker_ts[:19], '%Y-%m-%dT%H:%M:%S')
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+
+class ContainerLogStream:
+    """One long-lived `logs(stream=True, follow=True)` consumer for a container.
+
+    Lines are parsed as they arrive and appended to a ring buffer. When the
+    stream drops (daemon restart, container restart) the consumer reconnects
+    with `since` set to the last timestamp it saw and skips lines it already
+    has, so nothing is lost or duplicated across reconnects.
+    """
+
+    MAX_BACKOFF = 30
+
+    def __init__(self, client_getter, container_name, parse_line, maxlen=2000, on_entry=None):
+        self.logger = logging.getLogger(__name__)
+        self.client_getter = client_getter
+        self.container_name = container_name
+        self.parse_line = parse_line
+        self.on_entry = on_entry
+        self.buffer = deque(maxlen=maxlen)
+        self.ready = False
+        self.connected = False
+        self.last_ts = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._stream = None
+
+    def ensure_started(self):
+        """Start the consumer thread in this process if it is not running (fork-safe)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread and self._thread.is_alive():
+            return
+        self._pid = pid
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f'log-stream-{self.container_name}', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        stream = self._stream
+        if stream is not None:
+            try:
+                stream.close()
+            except Exception:
+                pass
+
+    def latest(self, count):
+        """Return up to count most recent entries, newest first, in O(count)"""
+        with self._lock:
+            return list(itertools.islice(reversed(self.buffer), count))
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self._consume()
+                backoff = 1
+            except Exception as e:
+                self.logger.warning(f"Log stream for {self.container_name} dropped: {e}")
+            self.connected = False
+            if self._stop.wait(backoff):
+                break
+            backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+    def _consume(self):
+        client = self.client_getter()
+        if client is None:
+            raise RuntimeError('Docker client unavailable')
+
+        container = client.containers.get(self.container_name)
+        kwargs = {'stream': True, 'follow': True, 'timestamps': True}
+        if self.last_ts:
+            kwargs['since'] = timestamp_to_unix(self.last_ts)
+        else:
+            kwargs['tail'] = self.buffer.maxlen
+
+        self._stream = container.logs(**kwargs)
+        self.connected = True
+        self.ready = True
+        self.logger.info(f"Following logs for {self.container_name} (since={kwargs.get('since')})")
+
+        pending = b''
+        try:
+            for chunk in self._stream:
+                if self._stop.is_set():
+                    break
+                pending += chunk
+                *lines, pending = pending.split(b'\n')
+                for raw in lines:
+                    self._handle_line(raw.decode('utf-8', errors='replace'))
+        finally:
+            self._stream = None
+
+    def _handle_line(self, line):
+        if not line.strip():
+            return
+        docker_ts = line.split(' ', 1)[0] if line[:1].isdigit() and 'T' in line[:20] else None
+        if docker_ts:
+            key = timestamp_key(docker_ts)
+            # `since` has whole-second resolution; skip what we already buffered
+            if self.last_ts and key <= timestamp_key(self.last_ts):
+                return
+            self.last_ts = docker_ts
+
+        try:
+            entry = self.parse_line(line)
+        except Exception as e:
+            self.logger.error(f"Error parsing streamed log line: {line}, error: {e}")
+            return
+        if entry is None:
+            return
+
+        with self._lock:
+            self.buffer.append(entry)
+        if self.on_entry:
+            self.on_entry(entry)
@@ -0,0 +1,161 @@
+"""
+Data versions and conditional GET support
+Each kind of dashboard data has a version that is bumped when a commit
+changes it, so ETags can be derived from (endpoint, params, versions)
+without running any query
+"""
+
+import fcntl
+import hashlib
+import logging
+import os
+from functools import wraps
+
+from flask import g, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class DataVersion:
+    """Monotonic counter shared by all processes through a small file.
+
+    Readers stat the file and only re-read it when its mtime changes, so
+    checking the version costs one stat() call.
+    """
+
+    PATH = './logs/.data_version'
+
+    def __init__(self, path=None):
+        self.logger = logging.getLogger(__name__)
+        self.path = path or self.PATH
+        self._cached_mtime = None
+        self._cached_version = 0
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+        if mtime != self._cached_mtime:
+            try:
+                with open(self.path, 'r') as f:
+                    self._cached_version = int(f.read().strip() or 0)
+                self._cached_mtime = mtime
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Error reading data version: {e}")
+        return self._cached_version
+
+    def bump(self):
+        """Increment the version; called after any committed change to dashboard data"""
+        return self._update(lambda version: version + 1)
+
+    def advance(self, version):
+        """Raise the version to at least version"""
+        return self._update(lambda current: max(current, version))
+
+    def _update(self, step):
+        """Replace the stored version with step(version) under the file lock; returns the new one"""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(f"{self.path}.lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    with open(self.path, 'r') as f:
+                        version = int(f.read().strip() or 0)
+                except (FileNotFoundError, ValueError):
+                    version = 0
+                updated = step(version)
+                if updated != version:
+                    tmp_path = f"{self.path}.tmp"
+                    with open(tmp_path, 'w') as f:
+                        f.write(str(updated))
+                    os.replace(tmp_path, self.path)
+            return updated
+        except Exception as e:
+            self.logger.error(f"Error updating {self.path}: {e}")
+            return None
+
+
+# trades: positions opened, edited or closed and the stats built from them
+# marks: unrealized PnL of open positions, revalued on every price tick
+# prices: recorded mark prices and their OHLC bars
+# status: strategy manager status history
+DATA_SCOPES = ('trades', 'marks', 'prices', 'status')
+
+data_versions = {
+    scope: DataVersion(DataVersion.PATH if scope == 'trades' else f"{DataVersion.PATH}.{scope}")
+    for scope in DATA_SCOPES
+}
+data_version = data_versions['trades']
+
+# Tables whose ORM changes bump a scope other than 'trades'; None bumps nothing
+TABLE_SCOPES = {
+    'price_mark': 'prices',
+    'price_bar': 'prices',
+    'status_history': 'status',
+    'log_entry': None,
+}
+
+
+def current_version(*scopes):
+    """Versions of the given scopes, for cache keys"""
+    return tuple(data_versions[scope].current() for scope in scopes)
+
+
+def mark_changed(session, *scopes):
+    """Bump scopes when session next commits; bulk statements bypass the flush hook"""
+    session.info.setdefault('data_changed', set()).update(scopes)
+
+
+@event.listens_for(Session, 'before_flush')
+def _mark_changed(session, flush_context, instances):
+    changed = list(session.new) + list(session.deleted) + [obj for obj in session.dirty if session.is_modified(obj)]
+    scopes = {TABLE_SCOPES.get(obj.__table__.name, 'trades') for obj in changed}
+    scopes.discard(None)
+    if scopes:
+        mark_changed(session, *scopes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    for scope in session.info.pop('data_changed', ()):
+        data_versions[scope].bump()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _clear_on_rollback(session):
+    session.info.pop('data_changed', None)
+
+
+def etag_cached(*extra_parts, scopes=('trades',)):
+    """
+    Answer conditional GETs with 304 before the view runs.
+
+    The strong ETag covers the endpoint, its URL and query parameters, the
+    versions of the data scopes the view reads and the values of any
+    extra_parts callables (for state that does not live in the database). Responses built from stale cached
+    values get no ETag, so clients do not keep them past the refresh.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            parts = [
+                request.endpoint,
+                repr(sorted(kwargs.items())),
+                repr(sorted(request.args.items(multi=True))),
+                repr(current_version(*scopes))
+            ]
+            parts.extend(repr(part()) for part in extra_parts)
+            etag = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or g.get('served_stale'):
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,185 @@
+"""
+Shared Docker access layer
+One lazily connected, fork-safe Docker client per process, with a keep-alive
+connection pool to the daemon and cached container handles
+"""
+
+import logging
+import os
+import threading
+import time
+
+import docker
+
+# Connection methods tried in order until one answers a ping
+CONNECTION_METHODS = (
+    ('environment', lambda pool_size: docker.from_env(max_pool_size=pool_size)),
+    ('Unix socket', lambda pool_size: docker.DockerClient(
+        base_url='unix://var/run/docker.sock', max_pool_size=pool_size)),
+    ('TCP', lambda pool_size: docker.DockerClient(base_url='tcp://localhost:2376', max_pool_size=pool_size)),
+)
+
+# Container events that change which container a name refers to
+NAME_EVENTS = ('create', 'destroy', 'rename')
+
+
+class DockerClientPool:
+    """Process-wide Docker client.
+
+    The client is created on first use rather than at import time, and again
+    in each forked gunicorn worker (sockets inherited from the parent are not
+    reused). Its HTTP adapter keeps up to pool_size keep-alive connections
+    to the daemon, shared by every thread. After a failed connection attempt
+    the pool waits retry_interval seconds before trying again, so requests do
+    not each pay for three connection timeouts while Docker is down.
+
+    Container handles (the result of one inspect call) are cached by name.
+    A background events subscription drops a container's handle on any
+    event for it, so its attrs (status, health, ...) are re-read after
+    every state change. It drops every handle on create/destroy/rename,
+    which change what a name refers to, and whenever the subscription is
+    reopened.
+    """
+
+    def __init__(self, pool_size=None, retry_interval=30):
+        self.logger = logging.getLogger(__name__)
+        self.pool_size = pool_size or int(os.environ.get('DOCKER_POOL_SIZE', 10))
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._client = None
+        self._last_attempt = None
+        self._containers = {}
+        self._listeners = []
+        self._events_thread = None
+
+    def _reset_after_fork(self):
+        self._pid = os.getpid()
+        self._client = None
+        self._last_attempt = None
+        self._containers = {}
+        self._events_thread = None
+
+    def _connect(self):
+        errors = []
+        for method_name, create in CONNECTION_METHODS:
+            try:
+                client = create(self.pool_size)
+                client.ping()
+                self.logger.info(f"Docker connection successful using {method_name} (process {os.getpid()})")
+                return client
+            except Exception as e:
+                errors.append(f"{method_name}: {e}")
+        self.logger.warning(f"All Docker connection methods failed: {'; '.join(errors)}")
+        return None
+
+    def get(self):
+        """The shared DockerClient for this process, or None if Docker is unreachable"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset_after_fork()
+            if self._client is None:
+                now = time.monotonic()
+                if self._last_attempt is not None and now - self._last_attempt < self.retry_interval:
+                    return None
+                self._last_attempt = now
+                self._client = self._connect()
+            client = self._client
+        if client is not None:
+            self._ensure_events()
+        return client
+
+    def available(self):
+        return self.get() is not None
+
+    def reset(self):
+        """Drop the client after a connection failure so the next get() reconnects"""
+        with self._lock:
+            self._client = None
+            self._containers = {}
+
+    def container(self, name):
+        """
+        Container handle for a name, cached until an event for it arrives.
+        Raises docker.errors.NotFound if no such container exists.
+        """
+        client = self.get()
+        if client is None:
+            raise RuntimeError('Docker client unavailable')
+
+        container = self._containers.get(name)
+        if container is not None:
+            return container
+
+        container = client.containers.get(name)
+        with self._lock:
+            self._containers[name] = container
+        return container
+
+    def invalidate(self, name=None):
+        """Forget the cached handle for one name, or all of them"""
+        with self._lock:
+            if name is None:
+                self._containers.clear()
+            else:
+                self._containers.pop(name, None)
+
+    def add_listener(self, callback, resync=None):
+        """
+        Call callback(event) for every container event received by this
+        process. resync() is called each time the subscription is (re)opened,
+        after it is open, so state seeded there cannot miss an event.
+        """
+        with self._lock:
+            self._listeners.append((callback, resync))
+
+    def _ensure_events(self):
+        with self._lock:
+            if self._events_thread is not None and self._events_thread.is_alive():
+                return
+            self._events_thread = threading.Thread(target=self._watch_events, name='docker-events', daemon=True)
+            self._events_thread.start()
+
+    def _watch_events(self):
+        backoff = 1
+        while True:
+            client = self.get()
+            if client is None:
+                # Restarted by the next get() that connects
+                return
+            try:
+                events = client.events(decode=True, filters={'type': 'container'})
+                # Anything may have changed while we were not subscribed
+                self.invalidate()
+                for callback, resync in list(self._listeners):
+                    if resync:
+                        try:
+                            resync()
+                        except Exception as e:
+                            self.logger.error(f"Error resyncing Docker state: {e}")
+                for event in events:
+                    backoff = 1
+                    self._handle_event(event)
+            except Exception as e:
+                self.logger.warning(f"Docker events subscription dropped: {e}")
+                # The daemon may be gone; make the next get() ping it again
+                self.reset()
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+    def _handle_event(self, event):
+        action = event.get('Action') or event.get('status') or ''
+        if action.split(':', 1)[0] in NAME_EVENTS:
+            self.invalidate()
+        else:
+            # Any other event (start, die, health_status, ...) may change the container's attrs
+            self.invalidate(event.get('Actor', {}).get('Attributes', {}).get('name'))
+        for callback, resync in list(self._listeners):
+            try:
+                callback(event)
+            except Exception as e:
+                self.logger.error(f"Error handling Docker event {action}: {e}")
+
+
+# Global instance
+docker_clients = DockerClientPool()
@@ -1,33 +1,17 @@
-import re
 import logging
 import os
 from datetime import datetime
+from sqlalchemy import insert, update
 from app import db
 from models import TradingSession
+from services.data_version import mark_changed
+from services.log_tokenizer import tokenize_lines
+from services.mark_to_market import mark_to_market
+from services.price_store import price_store
+from services.stats_rollup import stats_rollup
 
 class EnhancedLogParser:
     def __init__(self):
-        self.log_patterns = {
-            'position_entry': r'📈 Managing (LONG|SHORT) position for ([A-Z]+USDT):',
-            'position_size': r'Position Size: ([\d.]+)',
-            'entry_price': r'Entry Price: ([\d.]+)',
-            'current_price': r'Current Price: ([\d.]+)',
-            'price_movement': r'Price Movement: ([\d.-]+)%',
-            'success_count': r'(BUY|SELL) Success Count: (\d+)',
-            'stop_loss_count': r'(BUY|SELL) Stop Loss Count: (\d+)',
-            'live_trade_success': r'Live Trade Success Count: (\d+)',
-            'live_trade_failure': r'Live Trade Failure Count: (\d+)',
-            'container_status': r'(BUY|SELL) Container Running: (True|False)',
-            'new_position': r'🆕 New position detected - Original size: ([\d.]+)',
-            'full_position': r'📊 Full position still active',
-            'orders_set': r'✅ Orders already correctly set for ([A-Z]+USDT)',
-            'checking_positions': r'🔄 Checking dynamic positions and orders',
-            'fetching_positions': r'Fetching all open positions',
-            'sleeping': r'⏰ Sleeping for (\d+) minute',
-            'starting_bot': r'🚀 Starting Binance Futures Trading Bot',
-            'strategy_info': r'📋 Strategy: (.+)',
-        }
-        
         # Container name to user mapping
         self.container_user_map = {
             'Yuva_Positions_trading_bot': 'Yuva',
@@ -48,13 +32,15 @@ class EnhancedLogParser:
             
             # Generate simulated log content based on live positions
             log_content = self._generate_simulated_logs(user_positions, user)
-            self._parse_log_content(log_content, user)
+            return self._parse_log_content(log_content, user)
             
         except Exception as e:
             logging.error(f"Error parsing container logs for {container_name}: {e}")
+            return 0
 
     def parse_latest_logs(self):
-        """Parse latest logs from all containers"""
+        """Parse latest logs from all containers, returning the number of lines parsed"""
+        line_count = 0
         try:
             # Initialize live trading data if needed
             from services.live_trading_simulator import live_simulator
@@ -62,10 +48,15 @@ class EnhancedLogParser:
             
             # Parse logs from both trading containers
             for container_name in self.container_user_map.keys():
-                self.parse_container_logs(container_name)
+                line_count += self.parse_container_logs(container_name) or 0
+            
+            # Write buffered mark prices once per flush interval
+            price_store.flush_if_due()
                 
         except Exception as e:
             logging.error(f"Error parsing latest logs: {e}")
+        
+        return line_count
             
     def _generate_simulated_logs(self, positions, user):
         """Generate simulated log content based on live positions"""
@@ -88,65 +79,44 @@ class EnhancedLogParser:
         return '\n'.join(log_lines)
 
     def _parse_log_content(self, log_content, user):
-        """Parse log content and extract trading information"""
+        """Parse log content and extract trading information, returning the line count"""
         lines = log_content.split('\n')
-        
+        self._parse_position_lines(lines, lambda symbol: user)
+        return len(lines)
+
+    def _parse_position_lines(self, lines, user_for_symbol):
+        """Run tokenized lines through the position state machine and save the positions in one batch"""
+        positions = []
         current_symbol = None
         current_side = None
         current_data = {}
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Extract timestamp if present
-            timestamp_match = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z)', line)
-            if timestamp_match:
-                line = line[len(timestamp_match.group(1)):].strip()
-            
+        for token in tokenize_lines(lines):
             # Check for position entry
-            position_match = re.search(self.log_patterns['position_entry'], line)
-            if position_match:
+            if token.kind == 'position':
                 # Save previous position if exists
                 if current_symbol and current_data:
-                    self._save_position(current_symbol, current_side, current_data, user)
+                    positions.append((current_symbol, current_side, current_data, user_for_symbol(current_symbol)))
                 
-                current_side = position_match.group(1)
-                current_symbol = position_match.group(2)
+                current_side = token.value['side']
+                current_symbol = token.value['symbol']
                 current_data = {'timestamp': datetime.utcnow()}
                 continue
             
             # Parse position details
             if current_symbol:
-                size_match = re.search(self.log_patterns['position_size'], line)
-                if size_match:
-                    current_data['size'] = float(size_match.group(1))
-                    continue
-                
-                entry_match = re.search(self.log_patterns['entry_price'], line)
-                if entry_match:
-                    current_data['entry_price'] = float(entry_match.group(1))
-                    continue
-                
-                current_match = re.search(self.log_patterns['current_price'], line)
-                if current_match:
-                    current_data['current_price'] = float(current_match.group(1))
-                    continue
-                
-                movement_match = re.search(self.log_patterns['price_movement'], line)
-                if movement_match:
-                    current_data['price_movement'] = float(movement_match.group(1))
-                    continue
+                if token.kind == 'position_field' and token.value is not None:
+                    current_data[token.field] = token.value
                 
                 # Check for new position marker
-                if re.search(self.log_patterns['new_position'], line):
+                elif token.kind == 'new_position':
                     current_data['is_new'] = True
-                    continue
         
         # Save the last position
         if current_symbol and current_data:
-            self._save_position(current_symbol, current_side, current_data, user)
+            positions.append((current_symbol, current_side, current_data, user_for_symbol(current_symbol)))
+        
+        self._save_positions(positions)
 
     def _parse_sample_logs(self):
         """Parse sample log data for demonstration"""
@@ -174,120 +144,109 @@ class EnhancedLogParser:
         ]
         
         try:
-            current_symbol = None
-            current_side = None
-            current_data = {}
-            
-            for log_line in sample_logs:
-                # Check for position entry
-                position_match = re.search(self.log_patterns['position_entry'], log_line)
-                if position_match:
-                    if current_symbol and current_data:
-                        # Alternate between Yuva and Shan for demo
-                        user = 'Yuva' if current_symbol in ['AVAUSDT', 'STEEMUSDT'] else 'Shan'
-                        self._save_position(current_symbol, current_side, current_data, user)
-                    
-                    current_side = position_match.group(1)
-                    current_symbol = position_match.group(2)
-                    current_data = {'timestamp': datetime.utcnow()}
-                    continue
-                
-                # Parse position details
-                size_match = re.search(self.log_patterns['position_size'], log_line)
-                if size_match:
-                    current_data['size'] = float(size_match.group(1))
-                    continue
-                
-                entry_match = re.search(self.log_patterns['entry_price'], log_line)
-                if entry_match:
-                    current_data['entry_price'] = float(entry_match.group(1))
-                    continue
-                
-                current_match = re.search(self.log_patterns['current_price'], log_line)
-                if current_match:
-                    current_data['current_price'] = float(current_match.group(1))
-                    continue
-                
-                movement_match = re.search(self.log_patterns['price_movement'], log_line)
-                if movement_match:
-                    current_data['price_movement'] = float(movement_match.group(1))
-                    continue
-                
-                # Check for new position marker
-                if re.search(self.log_patterns['new_position'], log_line):
-                    current_data['is_new'] = True
-                    continue
-            
-            # Save the last position
-            if current_symbol and current_data:
-                user = 'Yuva' if current_symbol in ['AVAUSDT', 'STEEMUSDT'] else 'Shan'
-                self._save_position(current_symbol, current_side, current_data, user)
-                
+            # Alternate between Yuva and Shan for demo
+            self._parse_position_lines(
+                sample_logs,
+                lambda symbol: 'Yuva' if symbol in ['AVAUSDT', 'STEEMUSDT'] else 'Shan'
+            )
         except Exception as e:
             logging.error(f"Error parsing sample logs: {e}")
 
-    def _save_position(self, symbol, side, data, user):
-        """Save or update position data in database"""
+    def _save_positions(self, positions):
+        """
+        Save or update a parse cycle's positions with one lookup query, bulk
+        statements and a single commit. Unrealized PnL is revalued for every
+        open position in the reported symbols at once by mark_to_market.
+        Rows whose values did not change are skipped.
+        """
+        if not positions:
+            return
+        
         try:
-            # Check if position already exists
-            existing_position = TradingSession.query.filter_by(
-                user=user,
-                symbol=symbol,
-                status='OPEN'
-            ).first()
+            # Last occurrence wins if a symbol was reported twice in the cycle
+            parsed = {}
+            for symbol, side, data, user in positions:
+                parsed[(user, symbol)] = (side, data)
             
-            if existing_position:
-                # Update existing position
-                if 'current_price' in data:
-                    existing_position.unrealized_pnl = self._calculate_pnl(
-                        existing_position.entry_price,
-                        data['current_price'],
-                        existing_position.position_size,
-                        existing_position.side
-                    )
-                    existing_position.pnl = existing_position.unrealized_pnl
-                
-                # Update price movement data
-                if 'price_movement' in data:
-                    existing_position.notes = f"Price Movement: {data['price_movement']}%"
-                
-                db.session.commit()
-                logging.info(f"Updated position for {user}: {symbol} {side}")
-                
-            else:
-                # Create new position
-                position = TradingSession(
-                    user=user,
-                    symbol=symbol,
-                    side=side,
-                    entry_price=data.get('entry_price', 0),
-                    position_size=data.get('size', 0),
-                    status='OPEN',
-                    trade_type='AUTO',
-                    strategy='Binance Futures Bot',
-                    created_at=data.get('timestamp', datetime.utcnow())
-                )
-                
-                # Calculate unrealized PnL if current price available
+            # Load all affected users' open positions in one query
+            users = {user for user, _ in parsed}
+            existing_positions = {
+                (pos.user, pos.symbol): pos
+                for pos in TradingSession.query.filter(
+                    TradingSession.user.in_(users),
+                    TradingSession.status == 'OPEN'
+                ).all()
+            }
+            
+            inserts = []
+            updates = []
+            prices = {}
+            for (user, symbol), (side, data) in parsed.items():
+                existing_position = existing_positions.get((user, symbol))
                 if 'current_price' in data:
-                    position.unrealized_pnl = self._calculate_pnl(
-                        position.entry_price,
-                        data['current_price'],
-                        position.position_size,
-                        position.side
-                    )
-                    position.pnl = position.unrealized_pnl
-                
-                # Add price movement note
-                if 'price_movement' in data:
-                    position.notes = f"Price Movement: {data['price_movement']}%"
+                    prices[symbol] = data['current_price']
                 
-                db.session.add(position)
-                db.session.commit()
-                logging.info(f"Created new position for {user}: {symbol} {side} at {position.entry_price}")
+                if existing_position:
+                    # Update price movement data; PnL is revalued below
+                    if 'price_movement' in data:
+                        notes = f"Price Movement: {data['price_movement']}%"
+                        if notes != existing_position.notes:
+                            updates.append({'id': existing_position.id, 'notes': notes})
+                    
+                else:
+                    # Create new position
+                    position = {
+                        'user': user,
+                        'symbol': symbol,
+                        'side': side,
+                        'entry_price': data.get('entry_price', 0),
+                        'position_size': data.get('size', 0),
+                        'status': 'OPEN',
+                        'trade_type': 'AUTO',
+                        'strategy': 'Binance Futures Bot',
+                        'created_at': data.get('timestamp', datetime.utcnow()),
+                        'unrealized_pnl': 0.0,
+                        'pnl': 0.0,
+                        'notes': None
+                    }
+                    
+                    # Add price movement note
+                    if 'price_movement' in data:
+                        position['notes'] = f"Price Movement: {data['price_movement']}%"
+                    
+                    inserts.append(position)
+            
+            # executemany-style bulk statements; updates are matched by primary key
+            if inserts:
+                db.session.execute(insert(TradingSession), inserts)
+                stats_rollup.record_inserted(db.session, inserts)
+            if updates:
+                db.session.execute(update(TradingSession), updates)
+            
+            # One price per symbol, applied to every user's open position in it
+            mark_to_market.update_prices(prices)
+            revalued, repriced = mark_to_market.revalue(list(prices))
+            price_store.record(
+                (symbol, user, revalued[(user, symbol)][0], data.get('timestamp', datetime.utcnow()),
+                 data['current_price'], revalued[(user, symbol)][1])
+                for (user, symbol), (side, data) in parsed.items()
+                if 'current_price' in data and (user, symbol) in revalued
+            )
+            
+            if not inserts and not updates and not repriced:
+                return
+            
+            # Bulk statements bypass the unit of work, so flag the change explicitly
+            if inserts or updates:
+                mark_changed(db.session, 'trades')
+            if repriced:
+                mark_changed(db.session, 'marks')
+            db.session.commit()
+            logging.info(f"Saved positions: {len(inserts)} created, {len(updates)} updated, "
+                         f"{repriced} repriced")
                 
         except Exception as e:
-            logging.error(f"Error saving position: {e}")
+            logging.error(f"Error saving positions: {e}")
             db.session.rollback()
 
     def _calculate_pnl(self, entry_price, current_price, size, side):
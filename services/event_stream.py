@@ -0,0 +1,159 @@
+"""
+Server-Sent Events push channel
+Publishes small typed deltas to connected dashboard tabs
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+
+
+def format_sse(event_type, data):
+    """Encode one event in text/event-stream framing"""
+    payload = json.dumps(data, default=_json_default)
+    return f"event: {event_type}\ndata: {payload}\n\n"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class EventBroker:
+    """Fan-out of events to per-connection queues.
+
+    A subscriber that falls too far behind is sent a single 'resync' event
+    and dropped, so one stalled tab cannot grow server memory.
+
+    Each open stream holds a worker thread for as long as it lasts, so at
+    most max_subscribers are accepted per process; past that subscribe()
+    returns None and the client polls instead.
+    """
+
+    def __init__(self, max_queue=500, max_subscribers=None):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers or int(os.environ.get('STREAM_MAX_SUBSCRIBERS', 8))
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """A new subscriber queue, or None if max_subscribers are already connected"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event_type, data):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event_type, data))
+            except queue.Full:
+                self.unsubscribe(subscriber)
+                try:
+                    subscriber.get_nowait()
+                    subscriber.put_nowait(('resync', {}))
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+class DeltaPublisher:
+    """Polls cheap keyed snapshots once per process and publishes only what changed.
+
+    Each source is a callable returning {key: value}. The loop only runs
+    while at least one client is subscribed, so the work done depends on
+    the rate of change rather than on the number of open tabs.
+    """
+
+    def __init__(self, broker, sources, interval=None):
+        self.logger = logging.getLogger(__name__)
+        self.broker = broker
+        self.sources = sources
+        self.interval = interval or float(os.environ.get('STREAM_POLL_SECONDS', 2))
+        self.snapshots = {}
+        self._snapshot_lock = threading.Lock()
+        # Serializes polls, so deltas are published in the order they were computed
+        self._poll_lock = threading.RLock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        """Start the polling thread in this process if it is not running (fork-safe)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread and self._thread.is_alive():
+            return
+        self._pid = pid
+        self.snapshots = {}
+        self._thread = threading.Thread(target=self._run, name='delta-publisher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            if self.broker.subscriber_count:
+                self.poll()
+            time.sleep(self.interval)
+
+    def poll(self, event_types=None):
+        """Collect every source (or only event_types) once and publish the per-source differences"""
+        with self._poll_lock:
+            self._poll(event_types)
+
+    def _poll(self, event_types):
+        for event_type, source in self.sources.items():
+            if event_types is not None and event_type not in event_types:
+                continue
+            try:
+                current = source()
+            except Exception as e:
+                self.logger.error(f"Error collecting {event_type} snapshot: {e}")
+                continue
+
+            with self._snapshot_lock:
+                previous = self.snapshots.get(event_type)
+                self.snapshots[event_type] = current
+            if previous is None:
+                continue
+
+            changed = {key: value for key, value in current.items() if previous.get(key) != value}
+            removed = [key for key in previous if key not in current]
+            if changed or removed:
+                self.broker.publish(event_type, {'changed': changed, 'removed': removed})
+
+    def subscribe(self):
+        """
+        Subscribe to the broker, returning (subscriber, events) where events
+        carry the full current state, or (None, []) if the broker is full.
+        Sources are collected first, as there
+        are no snapshots before the first poll and they go stale while no
+        client is connected; holding the poll lock makes every later delta
+        relative to the state returned.
+        """
+        with self._poll_lock:
+            self._poll(None)
+            subscriber = self.broker.subscribe()
+            if subscriber is None:
+                return None, []
+            return subscriber, self.snapshot_events()
+
+    def snapshot_events(self):
+        """Full state as deltas, sent to a client when it connects"""
+        with self._snapshot_lock:
+            snapshots = dict(self.snapshots)
+        return [(event_type, {'changed': data, 'removed': []}) for event_type, data in snapshots.items()]
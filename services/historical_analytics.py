@@ -4,10 +4,12 @@ Comprehensive trade history analysis with period-based comparisons
 """
 
 import logging
+from bisect import bisect_right
 from datetime import datetime, timedelta, date
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
 from app import db
-from models import TradingSession, TradingStats
+from models import TradingSession
+from services.stats_rollup import stats_rollup
 
 class HistoricalAnalytics:
     """Service for comprehensive historical trading analysis"""
@@ -38,73 +40,138 @@ class HistoricalAnalytics:
             
         return self._get_period_stats(start_date, end_date)
     
+    def _side_aggregates(self):
+        """Conditional aggregates for the long/short/overall figures of one group"""
+        is_long = TradingSession.side == 'LONG'
+        is_short = TradingSession.side == 'SHORT'
+        profitable = TradingSession.pnl > 0
+        return [
+            func.count(TradingSession.id).label('total_positions'),
+            func.sum(case((is_long, 1), else_=0)).label('long_positions'),
+            func.sum(case((and_(is_long, profitable), 1), else_=0)).label('long_profitable'),
+            func.sum(case((is_long, TradingSession.pnl))).label('long_pnl'),
+            func.sum(case((is_short, 1), else_=0)).label('short_positions'),
+            func.sum(case((and_(is_short, profitable), 1), else_=0)).label('short_profitable'),
+            func.sum(case((is_short, TradingSession.pnl))).label('short_pnl')
+        ]
+    
+    def _date_range_filter(self, start_date, end_date):
+        """Half-open [start 00:00, day after end 00:00) range that can use idx_user_created"""
+        start = datetime.combine(start_date, datetime.min.time())
+        end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+        return and_(TradingSession.created_at >= start, TradingSession.created_at < end)
+    
     def _get_period_stats(self, start_date, end_date):
         """Get comprehensive stats for date range"""
         try:
-            # Query for positions in date range
-            query = TradingSession.query.filter(
-                func.date(TradingSession.created_at) >= start_date,
-                func.date(TradingSession.created_at) <= end_date
-            )
-            
-            # Overall stats
-            total_positions = query.count()
-            
-            # Long position stats
-            long_query = query.filter(TradingSession.side == 'LONG')
-            long_positions = long_query.count()
-            long_profitable = long_query.filter(TradingSession.pnl > 0).count()
-            long_total_pnl = long_query.with_entities(func.sum(TradingSession.pnl)).scalar() or 0
-            
-            # Short position stats
-            short_query = query.filter(TradingSession.side == 'SHORT')
-            short_positions = short_query.count()
-            short_profitable = short_query.filter(TradingSession.pnl > 0).count()
-            short_total_pnl = short_query.with_entities(func.sum(TradingSession.pnl)).scalar() or 0
-            
-            # Calculate success rates
-            long_success_rate = (long_profitable / long_positions * 100) if long_positions > 0 else 0
-            short_success_rate = (short_profitable / short_positions * 100) if short_positions > 0 else 0
-            overall_success_rate = ((long_profitable + short_profitable) / total_positions * 100) if total_positions > 0 else 0
-            
-            return {
-                'period': f"{start_date} to {end_date}",
-                'total_positions': total_positions,
-                'long': {
-                    'positions': long_positions,
-                    'profitable': long_profitable,
-                    'success_rate': round(long_success_rate, 1),
-                    'total_pnl': round(long_total_pnl, 2),
-                    'avg_pnl': round(long_total_pnl / long_positions, 2) if long_positions > 0 else 0
-                },
-                'short': {
-                    'positions': short_positions,
-                    'profitable': short_profitable,
-                    'success_rate': round(short_success_rate, 1),
-                    'total_pnl': round(short_total_pnl, 2),
-                    'avg_pnl': round(short_total_pnl / short_positions, 2) if short_positions > 0 else 0
-                },
-                'overall': {
-                    'success_rate': round(overall_success_rate, 1),
-                    'total_pnl': round(long_total_pnl + short_total_pnl, 2),
-                    'best_side': 'LONG' if long_success_rate > short_success_rate else 'SHORT'
-                }
-            }
+            row = db.session.query(*self._side_aggregates()).filter(
+                self._date_range_filter(start_date, end_date)
+            ).one()
+            return self._build_period_stats(start_date, end_date, row._asdict())
             
         except Exception as e:
             self.logger.error(f"Error calculating period stats: {e}")
             return self._empty_stats()
     
+    def _build_period_stats(self, start_date, end_date, totals):
+        """Shape aggregated totals into the period stats structure"""
+        total_positions = totals['total_positions'] or 0
+        long_positions = totals['long_positions'] or 0
+        long_profitable = totals['long_profitable'] or 0
+        long_total_pnl = totals['long_pnl'] or 0
+        short_positions = totals['short_positions'] or 0
+        short_profitable = totals['short_profitable'] or 0
+        short_total_pnl = totals['short_pnl'] or 0
+        
+        # Calculate success rates
+        long_success_rate = (long_profitable / long_positions * 100) if long_positions > 0 else 0
+        short_success_rate = (short_profitable / short_positions * 100) if short_positions > 0 else 0
+        overall_success_rate = ((long_profitable + short_profitable) / total_positions * 100) if total_positions > 0 else 0
+        
+        return {
+            'period': f"{start_date} to {end_date}",
+            'total_positions': total_positions,
+            'long': {
+                'positions': long_positions,
+                'profitable': long_profitable,
+                'success_rate': round(long_success_rate, 1),
+                'total_pnl': round(long_total_pnl, 2),
+                'avg_pnl': round(long_total_pnl / long_positions, 2) if long_positions > 0 else 0
+            },
+            'short': {
+                'positions': short_positions,
+                'profitable': short_profitable,
+                'success_rate': round(short_success_rate, 1),
+                'total_pnl': round(short_total_pnl, 2),
+                'avg_pnl': round(short_total_pnl / short_positions, 2) if short_positions > 0 else 0
+            },
+            'overall': {
+                'success_rate': round(overall_success_rate, 1),
+                'total_pnl': round(long_total_pnl + short_total_pnl, 2),
+                'best_side': 'LONG' if long_success_rate > short_success_rate else 'SHORT'
+            }
+        }
+    
+    def _truncate_created_at(self, unit):
+        """Dialect-specific truncation of created_at to the start of its day or month"""
+        if db.engine.dialect.name == 'postgresql':
+            return func.date_trunc(unit, TradingSession.created_at)
+        formats = {'day': '%Y-%m-%d', 'month': '%Y-%m-01'}
+        return func.strftime(formats[unit], TradingSession.created_at)
+    
+    def _get_bucketed_totals(self, unit, start_date, end_date):
+        """Side aggregates per truncated day/month between two dates, in one GROUP BY"""
+        bucket = self._truncate_created_at(unit).label('bucket')
+        rows = db.session.query(bucket, *self._side_aggregates()).filter(
+            self._date_range_filter(start_date, end_date)
+        ).group_by(bucket).all()
+        
+        totals = {}
+        for row in rows:
+            # PostgreSQL returns a timestamp, SQLite an ISO string
+            key = row.bucket.date() if isinstance(row.bucket, datetime) else date.fromisoformat(str(row.bucket)[:10])
+            totals[key] = row._asdict()
+        return totals
+    
+    def _get_range_stats(self, unit, ranges):
+        """
+        Stats for each (start_date, end_date) range from a single bucketed query.
+        Ranges must not overlap and must be made of whole buckets; empty ones
+        come back zero-filled.
+        """
+        try:
+            totals = self._get_bucketed_totals(unit, min(r[0] for r in ranges), max(r[1] for r in ranges))
+        except Exception as e:
+            self.logger.error(f"Error calculating bucketed stats: {e}")
+            return [self._empty_stats() for _ in ranges]
+        
+        fields = ('total_positions', 'long_positions', 'long_profitable', 'long_pnl',
+                  'short_positions', 'short_profitable', 'short_pnl')
+        summed = [dict.fromkeys(fields, 0) for _ in ranges]
+        order = sorted(range(len(ranges)), key=lambda i: ranges[i][0])
+        starts = [ranges[i][0] for i in order]
+        for key, bucket_totals in totals.items():
+            position = bisect_right(starts, key) - 1
+            if position < 0:
+                continue
+            index = order[position]
+            if key <= ranges[index][1]:
+                for field in fields:
+                    summed[index][field] += bucket_totals[field] or 0
+        
+        return [self._build_period_stats(start_date, end_date, summed[i])
+                for i, (start_date, end_date) in enumerate(ranges)]
+    
     def get_weekly_comparison(self, weeks_back=4):
         """Get Long vs Short comparison for last N weeks"""
-        weekly_data = []
         today = datetime.utcnow().date()
-        
+        ranges = []
         for i in range(weeks_back):
             week_end = today - timedelta(days=i*7)
-            week_start = week_end - timedelta(days=6)
-            
-            stats = self._get_period_stats(week_start, week_end)
+            ranges.append((week_end - timedelta(days=6), week_end))
+        
+        weekly_data = []
+        for i, ((week_start, week_end), stats) in enumerate(zip(ranges, self._get_range_stats('day', ranges))):
             stats['week_label'] = f"Week {i+1}"
             stats['week_start'] = week_start
             stats['week_end'] = week_end
@@ -113,25 +180,21 @@ class HistoricalAnalytics:
         return weekly_data
     
     def get_monthly_comparison(self, months_back=6):
-        """Get Long vs Short comparison for last N months"""
-        monthly_data = []
+        """Get Long vs Short comparison for last N calendar months (the current one up to today)"""
         today = datetime.utcnow().date()
-        
+        ranges = []
         for i in range(months_back):
-            # Calculate month boundaries
+            year, month = divmod(today.year * 12 + today.month - 1 - i, 12)
+            month_start = date(year, month + 1, 1)
             if i == 0:
                 month_end = today
-                month_start = date(today.year, today.month, 1)
             else:
-                temp_date = today.replace(day=1) - timedelta(days=i*30)
-                month_start = date(temp_date.year, temp_date.month, 1)
-                # Get last day of month
-                if temp_date.month == 12:
-                    month_end = date(temp_date.year + 1, 1, 1) - timedelta(days=1)
-                else:
-                    month_end = date(temp_date.year, temp_date.month + 1, 1) - timedelta(days=1)
-            
-            stats = self._get_period_stats(month_start, month_end)
+                next_year, next_month = divmod(year * 12 + month + 1, 12)
+                month_end = date(next_year, next_month + 1, 1) - timedelta(days=1)
+            ranges.append((month_start, month_end))
+        
+        monthly_data = []
+        for (month_start, month_end), stats in zip(ranges, self._get_range_stats('month', ranges)):
             stats['month_label'] = month_start.strftime('%B %Y')
             stats['month_start'] = month_start
             stats['month_end'] = month_end
@@ -142,13 +205,7 @@ class HistoricalAnalytics:
     def get_performance_summary(self):
         """Get overall performance summary with key metrics"""
         try:
-            # Get all-time stats
-            all_time = self.get_period_comparison('all')
-            
-            # Get recent performance
-            today_stats = self.get_period_comparison('today')
-            week_stats = self.get_period_comparison('week')
-            month_stats = self.get_period_comparison('month')
+            all_time, today_stats, week_stats, month_stats = self._get_nested_window_stats()
             
             # Best performing period
             periods = [
@@ -178,6 +235,46 @@ class HistoricalAnalytics:
             self.logger.error(f"Error generating performance summary: {e}")
             return {}
     
+    def _get_nested_window_stats(self):
+        """
+        All time, today, week and month stats from one grouped query.
+        
+        Each row is assigned to the narrowest window containing it; since the
+        windows are nested, each window's totals are the running sum of its
+        bucket and the narrower ones.
+        """
+        today = datetime.utcnow().date()
+        windows = [
+            today,                          # today
+            today - timedelta(days=7),      # week
+            today - timedelta(days=30),     # month
+            date(2020, 1, 1)                # all time
+        ]
+        starts = [datetime.combine(day, datetime.min.time()) for day in windows]
+        bucket = case(
+            (TradingSession.created_at >= starts[0], 0),
+            (TradingSession.created_at >= starts[1], 1),
+            (TradingSession.created_at >= starts[2], 2),
+            else_=3
+        ).label('bucket')
+        
+        rows = db.session.query(bucket, *self._side_aggregates()).filter(
+            self._date_range_filter(windows[3], today)
+        ).group_by(bucket).all()
+        
+        by_bucket = {row.bucket: row._asdict() for row in rows}
+        running = dict.fromkeys(('total_positions', 'long_positions', 'long_profitable', 'long_pnl',
+                                 'short_positions', 'short_profitable', 'short_pnl'), 0)
+        window_stats = []
+        for index, start_date in enumerate(windows):
+            for key, value in by_bucket.get(index, {}).items():
+                if key != 'bucket':
+                    running[key] += value or 0
+            window_stats.append(self._build_period_stats(start_date, today, running))
+        
+        today_stats, week_stats, month_stats, all_time = window_stats
+        return all_time, today_stats, week_stats, month_stats
+    
     def _generate_recommendations(self, all_time, week_stats):
         """Generate trading recommendations based on historical data"""
         recommendations = []
@@ -216,57 +313,16 @@ class HistoricalAnalytics:
         return recommendations
     
     def save_daily_stats(self, date_to_save=None):
-        """Save or update daily statistics for historical tracking"""
+        """
+        Recompute per-user daily/weekly/monthly statistics from raw trades,
+        starting at the buckets containing the given day. The rollups are
+        normally kept current as trades open and close; this repairs them.
+        """
         if date_to_save is None:
             date_to_save = datetime.utcnow().date()
-            
-        try:
-            # Get stats for the day
-            stats = self._get_period_stats(date_to_save, date_to_save)
-            
-            # Save stats for both users (combined for Long vs Short focus)
-            for user in ['Yuva', 'Shan']:
-                # Check if stats already exist
-                existing = TradingStats.query.filter_by(
-                    user=user,
-                    period='daily',
-                    period_date=datetime.combine(date_to_save, datetime.min.time())
-                ).first()
-                
-                if existing:
-                    # Update existing record
-                    self._update_stats_record(existing, stats, user)
-                else:
-                    # Create new record
-                    new_stats = TradingStats(
-                        user=user,
-                        period='daily',
-                        period_date=datetime.combine(date_to_save, datetime.min.time())
-                    )
-                    self._update_stats_record(new_stats, stats, user)
-                    db.session.add(new_stats)
-            
-            db.session.commit()
-            self.logger.info(f"Daily stats saved for {date_to_save}")
-            
-        except Exception as e:
-            self.logger.error(f"Error saving daily stats: {e}")
-            db.session.rollback()
-    
-    def _update_stats_record(self, record, stats, user):
-        """Update a TradingStats record with calculated stats"""
-        # For simplicity, split stats between users
-        user_multiplier = 0.6 if user == 'Yuva' else 0.4  # Yuva gets 60%, Shan gets 40%
         
-        record.long_trades = int(stats['long']['positions'] * user_multiplier)
-        record.long_successful = int(stats['long']['profitable'] * user_multiplier) 
-        record.short_trades = int(stats['short']['positions'] * user_multiplier)
-        record.short_successful = int(stats['short']['profitable'] * user_multiplier)
-        record.total_trades = record.long_trades + record.short_trades
-        record.successful_trades = record.long_successful + record.short_successful
-        record.total_pnl = stats['overall']['total_pnl'] * user_multiplier
-        record.win_rate = stats['overall']['success_rate']
-        record.last_updated = datetime.utcnow()
+        stats_rollup.rebuild(date_to_save)
+        self.logger.info(f"Daily stats saved for {date_to_save}")
     
     def _empty_stats(self):
         """Return empty stats structure"""
@@ -0,0 +1,179 @@
+"""
+Background Ingestion Worker
+Owns all log parsing and database writes so request handlers only read
+"""
+
+import fcntl
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from services.data_version import DataVersion
+
+
+class IngestionWorker:
+    """Periodically parses bot and strategy logs on a background thread.
+
+    Only one process at a time runs the loop: gunicorn workers compete for
+    an exclusive file lock and the losers keep retrying, so a new owner takes
+    over if the current one exits.
+
+    trigger() may be called in any process, so refresh requests are counted
+    in a file shared by all of them, which the owner checks while it waits.
+    A second shared counter records the last request a finished cycle has
+    served, so clients can tell when their refresh has landed.
+    """
+
+    LOCK_PATH = './logs/.ingestion.lock'
+    REQUESTS_PATH = './logs/.ingestion_requests'
+    SERVED_PATH = './logs/.ingestion_served'
+    # How often the owner checks for refresh requests from other processes
+    TRIGGER_POLL_SECONDS = 0.5
+
+    def __init__(self, log_parser, trading_status_service, trading_analytics, log_reader_service=None, interval=None):
+        self.logger = logging.getLogger(__name__)
+        self.log_parser = log_parser
+        self.trading_status_service = trading_status_service
+        self.trading_analytics = trading_analytics
+        self.log_reader_service = log_reader_service
+        self.interval = interval or float(os.environ.get('INGEST_INTERVAL_SECONDS', 30))
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+        self._requests = DataVersion(self.REQUESTS_PATH)
+        self._served = DataVersion(self.SERVED_PATH)
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        self.stats = {
+            'owner': False,
+            'cycles': 0,
+            'errors': 0,
+            'lines_total': 0,
+            'last_lines': 0,
+            'lines_per_second': 0.0,
+            'last_duration': 0.0,
+            'last_success': None
+        }
+
+    def ensure_started(self):
+        """Start the loop in this process if it is not already running (fork-safe)"""
+        pid = os.getpid()
+        if self._pid == pid and self._thread and self._thread.is_alive():
+            return
+        # After a fork the parent's thread, lock and counters do not carry over
+        self._pid = pid
+        self._lock_file = None
+        self._stop.clear()
+        with self._stats_lock:
+            self._reset_stats()
+        self._thread = threading.Thread(target=self._run, name='ingestion-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def trigger(self):
+        """
+        Ask the owning process, whichever it is, to run a cycle now instead
+        of waiting for the interval. Returns the request number: the cycle
+        has finished once get_stats()['served'] reaches it.
+        """
+        request = self._requests.bump()
+        self._wake.set()
+        return request
+
+    def _acquire_ownership(self):
+        """Try to become the single ingesting process"""
+        if self._lock_file:
+            return True
+        try:
+            os.makedirs(os.path.dirname(self.LOCK_PATH), exist_ok=True)
+            lock_file = open(self.LOCK_PATH, 'w')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+            self.logger.info(f"Ingestion worker started in process {os.getpid()} (every {self.interval}s)")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error acquiring ingestion lock: {e}")
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Requests made while the cycle runs wake the next wait at once
+            seen = self._requests.current()
+            if self._acquire_ownership():
+                with self._stats_lock:
+                    self.stats['owner'] = True
+                self.run_once()
+            self._wait(seen)
+
+    def _wait(self, seen):
+        """Sleep for the interval, or until trigger() is called in any process"""
+        deadline = time.monotonic() + self.interval
+        while not self._stop.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._wake.wait(min(remaining, self.TRIGGER_POLL_SECONDS)):
+                break
+            if self._requests.current() != seen:
+                break
+        self._wake.clear()
+
+    def run_once(self):
+        """Run one ingestion cycle inside an application context"""
+        from app import app, db
+
+        started = time.monotonic()
+        request = self._requests.current()
+        with app.app_context():
+            try:
+                lines = self.log_parser.parse_latest_logs() or 0
+                self.trading_status_service.parse_status_from_logs()
+                lines += self.trading_status_service.last_line_count
+                if self.log_reader_service:
+                    lines += self.log_reader_service.sync_entries()
+                self.trading_analytics.update_statistics()
+            except Exception as e:
+                self.logger.error(f"Ingestion cycle failed: {e}")
+                db.session.rollback()
+                with self._stats_lock:
+                    self.stats['errors'] += 1
+                return
+            finally:
+                db.session.remove()
+
+        duration = time.monotonic() - started
+        with self._stats_lock:
+            self.stats['cycles'] += 1
+            self.stats['lines_total'] += lines
+            self.stats['last_lines'] = lines
+            self.stats['last_duration'] = round(duration, 4)
+            self.stats['lines_per_second'] = round(lines / duration, 1) if duration > 0 else 0.0
+            self.stats['last_success'] = datetime.utcnow()
+        self._served.advance(request)
+
+    def get_stats(self):
+        """
+        Counters for monitoring, including lag since the last successful
+        cycle. They are this process's, except requested and served, which
+        are shared by every process.
+        """
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['requested'] = self._requests.current()
+        stats['served'] = self._served.current()
+        last_success = stats['last_success']
+        stats['interval'] = self.interval
+        stats['lag_seconds'] = round((datetime.utcnow() - last_success).total_seconds(), 1) if last_success else None
+        stats['last_success'] = last_success.isoformat() if last_success else None
+        return stats
@@ -3,8 +3,11 @@ import logging
 import threading
 import time
 from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import select
 from app import db
 from models import TradingSession
+from services.mark_to_market import unrealized_pnl
 
 class LiveTradingSimulator:
     def __init__(self):
@@ -51,29 +54,46 @@ class LiveTradingSimulator:
         db.session.add(session)
         
     def get_live_positions(self):
-        """Get current live positions"""
+        """Get current live positions, priced at one simulated mark per symbol"""
         try:
-            positions = TradingSession.query.filter_by(status='OPEN').all()
-            live_data = []
+            rows = db.session.connection().execute(
+                select(
+                    TradingSession.symbol, TradingSession.user, TradingSession.side,
+                    TradingSession.entry_price, TradingSession.position_size, TradingSession.entry_time
+                ).where(TradingSession.status == 'OPEN')
+            ).all()
+            if not rows:
+                return []
+            symbols, users, sides, entry_prices, sizes, entry_times = zip(*rows)
             
-            for pos in positions:
-                # Simulate live price movement
-                current_price = self._simulate_price_movement(pos.entry_price)
-                pnl = self._calculate_pnl(pos.entry_price, current_price, pos.size, pos.side)
-                
-                live_data.append({
-                    'symbol': pos.symbol,
-                    'user': pos.user,
-                    'side': pos.side,
-                    'entry_price': pos.entry_price,
-                    'current_price': current_price,
-                    'size': pos.size,
-                    'pnl': pnl,
+            # Simulate live price movement once per symbol, shared by every user holding it
+            marks = {}
+            for symbol, entry_price in zip(symbols, entry_prices):
+                if symbol not in marks:
+                    marks[symbol] = self._simulate_price_movement(entry_price)
+            current_prices = np.array([marks[symbol] for symbol in symbols], dtype=np.float64)
+            pnl = np.round(unrealized_pnl(
+                current_prices,
+                np.array(entry_prices, dtype=np.float64),
+                np.array(sizes, dtype=np.float64),
+                np.array(sides) == 'LONG'
+            ), 2)
+            
+            return [
+                {
+                    'symbol': symbol,
+                    'user': user,
+                    'side': side,
+                    'entry_price': entry_price,
+                    'current_price': marks[symbol],
+                    'size': size,
+                    'pnl': position_pnl,
                     'status': 'OPEN',
-                    'time': pos.entry_time.strftime('%Y-%m-%d %H:%M:%S')
-                })
-                
-            return live_data
+                    'time': entry_time.strftime('%Y-%m-%d %H:%M:%S') if entry_time else 'N/A'
+                }
+                for symbol, user, side, entry_price, size, entry_time, position_pnl
+                in zip(symbols, users, sides, entry_prices, sizes, entry_times, pnl.tolist())
+            ]
             
         except Exception as e:
             logging.error(f"Error getting live positions: {e}")
@@ -0,0 +1,219 @@
+"""
+Archived log chunk parsing
+Splits plain or compressed strategy/bot log archives at line boundaries and
+reduces each chunk independently, so chunks can be parsed on a process pool
+and merged in order. Nothing here touches the database.
+"""
+
+import os
+
+from services.log_tokenizer import (
+    COIN_PATTERN, FIELD_KEYS, POSITION_PATTERN, coin_value, position_value, tokenize
+)
+from services.log_upload import open_decompressed
+
+CHUNK_SIZE = 16 * 1024 * 1024
+
+STATUS_HEADER = '=== Current Status ==='
+NEW_POSITION_MARKER = '🆕 New position detected'
+TRACKING_FIELDS = {'buy_coins_tracking': 'BUY', 'sell_coins_tracking': 'SELL'}
+
+
+def iter_chunks(path, chunk_size=CHUNK_SIZE):
+    """
+    Chunk tasks for one archive. Plain files yield (path, start, end) byte
+    ranges ending on a newline, which workers read themselves; compressed
+    files are decompressed here and yield (path, index, data) with the bytes.
+    """
+    with open(path, 'rb') as f:
+        compressed = open_decompressed(f) is not f
+    if not compressed:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            start = 0
+            while start < size:
+                f.seek(min(start + chunk_size, size))
+                f.readline()
+                end = min(f.tell(), size)
+                yield (path, start, end)
+                start = end
+        return
+
+    with open(path, 'rb') as f:
+        source = open_decompressed(f)
+        pending = b''
+        index = 0
+        while True:
+            data = source.read(chunk_size)
+            if not data:
+                break
+            data = pending + data
+            cut = data.rfind(b'\n') + 1
+            pending = data[cut:]
+            if cut:
+                yield (path, index, data[:cut])
+                index += 1
+        if pending:
+            yield (path, index, pending)
+
+
+def read_chunk(task):
+    path, start, end = task
+    if isinstance(end, bytes):
+        return end
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+
+def _timestamp(line):
+    """'YYYY-MM-DD HH:MM:SS' of a strategy manager or Docker timestamp prefix, or None"""
+    if len(line) >= 19 and line[4:5] == '-' and line[:4].isdigit():
+        if line[10:11] in (' ', 'T') and line[13:14] == ':':
+            return line[:10] + ' ' + line[11:19]
+    return None
+
+
+def _classify(line):
+    """
+    Fast path equivalent to tokenize() for the token kinds the backfill uses.
+    Returns (kind, field, value) or None for lines that cannot carry one.
+    """
+    # Strip the Docker and/or strategy manager timestamp prefixes
+    message = line
+    if message[:1].isdigit():
+        if message[10:11] == 'T' and message[19:20] in ('.', 'Z'):
+            message = message.partition(' ')[2].lstrip()
+        if message[19:22] == ' - ' and message[:1].isdigit():
+            message = message[22:]
+    key, separator, raw = message.strip().partition(':')
+    if separator and key in FIELD_KEYS:
+        kind, field, convert = FIELD_KEYS[key]
+        try:
+            value = convert(raw.strip())
+        except (ValueError, IndexError):
+            value = None
+        return kind, field, value
+    if STATUS_HEADER in message:
+        return 'status_header', None, None
+    # Leftmost matches, as LINE_PATTERN.search() would find them
+    if key.startswith('-'):
+        match = COIN_PATTERN.match(message.strip())
+        if match:
+            return 'coin', 'coin', coin_value(match)
+    elif key.startswith('📈'):
+        match = POSITION_PATTERN.match(message.strip())
+        if match:
+            return 'position', 'position', position_value(match)
+    # Every other useful token needs a colon or the new-position marker
+    if not separator and NEW_POSITION_MARKER not in message:
+        return None
+    token = tokenize(line)
+    if token.kind in ('blank', 'general'):
+        return None
+    return token.kind, token.field, token.value
+
+
+def parse_bot_chunk(data):
+    """
+    Reduce a chunk of a trading bot log to position observations.
+
+    Returns {'lead', 'positions', 'tail', 'last_ts'}: lead holds fields seen
+    before the chunk's first position marker (they belong to the previous
+    chunk's last position), positions maps (symbol, side, entry_price) to
+    [first_ts, last_ts, size, current_price, price_movement, observations]
+    for complete observations, and tail is the chunk's last observation,
+    which the next chunk's lead may still extend.
+    """
+    lead = {}
+    positions = {}
+    current = None
+    last_ts = None
+    for line in data.decode('utf-8', errors='replace').split('\n'):
+        token = _classify(line)
+        if token is None:
+            continue
+        kind, field, value = token
+        if kind == 'position':
+            if current is not None:
+                add_observation(positions, current)
+            current = {'ts': _timestamp(line) or last_ts, 'side': value['side'], 'symbol': value['symbol']}
+            last_ts = current['ts']
+        elif kind == 'position_field' and value is not None:
+            (current if current is not None else lead)[field] = value
+    return {'lead': lead, 'positions': positions, 'tail': current, 'last_ts': last_ts}
+
+
+def add_observation(positions, observation):
+    """Fold one position observation into per-position aggregates"""
+    if observation.get('ts') is None or 'entry_price' not in observation:
+        return
+    key = (observation['symbol'], observation['side'], observation['entry_price'])
+    ts = observation['ts']
+    aggregate = positions.get(key)
+    if aggregate is None:
+        positions[key] = [ts, ts, observation.get('size', 0), observation.get('current_price'),
+                          observation.get('price_movement'), 1]
+        return
+    merge_aggregate(aggregate, [ts, ts, observation.get('size', 0), observation.get('current_price'),
+                                observation.get('price_movement'), 1])
+
+
+def merge_aggregate(aggregate, other):
+    if other[0] < aggregate[0]:
+        aggregate[0] = other[0]
+    if other[1] >= aggregate[1]:
+        aggregate[1] = other[1]
+        if other[3] is not None:
+            aggregate[3] = other[3]
+        if other[4] is not None:
+            aggregate[4] = other[4]
+    aggregate[5] += other[5]
+
+
+def parse_strategy_chunk(data):
+    """
+    Reduce a chunk of a strategy manager log to status blocks.
+
+    Each block is {'ts', 'fields', 'lists', 'orphans', 'section'}: status
+    field values, coin lists that were restarted by a tracking header in the
+    block, coins listed before any header (they extend the section open at
+    the end of the previous block) and the section open at the block's end.
+    The first block holds whatever precedes the chunk's first status header.
+    """
+    blocks = []
+    block = {'ts': None, 'fields': {}, 'lists': {}, 'orphans': [], 'section': None}
+    for line in data.decode('utf-8', errors='replace').split('\n'):
+        token = _classify(line)
+        if token is None:
+            continue
+        kind, field, value = token
+        if kind == 'status_header':
+            blocks.append(block)
+            block = {'ts': None, 'fields': {}, 'lists': {}, 'orphans': [], 'section': None}
+            continue
+        if block['ts'] is None:
+            block['ts'] = _timestamp(line)
+        if kind == 'status':
+            section = TRACKING_FIELDS.get(field)
+            if section:
+                block['section'] = section
+                block['lists'][section] = []
+            elif value is not None:
+                block['fields'][field] = value
+        elif kind == 'coin':
+            if block['section']:
+                block['lists'][block['section']].append(value)
+            else:
+                block['orphans'].append(value)
+    blocks.append(block)
+    return {'blocks': blocks}
+
+
+def parse_chunk(task):
+    """Process pool entry point: (kind, chunk task) -> (line count, reduced chunk)"""
+    kind, chunk = task
+    data = read_chunk(chunk)
+    result = parse_bot_chunk(data) if kind == 'bot' else parse_strategy_chunk(data)
+    return data.count(b'\n'), result
+
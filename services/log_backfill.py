@@ -0,0 +1,368 @@
+"""
+Bulk backfill of archived logs
+Parses rotated strategy manager and trading bot logs on a process pool and
+bulk-loads the merged result into TradingSession and StatusHistory
+"""
+
+import copy
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from models import StatusHistory, TradingSession
+from services.data_version import mark_changed
+from services.enhanced_log_parser import EnhancedLogParser
+from services.log_archive import CHUNK_SIZE, add_observation, iter_chunks, merge_aggregate, parse_chunk
+from services.stats_rollup import stats_rollup
+from services.status_history import encode_blocks
+from services.trading_status_service import TradingStatusService
+
+STATE_DIR = './logs/.backfill'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class LogBackfill:
+    """Imports archived logs in three resumable phases.
+
+    1. Parse: archives are split at line boundaries and the chunks reduced
+       on a process pool. Each reduced chunk is spooled to the state
+       directory, so an interrupted run only re-parses missing chunks.
+    2. Merge: chunk results are folded in file order into per-position
+       aggregates (bot logs) and a status block sequence (strategy logs).
+    3. Load: rows are inserted in timestamp order in one transaction with
+       executemany (SQLite) or COPY (PostgreSQL), skipping rows that are
+       already present, then the stats rollups are rebuilt from the earliest
+       imported trade. Archives are recorded as imported only after that.
+
+    `python benchmark.py backfill --workers 1` parses about 280k lines/sec
+    on one core. Parsing is split across independent worker processes, but
+    it has only been measured on a single core. 1M lines/sec would need at
+    least four workers on as many cores, and that is unverified.
+    """
+
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE, close_after=300, state_dir=STATE_DIR):
+        self.logger = logging.getLogger(__name__)
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        # A position not seen for this long before the bot's last scan was closed
+        self.close_after = timedelta(seconds=close_after)
+        self.state_dir = state_dir
+        self.parser = EnhancedLogParser()
+
+    # --- Archive bookkeeping --------------------------------------------
+
+    def archive_kind(self, path, user=None):
+        """('strategy', None) for strategy manager logs, ('bot', user) for trading bot logs"""
+        name = os.path.basename(path)
+        if 'strategy' in name:
+            return 'strategy', None
+        if user:
+            return 'bot', user
+        for container_name, container_user in self.parser.container_user_map.items():
+            if container_name in name or container_user.lower() in name.lower():
+                return 'bot', container_user
+        raise ValueError(f"Cannot tell which user {path} belongs to; pass --user")
+
+    def _fingerprint(self, path):
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}|{self.chunk_size}"
+        return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+    def _state_path(self):
+        return os.path.join(self.state_dir, 'state.json')
+
+    def _load_state(self):
+        try:
+            with open(self._state_path(), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'imported': {}}
+
+    def _save_state(self, state):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = f"{self._state_path()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self._state_path())
+
+    def _spool_path(self, fingerprint, index):
+        return os.path.join(self.state_dir, fingerprint, f'{index:06d}.pickle')
+
+    def _spool(self, fingerprint, index, result):
+        path = self._spool_path(fingerprint, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{path}.tmp", path)
+
+    def _spooled_results(self, fingerprint, count):
+        for index in range(count):
+            with open(self._spool_path(fingerprint, index), 'rb') as f:
+                yield pickle.load(f)
+
+    @staticmethod
+    def expand_paths(paths):
+        """Files as given, plus every log file inside given directories, in name order"""
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    full_path = os.path.join(path, name)
+                    if os.path.isfile(full_path) and '.log' in name:
+                        files.append(full_path)
+            else:
+                files.append(path)
+        return files
+
+    # --- Phase 1: parse -------------------------------------------------
+
+    def _parse_archives(self, archives):
+        """Parse every chunk not already spooled; returns (chunk counts, lines parsed, seconds)"""
+        chunk_counts = {}
+        lines = 0
+        started = time.perf_counter()
+        # Chunks are parsed in child processes that never use the database
+        db.engine.dispose()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            pending = {}
+
+            def collect(done):
+                nonlocal lines
+                for future in done:
+                    fingerprint, index = pending.pop(future)
+                    line_count, result = future.result()
+                    lines += line_count
+                    self._spool(fingerprint, index, result)
+
+            for path, kind, user, fingerprint in archives:
+                count = 0
+                for index, chunk in enumerate(iter_chunks(path, self.chunk_size)):
+                    count += 1
+                    if os.path.exists(self._spool_path(fingerprint, index)):
+                        continue
+                    # Bound the decompressed chunks held in memory
+                    while len(pending) >= self.workers * 2:
+                        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    pending[pool.submit(parse_chunk, (kind, chunk))] = (fingerprint, index)
+                chunk_counts[fingerprint] = count
+            collect(wait(pending).done)
+        return chunk_counts, lines, time.perf_counter() - started
+
+    # --- Phase 2: merge -------------------------------------------------
+
+    def _merge_bot_archive(self, results):
+        """Fold one bot log's chunk results, in order, into per-position aggregates"""
+        positions = {}
+        tail = None
+        for result in results:
+            if tail is not None:
+                tail.update(result['lead'])
+            if result['tail'] is None:
+                # The whole chunk continues the previous chunk's last position
+                continue
+            if tail is not None:
+                add_observation(positions, tail)
+            for key, aggregate in result['positions'].items():
+                if key in positions:
+                    merge_aggregate(positions[key], aggregate)
+                else:
+                    positions[key] = aggregate
+            tail = result['tail']
+        if tail is not None:
+            add_observation(positions, tail)
+        return positions
+
+    def _merge_strategy_archive(self, results):
+        """Replay one strategy log's status blocks, in order, into (log time, status) pairs"""
+        status = TradingStatusService._default_status()
+        section = None
+        block_ts = None
+        blocks = []
+
+        def finish_block():
+            if block_ts is not None:
+                blocks.append((datetime.strptime(block_ts, TIMESTAMP_FORMAT),
+                               TradingStatusService._apply_mode(copy.deepcopy(status))))
+
+        for result in results:
+            for index, block in enumerate(result['blocks']):
+                # A chunk's first block continues the previous chunk's last one;
+                # every other block starts at a status header
+                if index > 0:
+                    finish_block()
+                    block_ts = None
+                if block['orphans'] and section:
+                    status[f'{section.lower()}_coins_tracking'].extend(block['orphans'])
+                status.update(block['fields'])
+                for block_section, coins in block['lists'].items():
+                    status[f'{block_section.lower()}_coins_tracking'] = list(coins)
+                section = block['section'] or section
+                if block_ts is None and (block['fields'] or block['lists']):
+                    block_ts = block['ts']
+        finish_block()
+        return blocks
+
+    def _position_rows(self, user_positions):
+        """TradingSession rows for merged positions, closing those that disappeared before the bot's last scan"""
+        rows = []
+        for user, positions in user_positions.items():
+            if not positions:
+                continue
+            last_scan = max(datetime.strptime(aggregate[1], TIMESTAMP_FORMAT) for aggregate in positions.values())
+            for (symbol, side, entry_price), aggregate in positions.items():
+                first_ts, last_ts, size, current_price, price_movement, _ = aggregate
+                created_at = datetime.strptime(first_ts, TIMESTAMP_FORMAT)
+                last_seen = datetime.strptime(last_ts, TIMESTAMP_FORMAT)
+                pnl = self.parser._calculate_pnl(entry_price, current_price, size, side) if current_price is not None else 0.0
+                row = {
+                    'user': user,
+                    'symbol': symbol,
+                    'side': side,
+                    'entry_price': entry_price,
+                    'position_size': size,
+                    'trade_type': 'AUTO',
+                    'strategy': 'Binance Futures Bot',
+                    'notes': f"Price Movement: {price_movement}%" if price_movement is not None else None,
+                    'entry_time': created_at,
+                    'created_at': created_at
+                }
+                if last_seen < last_scan - self.close_after:
+                    row.update({'status': 'CLOSED', 'exit_price': current_price, 'pnl': pnl, 'realized_pnl': pnl,
+                                'unrealized_pnl': 0.0, 'exit_time': last_seen, 'closed_at': last_seen})
+                else:
+                    row.update({'status': 'OPEN', 'exit_price': None, 'pnl': pnl, 'realized_pnl': 0.0,
+                                'unrealized_pnl': pnl, 'exit_time': None, 'closed_at': None})
+                rows.append(row)
+        rows.sort(key=lambda row: row['created_at'])
+        return rows
+
+    # --- Phase 3: load --------------------------------------------------
+
+    def _new_position_rows(self, rows):
+        """Drop rows already imported, and open positions the live ingestion already tracks"""
+        if not rows:
+            return rows
+        existing = set(
+            db.session.query(TradingSession.user, TradingSession.symbol, TradingSession.side,
+                             TradingSession.entry_price, TradingSession.created_at)
+            .filter(TradingSession.created_at.between(rows[0]['created_at'], rows[-1]['created_at']))
+        )
+        open_positions = set(
+            db.session.query(TradingSession.user, TradingSession.symbol).filter(TradingSession.status == 'OPEN')
+        )
+        return [
+            row for row in rows
+            if (row['user'], row['symbol'], row['side'], row['entry_price'], row['created_at']) not in existing
+            and not (row['status'] == 'OPEN' and (row['user'], row['symbol']) in open_positions)
+        ]
+
+    def _new_status_rows(self, blocks):
+        """StatusHistory rows for the blocks whose log time is not stored yet"""
+        if not blocks:
+            return []
+        blocks.sort(key=lambda block: block[0])
+        existing = {
+            recorded_at for recorded_at, in db.session.query(StatusHistory.recorded_at)
+            .filter(StatusHistory.recorded_at.between(blocks[0][0], blocks[-1][0]))
+        }
+        rows, _ = encode_blocks([block for block in blocks if block[0] not in existing])
+        return rows
+
+    def _bulk_insert(self, model, rows):
+        """executemany on SQLite; COPY on PostgreSQL"""
+        if not rows:
+            return
+        if db.engine.dialect.name != 'postgresql':
+            db.session.execute(insert(model), rows)
+            return
+
+        preparer = db.engine.dialect.identifier_preparer
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(['\\N' if row[column] is None else row[column] for column in columns])
+        buffer.seek(0)
+        sql = (f"COPY {preparer.format_table(model.__table__)} "
+               f"({', '.join(preparer.quote(column) for column in columns)}) "
+               f"FROM STDIN WITH (FORMAT csv, NULL '\\N')")
+        cursor = db.session.connection().connection.dbapi_connection.cursor()
+        try:
+            cursor.copy_expert(sql, buffer)
+        finally:
+            cursor.close()
+
+    def run(self, paths, user=None, force=False):
+        """Import archives; returns a summary dict"""
+        state = self._load_state()
+        archives = []
+        for path in self.expand_paths(paths):
+            kind, archive_user = self.archive_kind(path, user)
+            fingerprint = self._fingerprint(path)
+            if fingerprint in state['imported'] and not force:
+                self.logger.info(f"Skipping {path}: already imported")
+                continue
+            archives.append((path, kind, archive_user, fingerprint))
+        if not archives:
+            return {'archives': 0, 'lines': 0, 'positions': 0, 'status_blocks': 0}
+
+        chunk_counts, lines, elapsed = self._parse_archives(archives)
+        self.logger.info(f"Parsed {lines:,} new lines in {elapsed:.1f}s "
+                         f"({lines / elapsed if elapsed else 0:,.0f} lines/sec, {self.workers} workers)")
+
+        user_positions = {}
+        status_blocks = []
+        for path, kind, archive_user, fingerprint in archives:
+            results = self._spooled_results(fingerprint, chunk_counts[fingerprint])
+            if kind == 'bot':
+                positions = user_positions.setdefault(archive_user, {})
+                for key, aggregate in self._merge_bot_archive(results).items():
+                    if key in positions:
+                        merge_aggregate(positions[key], aggregate)
+                    else:
+                        positions[key] = aggregate
+            else:
+                status_blocks.extend(self._merge_strategy_archive(results))
+
+        try:
+            position_rows = self._new_position_rows(self._position_rows(user_positions))
+            status_rows = self._new_status_rows(status_blocks)
+            self._bulk_insert(TradingSession, position_rows)
+            self._bulk_insert(StatusHistory, status_rows)
+            if position_rows:
+                mark_changed(db.session, 'trades')
+            if status_rows:
+                mark_changed(db.session, 'status')
+            db.session.commit()
+        except Exception as e:
+            self.logger.error(f"Error loading backfilled rows: {e}")
+            db.session.rollback()
+            raise
+
+        if position_rows:
+            stats_rollup.rebuild(position_rows[0]['created_at'])
+
+        for path, kind, archive_user, fingerprint in archives:
+            state['imported'][fingerprint] = {'path': os.path.abspath(path), 'kind': kind, 'user': archive_user,
+                                              'imported_at': datetime.utcnow().isoformat()}
+            for index in range(chunk_counts[fingerprint]):
+                os.remove(self._spool_path(fingerprint, index))
+            if chunk_counts[fingerprint]:
+                os.rmdir(os.path.join(self.state_dir, fingerprint))
+        self._save_state(state)
+
+        summary = {'archives': len(archives), 'lines': lines, 'positions': len(position_rows),
+                   'status_blocks': len(status_rows)}
+        self.logger.info(f"Backfill complete: {summary}")
+        return summary
@@ -0,0 +1,113 @@
+"""
+Log Entry Store
+Persists parsed container log entries with a monotonic sequence number so
+readers can ask for just the entries after the last one they have
+"""
+
+import json
+import logging
+
+from sqlalchemy import func, insert, select
+
+from app import db
+from models import LogEntry
+from services.container_log_stream import timestamp_to_datetime
+
+ENTRY_COLUMNS = (
+    LogEntry.seq, LogEntry.logged_at, LogEntry.docker_ts, LogEntry.type, LogEntry.level,
+    LogEntry.icon, LogEntry.message, LogEntry.raw_message, LogEntry.data
+)
+
+
+def _to_entry(row):
+    """Stored row -> the structured entry format of LogReaderService._parse_log_message"""
+    seq, logged_at, docker_ts, entry_type, level, icon, message, raw_message, data = row
+    entry = {
+        'seq': seq,
+        'timestamp': docker_ts or logged_at.isoformat() + 'Z',
+        'type': entry_type,
+        'level': level,
+        'icon': icon,
+        'message': message,
+        'raw_message': raw_message
+    }
+    if data:
+        entry['data'] = json.loads(data)
+    return entry
+
+
+class LogEntryStore:
+    """Append-only store of parsed log entries, one sequence per database.
+
+    Entries are written by the ingesting process only, in log order, so seq
+    order is log order and a reader that remembers the last seq it saw can
+    fetch exactly what it is missing through the (container, seq) index.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def last_timestamp(self, container):
+        """Docker timestamp of the newest stored entry for container, or None"""
+        return db.session.execute(
+            select(LogEntry.docker_ts).where(
+                LogEntry.seq == select(func.max(LogEntry.seq)).where(LogEntry.container == container).scalar_subquery()
+            )
+        ).scalar()
+
+    def append(self, container, entries):
+        """Store parsed entries in order with one executemany; returns the number stored"""
+        rows = [
+            {
+                'container': container,
+                'logged_at': timestamp_to_datetime(entry['timestamp']),
+                'docker_ts': entry['timestamp'],
+                'type': entry['type'],
+                'level': entry['level'],
+                'icon': entry.get('icon'),
+                'message': entry['message'],
+                'raw_message': entry.get('raw_message'),
+                'data': json.dumps(entry['data']) if entry.get('data') else None
+            }
+            for entry in entries
+        ]
+        if not rows:
+            return 0
+        try:
+            db.session.execute(insert(LogEntry), rows)
+            db.session.commit()
+            return len(rows)
+        except Exception as e:
+            self.logger.error(f"Error storing log entries for {container}: {e}")
+            db.session.rollback()
+            return 0
+
+    def latest(self, container, limit=200):
+        """The newest entries, newest first"""
+        rows = db.session.execute(
+            select(*ENTRY_COLUMNS).where(LogEntry.container == container)
+            .order_by(LogEntry.seq.desc()).limit(limit)
+        ).all()
+        return [_to_entry(row) for row in rows]
+
+    def since(self, container, since_seq, limit=200):
+        """
+        Entries after since_seq, newest first, and the seq to pass next time.
+        When more than limit entries are new only the newest limit are
+        returned and truncated is set.
+        """
+        rows = db.session.execute(
+            select(*ENTRY_COLUMNS).where(LogEntry.container == container, LogEntry.seq > since_seq)
+            .order_by(LogEntry.seq.desc()).limit(limit + 1)
+        ).all()
+        truncated = len(rows) > limit
+        entries = [_to_entry(row) for row in rows[:limit]]
+        return {
+            'entries': entries,
+            'last_seq': entries[0]['seq'] if entries else since_seq,
+            'truncated': truncated
+        }
+
+
+# Global instance
+log_entries = LogEntryStore()
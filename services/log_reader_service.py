@@ -1,49 +1,28 @@
-import docker
 import logging
-import re
 from datetime import datetime
 from typing import List, Dict, Optional
+from services.container_log_stream import ContainerLogStream, timestamp_key, timestamp_to_unix
+from services.docker_client import docker_clients
+from services.log_tokenizer import LogToken, tokenize
+from services.single_flight import coalesced
 
 class LogReaderService:
+    STREAM_BUFFER_SIZE = 2000
+    
     def __init__(self):
-        try:
-            # Try multiple connection methods
-            self.client = self._initialize_docker_client()
-        except Exception as e:
-            logging.error(f"Failed to connect to Docker: {e}")
-            self.client = None
+        # One long-lived follow stream per container, parsed into a ring buffer
+        self.streams = {
+            'log-reader': ContainerLogStream(
+                docker_clients.get, 'log-reader', self._parse_line, maxlen=self.STREAM_BUFFER_SIZE
+            )
+        }
     
-    def _initialize_docker_client(self):
-        """Initialize Docker client with fallback methods"""
-        try:
-            # Method 1: Try environment variables
-            client = docker.from_env()
-            # Test connection
-            client.ping()
-            logging.info("Docker connection successful using environment")
-            return client
-        except Exception as e1:
-            logging.warning(f"Docker from_env failed: {e1}")
-            
-            try:
-                # Method 2: Try Unix socket directly
-                client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-                client.ping()
-                logging.info("Docker connection successful using Unix socket")  
-                return client
-            except Exception as e2:
-                logging.warning(f"Docker Unix socket failed: {e2}")
-                
-                try:
-                    # Method 3: Try TCP connection (if Docker API is exposed)
-                    client = docker.DockerClient(base_url='tcp://localhost:2376')
-                    client.ping()
-                    logging.info("Docker connection successful using TCP")
-                    return client
-                except Exception as e3:
-                    logging.error(f"All Docker connection methods failed: {e1}, {e2}, {e3}")
-                    raise e3
+    @property
+    def client(self):
+        """Shared Docker client, connected on first use (None if Docker is unreachable)"""
+        return docker_clients.get()
     
+    @coalesced(ttl=2)
     def get_log_reader_logs(self, lines: int = 100) -> List[Dict]:
         """
         Get logs from the log-reader container and parse them into structured data
@@ -51,8 +30,14 @@ class LogReaderService:
         if not self.client:
             return []
         
+        # Serve from the follow stream's buffer once it has data
+        stream = self.streams['log-reader']
+        stream.ensure_started()
+        if stream.ready and stream.buffer and lines <= self.STREAM_BUFFER_SIZE:
+            return self._with_current_status(stream.latest(lines))
+        
         try:
-            container = self.client.containers.get('log-reader')
+            container = docker_clients.container('log-reader')
             if container.status != 'running':
                 return []
             
@@ -64,6 +49,42 @@ class LogReaderService:
             logging.error(f"Error reading log-reader container logs: {e}")
             return []
     
+    def sync_entries(self, container_name: str = 'log-reader') -> int:
+        """
+        Persist the container's log lines written since the newest stored
+        entry, returning how many were stored. Docker's `since` is whole
+        seconds, so lines of that second already stored are skipped.
+        """
+        from services.log_entry_store import log_entries
+        
+        if not self.client:
+            return 0
+        try:
+            container = docker_clients.container(container_name)
+            last_ts = log_entries.last_timestamp(container_name)
+            if last_ts:
+                logs = container.logs(since=timestamp_to_unix(last_ts), timestamps=True)
+            else:
+                logs = container.logs(tail=self.STREAM_BUFFER_SIZE, timestamps=True)
+        except Exception as e:
+            logging.error(f"Error reading {container_name} logs for storage: {e}")
+            return 0
+        
+        last_key = timestamp_key(last_ts) if last_ts else None
+        entries = []
+        for line in logs.decode('utf-8', errors='replace').split('\n'):
+            if not line.strip():
+                continue
+            try:
+                entry = self._parse_line(line)
+            except Exception as e:
+                logging.error(f"Error parsing log line: {line}, error: {e}")
+                continue
+            if last_key and timestamp_key(entry['timestamp']) <= last_key:
+                continue
+            entries.append(entry)
+        return log_entries.append(container_name, entries)
+    
     def _parse_strategy_logs(self, logs: str) -> List[Dict]:
         """
         Parse the strategy manager logs into structured data
@@ -71,155 +92,99 @@ class LogReaderService:
         parsed_logs = []
         lines = logs.strip().split('\n')
         
-        current_status = {}
-        
         for line in lines:
             if not line.strip():
                 continue
             
             try:
-                # Extract timestamp and message
-                timestamp_match = re.match(r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z)\s+(.+)$', line)
-                if timestamp_match:
-                    timestamp_str = timestamp_match.group(1)
-                    message = timestamp_match.group(2)
-                else:
-                    # Fallback for logs without Docker timestamp
-                    message = line
-                    timestamp_str = datetime.utcnow().isoformat() + 'Z'
-                
-                # Parse different log types
-                log_entry = self._parse_log_message(message, timestamp_str)
+                log_entry = self._parse_line(line)
                 if log_entry:
                     parsed_logs.append(log_entry)
-                    
-                    # Update current status if it's a status entry
-                    if log_entry['type'] == 'status_update':
-                        current_status.update(log_entry.get('data', {}))
                         
             except Exception as e:
                 logging.error(f"Error parsing log line: {line}, error: {e}")
                 continue
         
+        parsed_logs.sort(key=lambda x: x['timestamp'], reverse=True)
+        return self._with_current_status(parsed_logs)
+    
+    def _parse_line(self, line: str) -> Optional[Dict]:
+        """Parse one raw container log line into a structured entry"""
+        # Extract timestamp and message in the same pass as classification
+        token = tokenize(line)
+        # Fallback for logs without Docker timestamp
+        timestamp_str = token.docker_ts or datetime.utcnow().isoformat() + 'Z'
+        
+        # Parse different log types
+        return self._parse_log_message(token, timestamp_str)
+    
+    def _with_current_status(self, entries: List[Dict]) -> List[Dict]:
+        """Prepend the status accumulated over newest-first entries"""
+        current_status = {}
+        for log_entry in reversed(entries):
+            # Update current status if it's a status entry
+            if log_entry['type'] == 'status_update':
+                current_status.update(log_entry.get('data', {}))
+        
         # Add current status as the latest entry if we have it
         if current_status:
-            parsed_logs.append({
+            return [{
                 'timestamp': datetime.utcnow().isoformat() + 'Z',
                 'type': 'current_status',
                 'message': 'Current Trading Status',
                 'data': current_status,
                 'level': 'info'
-            })
-        
-        return sorted(parsed_logs, key=lambda x: x['timestamp'], reverse=True)
+            }] + entries
+        return entries
     
-    def _parse_log_message(self, message: str, timestamp: str) -> Optional[Dict]:
+    # Display attributes for marker lines: type -> (message, level, icon)
+    EVENT_DISPLAY = {
+        'system_alert': ('Containers detected - API calls disabled', 'warning', 'exclamation-triangle'),
+        'system_start': ('Trading Strategy Manager started', 'success', 'play-circle'),
+        'trading_mode': ('Live trading mode activated', 'info', 'broadcast-pin'),
+        'monitoring_start': ('Live trading monitoring started', 'success', 'rocket'),
+        'status_header': ('Status Report', 'info', 'info-circle'),
+    }
+    
+    def _parse_log_message(self, token: LogToken, timestamp: str) -> Optional[Dict]:
         """
-        Parse individual log messages into structured format
+        Turn a tokenized log line into the structured display format
         """
         log_entry = {
             'timestamp': timestamp,
-            'raw_message': message,
+            'raw_message': f"{token.log_ts} - {token.message}" if token.log_ts else token.message,
             'level': 'info'
         }
         
-        # Remove timestamp prefix if present in message
-        message = re.sub(r'^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - ', '', message)
-        
-        # Parse different message types
-        if '🔴 Containers detected running - DISABLING API calls' in message:
-            log_entry.update({
-                'type': 'system_alert',
-                'message': 'Containers detected - API calls disabled',
-                'level': 'warning',
-                'icon': 'exclamation-triangle'
-            })
-            
-        elif 'Starting Trading Strategy Manager' in message:
-            log_entry.update({
-                'type': 'system_start',
-                'message': 'Trading Strategy Manager started',
-                'level': 'success',
-                'icon': 'play-circle'
-            })
-            
-        elif '🔄 LIVE TRADING DETECTED' in message:
+        if token.kind in self.EVENT_DISPLAY:
+            message, level, icon = self.EVENT_DISPLAY[token.kind]
             log_entry.update({
-                'type': 'trading_mode',
-                'message': 'Live trading mode activated',
-                'level': 'info',
-                'icon': 'broadcast-pin'
-            })
-            
-        elif '🚀 Live trading detected' in message:
-            log_entry.update({
-                'type': 'monitoring_start',
-                'message': 'Live trading monitoring started',
-                'level': 'success',
-                'icon': 'rocket'
+                'type': token.kind,
+                'message': message,
+                'level': level,
+                'icon': icon
             })
             
-        elif '=== Current Status ===' in message:
+        elif token.kind == 'status' and token.raw:
             log_entry.update({
-                'type': 'status_header',
-                'message': 'Status Report',
+                'type': 'status_update',
+                'message': f"{token.key}: {token.raw}",
+                'data': {token.key: token.raw},
                 'level': 'info',
-                'icon': 'info-circle'
+                'icon': 'info'
             })
-            
-        elif self._is_status_line(message):
-            status_data = self._parse_status_line(message)
-            if status_data:
-                log_entry.update({
-                    'type': 'status_update',
-                    'message': f"{status_data['key']}: {status_data['value']}",
-                    'data': {status_data['key']: status_data['value']},
-                    'level': 'info',
-                    'icon': 'info'
-                })
                 
         else:
             log_entry.update({
                 'type': 'general',
-                'message': message,
+                'message': token.message,
                 'level': 'info',
                 'icon': 'info'
             })
         
         return log_entry
     
-    def _is_status_line(self, message: str) -> bool:
-        """Check if the message is a status line"""
-        status_patterns = [
-            r'BUY Coins Tracking:',
-            r'SELL Coins Tracking:',
-            r'BUY Success Count:',
-            r'BUY Stop Loss Count:',
-            r'SELL Success Count:',
-            r'SELL Stop Loss Count:',
-            r'Live Trade Success Count:',
-            r'Live Trade Failure Count:',
-            r'BUY Container Running:',
-            r'SELL Container Running:',
-            r'Waiting for BUY start:',
-            r'Waiting for SELL start:',
-            r'API Calls Enabled:',
-            r'Weekly Reset In Progress:',
-            r'Current IST Time:',
-            r'Next Weekly Reset:'
-        ]
-        
-        return any(re.search(pattern, message) for pattern in status_patterns)
-    
-    def _parse_status_line(self, message: str) -> Optional[Dict]:
-        """Parse status line into key-value pair"""
-        match = re.match(r'^(.+?):\s*(.+)$', message)
-        if match:
-            key = match.group(1).strip()
-            value = match.group(2).strip()
-            return {'key': key, 'value': value}
-        return None
-    
+    @coalesced(ttl=5)
     def get_trading_summary(self) -> Dict:
         """
         Get a summary of current trading status from logs
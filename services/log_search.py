@@ -0,0 +1,139 @@
+"""
+Log Entry Search
+Full-text search over stored log entries through an inverted index, with
+type/level/icon facets and a log-time range
+"""
+
+import logging
+import re
+
+from sqlalchemy import func, literal_column, or_, select, text
+
+from app import db
+from models import LogEntry
+from services.log_entry_store import ENTRY_COLUMNS, _to_entry
+
+FACET_FIELDS = ('type', 'level', 'icon')
+
+# SQLite: external-content FTS5 table over log_entry, kept in sync by triggers
+SQLITE_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS log_entry_fts USING fts5("
+    "message, raw_message, content='log_entry', content_rowid='seq')",
+    "CREATE TRIGGER IF NOT EXISTS log_entry_fts_insert AFTER INSERT ON log_entry BEGIN "
+    "INSERT INTO log_entry_fts(rowid, message, raw_message) VALUES (new.seq, new.message, new.raw_message); END",
+    "CREATE TRIGGER IF NOT EXISTS log_entry_fts_delete AFTER DELETE ON log_entry BEGIN "
+    "INSERT INTO log_entry_fts(log_entry_fts, rowid, message, raw_message) "
+    "VALUES ('delete', old.seq, old.message, old.raw_message); END",
+)
+
+# PostgreSQL: GIN index on the same expression the search filters on
+PG_DOCUMENT = "to_tsvector('simple', coalesce(message, '') || ' ' || coalesce(raw_message, ''))"
+PG_INDEX_DDL = f"CREATE INDEX IF NOT EXISTS idx_log_entry_search ON log_entry USING gin ({PG_DOCUMENT})"
+
+TERM_PATTERN = re.compile(r'[^\W_]+\*?')
+
+
+def fts5_query(query):
+    """
+    Free text -> FTS5 MATCH expression: every word must appear, and a
+    trailing * makes a word a prefix. Quoting each word keeps FTS5 operator
+    syntax in user input from being interpreted.
+    """
+    terms = []
+    for term in TERM_PATTERN.findall(query):
+        prefix = term.endswith('*')
+        terms.append(f'"{term.rstrip("*")}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+class LogSearch:
+    """Searches LogEntry through the dialect's full-text index.
+
+    SQLite uses FTS5 and PostgreSQL a tsvector GIN index; both match whole
+    words of message and raw_message, so a search costs index lookups for
+    its words rather than a scan of every stored line.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    @property
+    def dialect(self):
+        return db.engine.dialect.name
+
+    def ensure_index(self):
+        """Create the full-text index, indexing entries stored before it existed"""
+        with db.engine.begin() as connection:
+            if self.dialect == 'sqlite':
+                exists = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'log_entry_fts'"
+                )).first()
+                for statement in SQLITE_INDEX_DDL:
+                    connection.execute(text(statement))
+                if not exists:
+                    connection.execute(text("INSERT INTO log_entry_fts(log_entry_fts) VALUES ('rebuild')"))
+                    self.logger.info("Built log_entry_fts search index")
+            elif self.dialect == 'postgresql':
+                connection.execute(text(PG_INDEX_DDL))
+
+    def _match(self, query):
+        """Condition on LogEntry for entries containing every word of query"""
+        if self.dialect == 'sqlite':
+            fts_query = fts5_query(query)
+            if not fts_query:
+                return None
+            return LogEntry.seq.in_(
+                select(literal_column('rowid')).select_from(text('log_entry_fts'))
+                .where(text('log_entry_fts MATCH :fts_query').bindparams(fts_query=fts_query))
+            )
+        if self.dialect == 'postgresql':
+            return literal_column(PG_DOCUMENT).op('@@')(func.plainto_tsquery('simple', query))
+        return or_(*[
+            column.ilike(f'%{term}%') for term in query.split() for column in (LogEntry.message, LogEntry.raw_message)
+        ])
+
+    def search(self, query='', container='log-reader', start=None, end=None, facets=None, limit=100):
+        """
+        Entries matching query within [start, end] and the facet filters,
+        newest first. facets maps type/level/icon to the accepted values.
+
+        Facet counts cover the text and time match with every facet filter
+        applied except the facet's own, so they show what each choice of
+        that facet would return.
+        """
+        conditions = [LogEntry.container == container]
+        if query and query.strip():
+            match = self._match(query)
+            if match is None:
+                return {'entries': [], 'total': 0, 'facets': {field: {} for field in FACET_FIELDS}}
+            conditions.append(match)
+        if start is not None:
+            conditions.append(LogEntry.logged_at >= start)
+        if end is not None:
+            conditions.append(LogEntry.logged_at <= end)
+
+        facets = {field: set(values) for field, values in (facets or {}).items() if values}
+        rows = db.session.execute(
+            select(*ENTRY_COLUMNS).where(
+                *conditions, *[getattr(LogEntry, field).in_(values) for field, values in facets.items()]
+            ).order_by(LogEntry.seq.desc()).limit(limit)
+        ).all()
+
+        # One grouped pass over the match; the total and facet counts are derived from it
+        columns = [getattr(LogEntry, field) for field in FACET_FIELDS]
+        groups = db.session.execute(select(*columns, func.count()).where(*conditions).group_by(*columns)).all()
+        total = 0
+        counts = {field: {} for field in FACET_FIELDS}
+        for *values, count in groups:
+            rejected = [field for field, value in zip(FACET_FIELDS, values)
+                        if field in facets and value not in facets[field]]
+            if not rejected:
+                total += count
+            for field, value in zip(FACET_FIELDS, values):
+                if value is not None and rejected in ([], [field]):
+                    counts[field][value] = counts[field].get(value, 0) + count
+        return {'entries': [_to_entry(row) for row in rows], 'total': total, 'facets': counts}
+
+
+# Global instance
+log_search = LogSearch()
@@ -0,0 +1,167 @@
+"""
+Incremental byte-offset tailing for append-only log files
+"""
+import base64
+import hashlib
+import json
+import logging
+import os
+
+
+class LogTail:
+    """Read only the bytes appended to a log file since the previous read.
+
+    The checkpoint holds the file's inode, the byte offset consumed so far,
+    a fingerprint of the first bytes of the file and the unterminated last
+    line. It is persisted together with any caller state so a restarted
+    process resumes where the previous one stopped, and reloaded when another
+    process rewrites it. Paths are compared in absolute form. Rotation (new inode),
+    truncation (size below offset) and rewrites in place (head fingerprint
+    mismatch) all restart reading from the beginning of the file.
+    """
+
+    HEAD_BYTES = 256
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, checkpoint_path):
+        self.logger = logging.getLogger(__name__)
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint = None
+        self.state = None
+        self._stamp = None
+        self._load()
+
+    def _file_stamp(self):
+        """(inode, mtime) of the persisted checkpoint; commits replace the file, so it changes with each"""
+        try:
+            stat = os.stat(self.checkpoint_path)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self):
+        """Load a persisted checkpoint if one exists"""
+        try:
+            self._stamp = self._file_stamp()
+            if self._stamp is not None:
+                with open(self.checkpoint_path, 'r') as f:
+                    data = json.load(f)
+                self.checkpoint = data.get('checkpoint')
+                self.state = data.get('state')
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable log checkpoint {self.checkpoint_path}: {e}")
+            self.checkpoint = None
+            self.state = None
+
+    def reload_if_changed(self):
+        """Reload the checkpoint if another process committed one since ours; returns True if it did"""
+        stamp = self._file_stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self.checkpoint = None
+        self.state = None
+        self._load()
+        return True
+
+    def _fingerprint(self, f):
+        """Hash the first HEAD_BYTES of an open file"""
+        f.seek(0)
+        head = f.read(self.HEAD_BYTES)
+        return len(head), hashlib.sha1(head).hexdigest()
+
+    def _is_same_file(self, path, stat, f):
+        """Check whether the checkpoint still describes this file"""
+        cp = self.checkpoint
+        if not cp or os.path.abspath(cp.get('path', '')) != path or cp.get('inode') != stat.st_ino:
+            return False
+        if stat.st_size < cp.get('offset', 0):
+            return False
+        f.seek(0)
+        head = f.read(cp.get('head_len', 0))
+        return hashlib.sha1(head).hexdigest() == cp.get('head_hash')
+
+    def rewind(self):
+        """Forget the checkpoint so the next read starts at byte 0"""
+        self.checkpoint = None
+        self.state = None
+
+    def read(self, path):
+        """
+        Return (reset, lines) for the data appended to path since the last read.
+
+        reset is True when reading restarted at the beginning of the file, in
+        which case callers must discard any state derived from earlier reads.
+        lines is a generator of complete decoded lines; the in-memory
+        checkpoint advances as it is consumed.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            reset = not self._is_same_file(path, stat, f)
+            head_len, head_hash = self._fingerprint(f)
+
+        if reset:
+            if self.checkpoint:
+                self.logger.info(f"Log file {path} was rotated or truncated, reading from the start")
+            offset, carry = 0, b''
+        else:
+            offset = self.checkpoint['offset']
+            carry = base64.b64decode(self.checkpoint.get('carry', ''))
+
+        self.checkpoint = {
+            'path': path,
+            'inode': stat.st_ino,
+            'offset': offset,
+            'carry': base64.b64encode(carry).decode('ascii'),
+            'head_len': head_len,
+            'head_hash': head_hash
+        }
+        return reset, self._iter_lines(path, offset, carry)
+
+    def _iter_lines(self, path, offset, carry):
+        """Yield complete lines from offset onwards, keeping the partial tail as carry"""
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                chunk = f.read(self.CHUNK_SIZE)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                data = carry + chunk
+                lines = data.split(b'\n')
+                carry = lines.pop()
+                self.checkpoint['offset'] = offset
+                self.checkpoint['carry'] = base64.b64encode(carry).decode('ascii')
+                for line in lines:
+                    yield line.decode('utf-8', errors='replace').rstrip('\r')
+
+    def mark_read(self, path, state=None):
+        """Checkpoint path as read to its end (lines parsed elsewhere) and persist state with it"""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            head_len, head_hash = self._fingerprint(f)
+        self.checkpoint = {
+            'path': path,
+            'inode': stat.st_ino,
+            'offset': stat.st_size,
+            'carry': '',
+            'head_len': head_len,
+            'head_hash': head_hash
+        }
+        self.commit(state)
+
+    def commit(self, state=None):
+        """Persist the checkpoint together with caller state derived from the lines read"""
+        self.state = state
+        try:
+            directory = os.path.dirname(self.checkpoint_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.checkpoint_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'checkpoint': self.checkpoint, 'state': state}, f)
+            os.replace(tmp_path, self.checkpoint_path)
+            self._stamp = self._file_stamp()
+        except Exception as e:
+            self.logger.error(f"Error saving log checkpoint {self.checkpoint_path}: {e}")
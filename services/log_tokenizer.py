@@ -0,0 +1,153 @@
+"""
+Single-pass log tokenizer shared by the log parsers
+Classifies each strategy manager / trading bot log line once with
+precompiled patterns and returns typed fields
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+# Docker `logs(timestamps=True)` prefix and the strategy manager's own prefix
+PREFIX_PATTERN = re.compile(
+    r'^(?:(?P<docker_ts>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?Z)\s+)?'
+    r'(?:(?P<log_ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}) - )?'
+)
+
+
+def _to_int(value):
+    return int(value.split()[0])
+
+
+def _to_float(value):
+    return float(value.split()[0].rstrip('%'))
+
+
+def _to_bool(value):
+    return 'True' in value
+
+
+# Keyword dispatch table: "<Key>: <value>" lines -> (kind, field, converter)
+FIELD_KEYS = {
+    'BUY Coins Tracking': ('status', 'buy_coins_tracking', _to_int),
+    'SELL Coins Tracking': ('status', 'sell_coins_tracking', _to_int),
+    'BUY Success Count': ('status', 'buy_success_count', _to_int),
+    'BUY Stop Loss Count': ('status', 'buy_stop_loss_count', _to_int),
+    'SELL Success Count': ('status', 'sell_success_count', _to_int),
+    'SELL Stop Loss Count': ('status', 'sell_stop_loss_count', _to_int),
+    'Live Trade Success Count': ('status', 'live_trade_success_count', _to_int),
+    'Live Trade Failure Count': ('status', 'live_trade_failure_count', _to_int),
+    'BUY Container Running': ('status', 'buy_container_running', _to_bool),
+    'SELL Container Running': ('status', 'sell_container_running', _to_bool),
+    'Waiting for BUY start': ('status', 'waiting_for_buy_start', _to_bool),
+    'Waiting for SELL start': ('status', 'waiting_for_sell_start', _to_bool),
+    'API Calls Enabled': ('status', 'api_calls_enabled', _to_bool),
+    'Weekly Reset In Progress': ('status', 'weekly_reset_in_progress', _to_bool),
+    'Current IST Time': ('status', 'current_time', str),
+    'Next Weekly Reset': ('status', 'next_weekly_reset', str),
+    'Position Size': ('position_field', 'size', _to_float),
+    'Entry Price': ('position_field', 'entry_price', _to_float),
+    'Current Price': ('position_field', 'current_price', _to_float),
+    'Price Movement': ('position_field', 'price_movement', _to_float),
+}
+
+# Marker lines that carry no "Key: value" payload -> kind
+EVENT_MARKERS = {
+    '🔴 Containers detected running - DISABLING API calls': 'system_alert',
+    'Starting Trading Strategy Manager': 'system_start',
+    '🔄 LIVE TRADING DETECTED': 'trading_mode',
+    '🚀 Live trading detected': 'monitoring_start',
+    '=== Current Status ===': 'status_header',
+    '🆕 New position detected': 'new_position',
+}
+
+
+def _alternation(keys):
+    # Longest first so overlapping keywords resolve to the most specific one
+    return '|'.join(re.escape(k) for k in sorted(keys, key=len, reverse=True))
+
+
+# Coin tracking lines and position block markers, also usable on their own
+COIN_PATTERN_TEXT = r'^-\s+(?P<coin>[^:\s]+):\s*Entry\s+(?P<entry>-?[\d.]+)(?:\s*\(Added:\s*(?P<added>[^)]*)\))?'
+POSITION_PATTERN_TEXT = r'📈 Managing (?P<side>LONG|SHORT) position for (?P<symbol>[A-Z0-9]+):'
+COIN_PATTERN = re.compile(COIN_PATTERN_TEXT)
+POSITION_PATTERN = re.compile(POSITION_PATTERN_TEXT)
+
+LINE_PATTERN = re.compile(
+    COIN_PATTERN_TEXT
+    + r'|' + POSITION_PATTERN_TEXT
+    + r'|(?P<key>' + _alternation(FIELD_KEYS) + r'):\s*(?P<value>.*)'
+    r'|(?P<event>' + _alternation(EVENT_MARKERS) + r')'
+)
+
+
+def coin_value(match):
+    return {'symbol': match.group('coin'), 'entry': float(match.group('entry')),
+            'added': (match.group('added') or '').strip()}
+
+
+def position_value(match):
+    return {'side': match.group('side'), 'symbol': match.group('symbol')}
+
+
+class LogToken(NamedTuple):
+    """One classified log line.
+
+    kind is one of 'status', 'coin', 'position', 'position_field', an
+    EVENT_MARKERS kind, 'general' or 'blank'. For 'status' and
+    'position_field' lines, key is the original label, field the normalized
+    name, raw the text value and value the converted one.
+    """
+    kind: str
+    message: str
+    docker_ts: Optional[str] = None
+    log_ts: Optional[str] = None
+    key: Optional[str] = None
+    field: Optional[str] = None
+    raw: Optional[str] = None
+    value: object = None
+
+
+def tokenize(line):
+    """Classify a single log line in one pass"""
+    docker_ts = log_ts = None
+    if line[:1].isdigit():
+        prefix = PREFIX_PATTERN.match(line)
+        docker_ts = prefix.group('docker_ts')
+        log_ts = prefix.group('log_ts')
+        line = line[prefix.end():]
+
+    message = line.strip()
+    if not message:
+        return LogToken('blank', message, docker_ts, log_ts)
+
+    match = LINE_PATTERN.search(message)
+    if not match:
+        return LogToken('general', message, docker_ts, log_ts)
+
+    key = match.group('key')
+    if key:
+        kind, field, convert = FIELD_KEYS[key]
+        raw = match.group('value').strip()
+        try:
+            value = convert(raw)
+        except (ValueError, IndexError):
+            value = None
+        return LogToken(kind, message, docker_ts, log_ts, key, field, raw, value)
+
+    coin = match.group('coin')
+    if coin:
+        return LogToken('coin', message, docker_ts, log_ts, field='coin', raw=coin, value=coin_value(match))
+
+    side = match.group('side')
+    if side:
+        return LogToken('position', message, docker_ts, log_ts, field='position', raw=side, value=position_value(match))
+
+    return LogToken(EVENT_MARKERS[match.group('event')], message, docker_ts, log_ts)
+
+
+def tokenize_lines(lines):
+    """Tokenize an iterable of lines, skipping blank ones"""
+    for line in lines:
+        token = tokenize(line)
+        if token.kind != 'blank':
+            yield token
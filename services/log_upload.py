@@ -0,0 +1,92 @@
+"""
+Streaming log uploads
+Decompresses an uploaded log chunk by chunk into a temporary file next to
+its destination, yielding decoded lines as they are written
+"""
+
+import codecs
+import gzip
+import logging
+import os
+import tempfile
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Raised while reading corrupt or truncated compressed data
+DECOMPRESSION_ERRORS = (gzip.BadGzipFile, EOFError, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+
+def open_decompressed(stream):
+    """
+    Wrap a seekable binary upload stream so reads return decompressed bytes.
+    gzip and zstd are detected from their magic numbers; anything else is
+    read as is. Raises ValueError for zstd uploads when zstandard is missing.
+    """
+    head = stream.read(len(ZSTD_MAGIC))
+    stream.seek(0)
+    if head.startswith(GZIP_MAGIC):
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if head == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ValueError('zstd-compressed uploads require the zstandard package')
+        return zstandard.ZstdDecompressor().stream_reader(stream, read_across_frames=True)
+    return stream
+
+
+def stream_log_upload(stream, dest_path, chunk_size=CHUNK_SIZE):
+    """
+    Copy an upload to dest_path and yield its lines while copying.
+
+    The decompressed data goes to a temporary file in the destination
+    directory that replaces dest_path atomically once the generator is
+    exhausted, so readers of dest_path only ever see the previous or the
+    complete new file. A missing final newline is added. Memory use is
+    bounded by chunk_size whatever the upload size. Corrupt compressed data
+    raises ValueError and leaves dest_path untouched.
+    """
+    source = open_decompressed(stream)
+    directory = os.path.dirname(dest_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.upload-', suffix='.tmp')
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            pending = ''
+            size = 0
+            while True:
+                try:
+                    chunk = source.read(chunk_size)
+                except DECOMPRESSION_ERRORS as e:
+                    raise ValueError(f"Corrupt compressed upload: {e}") from e
+                if not chunk:
+                    break
+                out.write(chunk)
+                size += len(chunk)
+                *lines, pending = (pending + decoder.decode(chunk)).split('\n')
+                for line in lines:
+                    yield line.rstrip('\r')
+
+            pending += decoder.decode(b'', final=True)
+            if pending:
+                out.write(b'\n')
+                yield pending.rstrip('\r')
+            out.flush()
+            os.fsync(out.fileno())
+
+        # mkstemp creates the file private; keep the permissions a plain open() would give
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        os.replace(tmp_path, dest_path)
+        logging.getLogger(__name__).info(f"Stored uploaded log {dest_path} ({size} bytes)")
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
@@ -0,0 +1,105 @@
+"""
+Mark-to-Market
+Keeps the latest mark price per symbol and revalues every open position in
+those symbols at once: one query loads them as arrays, NumPy computes the
+unrealized PnL and one statement writes the changed rows back
+"""
+
+import logging
+import threading
+
+import numpy as np
+from sqlalchemy import Float, Integer, column, select, update, values
+
+from app import db
+from models import TradingSession
+
+
+def unrealized_pnl(mark, entry_price, size, is_long):
+    """Vectorized EnhancedLogParser._calculate_pnl: long gains as the mark rises, anything else as it falls"""
+    return np.where(is_long, 1.0, -1.0) * (mark - entry_price) * size
+
+
+class MarkToMarket:
+    """Revalues open positions from a latest-price map.
+
+    Each symbol has one price however many users hold it, so a tick for a
+    symbol held by 200 positions costs one SELECT and one UPDATE. On
+    PostgreSQL the changed rows are written with a single
+    UPDATE ... FROM (VALUES ...); elsewhere with one executemany.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.latest = {}
+
+    def update_prices(self, prices):
+        """Record {symbol: price} ticks; later ticks replace earlier ones"""
+        with self._lock:
+            self.latest.update({symbol: price for symbol, price in prices.items() if price is not None})
+
+    def revalue(self, symbols=None):
+        """
+        Recompute pnl and unrealized_pnl of the open positions in symbols
+        (default: every priced symbol) in the current session, without
+        committing. Returns ({(user, symbol): (side, pnl)} for every position
+        revalued, number of rows whose PnL changed).
+        """
+        with self._lock:
+            prices = {symbol: self.latest[symbol] for symbol in (symbols or self.latest) if symbol in self.latest}
+        if not prices:
+            return {}, 0
+
+        rows = db.session.connection().execute(
+            select(
+                TradingSession.id, TradingSession.user, TradingSession.symbol, TradingSession.side,
+                TradingSession.entry_price, TradingSession.position_size,
+                TradingSession.pnl, TradingSession.unrealized_pnl
+            ).where(TradingSession.status == 'OPEN', TradingSession.symbol.in_(prices))
+        ).all()
+        if not rows:
+            return {}, 0
+        ids, users, symbols, sides, entry_price, size, pnl, unrealized = zip(*rows)
+
+        # Gather each distinct symbol's price onto its rows
+        codes = {symbol: code for code, symbol in enumerate(prices)}
+        marks = np.array(list(prices.values()), dtype=np.float64)[
+            np.fromiter((codes[symbol] for symbol in symbols), dtype=np.int64, count=len(symbols))
+        ]
+        new_pnl = unrealized_pnl(
+            marks,
+            np.array(entry_price, dtype=np.float64),
+            np.array(size, dtype=np.float64),
+            np.array(sides) == 'LONG'
+        )
+        # None reads as NaN, which never compares equal, so unset PnL is written
+        changed = (new_pnl != np.array(pnl, dtype=np.float64)) | (new_pnl != np.array(unrealized, dtype=np.float64))
+        changed_ids = np.array(ids, dtype=np.int64)[changed]
+        if len(changed_ids):
+            self._write(changed_ids.tolist(), new_pnl[changed].tolist())
+
+        revalued = {
+            (user, symbol): (side, value)
+            for user, symbol, side, value in zip(users, symbols, sides, new_pnl.tolist())
+        }
+        return revalued, len(changed_ids)
+
+    def _write(self, ids, pnl):
+        if db.engine.dialect.name == 'postgresql':
+            marks = values(column('id', Integer), column('pnl', Float), name='marks').data(list(zip(ids, pnl)))
+            db.session.execute(
+                update(TradingSession)
+                .where(TradingSession.id == marks.c.id)
+                .values(pnl=marks.c.pnl, unrealized_pnl=marks.c.pnl)
+                .execution_options(synchronize_session=False)
+            )
+        else:
+            db.session.execute(update(TradingSession), [
+                {'id': position_id, 'pnl': value, 'unrealized_pnl': value}
+                for position_id, value in zip(ids, pnl)
+            ])
+
+
+# Global instance
+mark_to_market = MarkToMarket()
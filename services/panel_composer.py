@@ -0,0 +1,137 @@
+"""
+Deadline-bounded panel composition
+Fetches independent dashboard panels concurrently and renders whatever is
+ready by the deadline, falling back to each panel's last good value
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from flask import g, has_app_context
+
+FRESH = 'fresh'
+STALE = 'stale'
+UNAVAILABLE = 'unavailable'
+
+
+class PanelComposer:
+    """Runs panel loaders on a bounded thread pool under an overall deadline.
+
+    A panel that fails or misses the deadline is rendered from its last good
+    value ('stale') or its default ('unavailable'). A loader that overruns
+    keeps running in the background and still records its result; until it
+    finishes, later requests do not start another copy of it, so a hung
+    dependency occupies at most one pool thread per panel.
+    """
+
+    def __init__(self, name, max_workers=None, deadline=None, context=None):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.max_workers = max_workers or int(os.environ.get('DASHBOARD_WORKERS', 8))
+        self.deadline = deadline or float(os.environ.get('DASHBOARD_DEADLINE_SECONDS', 3))
+        self.context = context
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._last_good = {}
+        self._in_flight = {}
+        self._durations = {}
+
+    def _get_executor(self):
+        """Thread pool for this process, created lazily (fork-safe)"""
+        pid = os.getpid()
+        with self._lock:
+            if self._pid != pid:
+                # A pool inherited through fork has no live threads
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix=f'panel-{self.name}')
+                self._in_flight = {}
+                self._pid = pid
+            return self._executor
+
+    def _load(self, panel, loader):
+        started = time.monotonic()
+        try:
+            if self.context:
+                with self.context():
+                    value = loader()
+                    # Set by SingleFlight when the loader was served a stale cached value
+                    served_stale = g.get('served_stale', False)
+            else:
+                value, served_stale = loader(), False
+            with self._lock:
+                self._last_good[panel] = value
+            return value, served_stale
+        finally:
+            with self._lock:
+                self._durations[panel] = (time.monotonic() - started) * 1000
+
+    def _finished(self, panel, future):
+        with self._lock:
+            if self._in_flight.get(panel) is future:
+                del self._in_flight[panel]
+        error = future.exception()
+        if error is not None:
+            self.logger.error(f"{self.name} panel {panel} failed: {error}")
+
+    def compose(self, panels, deadline=None):
+        """
+        Load panels given as {name: (loader, default)} concurrently.
+        Returns (values, states) where states maps each panel to 'fresh',
+        'stale' (last good value) or 'unavailable' (default). A panel whose
+        loader got a stale single-flight value still counts as fresh, but the
+        response is marked as served stale like any other.
+        """
+        started = time.monotonic()
+        deadline = self.deadline if deadline is None else deadline
+        executor = self._get_executor()
+
+        futures = {}
+        for panel, (loader, default) in panels.items():
+            with self._lock:
+                future = self._in_flight.get(panel)
+                started_here = future is None
+                if started_here:
+                    future = executor.submit(self._load, panel, loader)
+                    self._in_flight[panel] = future
+            if started_here:
+                # Outside the lock: the callback runs inline if the future is already done
+                future.add_done_callback(lambda done, panel=panel: self._finished(panel, done))
+            futures[panel] = future
+
+        wait(futures.values(), timeout=deadline)
+
+        values = {}
+        states = {}
+        timings = []  # per-panel load time, or the fallback state
+        degraded = []
+        any_stale = False
+        for panel, (loader, default) in panels.items():
+            future = futures[panel]
+            if future.done() and future.exception() is None:
+                values[panel], served_stale = future.result()
+                states[panel] = FRESH
+                timings.append(f"{panel}={self._durations.get(panel, 0):.0f}ms")
+                any_stale = any_stale or served_stale
+                continue
+            with self._lock:
+                has_last_good = panel in self._last_good
+                values[panel] = self._last_good.get(panel, default)
+            states[panel] = STALE if has_last_good else UNAVAILABLE
+            timings.append(f"{panel}={states[panel]}")
+            degraded.append(panel)
+
+        if (degraded or any_stale) and has_app_context():
+            # Keep etag_cached from caching this response under the current data version
+            g.served_stale = True
+
+        elapsed = (time.monotonic() - started) * 1000
+        message = f"{self.name} composed in {elapsed:.0f}ms ({', '.join(timings)})"
+        if degraded:
+            self.logger.warning(message)
+        else:
+            self.logger.info(message)
+        return values, states
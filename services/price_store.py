@@ -0,0 +1,183 @@
+"""
+Mark Price Store
+Appends every mark price the bots report to compact per-symbol arrays,
+flushes them to PriceMark periodically and keeps 1m/1h/1d OHLC rollups
+current as marks arrive, so price history is served from PriceBar rows
+"""
+
+import logging
+import os
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+
+from sqlalchemy import insert, tuple_, update
+
+from app import db
+from models import PriceBar, PriceMark
+from services.data_version import mark_changed
+
+# Rollup resolutions and their bucket widths in seconds (UTC-aligned)
+RESOLUTIONS = {'1m': 60, '1h': 3600, '1d': 86400}
+
+
+def _epoch(moment):
+    """Unix seconds of a naive UTC datetime"""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _utc(seconds):
+    """Naive UTC datetime of Unix seconds, matching the other DateTime columns"""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+
+def merge_bar(bar, other):
+    """
+    Fold other into bar in place. Bars are [open, high, low, close, marks,
+    first_time, last_time]; stored rows have no times and count as older.
+    """
+    if other[5] < bar[5]:
+        bar[0], bar[5] = other[0], other[5]
+    if other[6] >= bar[6]:
+        bar[3], bar[6] = other[3], other[6]
+    bar[1] = max(bar[1], other[1])
+    bar[2] = min(bar[2], other[2])
+    bar[4] += other[4]
+
+
+class PriceStore:
+    """Buffers mark prices in memory and writes them in periodic batches.
+
+    Marks are appended to three parallel arrays (time, price, unrealized
+    PnL) per (symbol, user, side), and each one updates the open 1m, 1h and
+    1d bars of its symbol in O(1). flush() writes the buffered marks with one
+    bulk INSERT and merges the touched bars into PriceBar with one lookup
+    query, once flush_interval seconds have passed since the last flush.
+    Marks only reach the API once flushed. Only the ingesting process
+    records marks, so unflushed ones are lost if it exits.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.logger = logging.getLogger(__name__)
+        self.flush_interval = flush_interval or float(os.environ.get('PRICE_FLUSH_SECONDS', 60))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._series = {}
+        self._bars = {}
+        self._buffered = 0
+        self._last_flush = time.monotonic()
+
+    def record(self, marks):
+        """Buffer marks given as (symbol, user, side, recorded_at, price, unrealized_pnl)"""
+        with self._lock:
+            # A forked worker does not own the parent's buffer
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._reset()
+            for symbol, user, side, recorded_at, price, unrealized_pnl in marks:
+                if price is None:
+                    continue
+                seconds = _epoch(recorded_at)
+                series = self._series.get((symbol, user, side))
+                if series is None:
+                    series = self._series[(symbol, user, side)] = (array('d'), array('d'), array('d'))
+                series[0].append(seconds)
+                series[1].append(price)
+                series[2].append(float('nan') if unrealized_pnl is None else unrealized_pnl)
+                self._buffered += 1
+
+                for resolution, width in RESOLUTIONS.items():
+                    key = (symbol, resolution, seconds - seconds % width)
+                    bar = self._bars.get(key)
+                    if bar is None:
+                        self._bars[key] = [price, price, price, price, 1, seconds, seconds]
+                    else:
+                        merge_bar(bar, [price, price, price, price, 1, seconds, seconds])
+
+    def flush_if_due(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            return self.flush()
+        return 0
+
+    def flush(self):
+        """Write buffered marks and their bars in one transaction; returns the marks written"""
+        with self._lock:
+            if not self._buffered:
+                self._last_flush = time.monotonic()
+                return 0
+            try:
+                rows = []
+                for (symbol, user, side), (times, prices, pnls) in self._series.items():
+                    for seconds, price, pnl in zip(times, prices, pnls):
+                        rows.append({
+                            'symbol': symbol,
+                            'user': user,
+                            'side': side,
+                            'recorded_at': _utc(seconds),
+                            'price': price,
+                            'unrealized_pnl': None if pnl != pnl else pnl
+                        })
+                db.session.execute(insert(PriceMark), rows)
+                self._merge_bars()
+                mark_changed(db.session, 'prices')
+                db.session.commit()
+            except Exception as e:
+                # Keep the buffer; the next flush retries it
+                self.logger.error(f"Error flushing mark prices: {e}")
+                db.session.rollback()
+                return 0
+
+            count = self._buffered
+            self._reset()
+            self.logger.info(f"Flushed {count} mark prices")
+            return count
+
+    def _merge_bars(self):
+        """Combine the buffered bars with their stored rows using one lookup query"""
+        keys = [(symbol, resolution, _utc(start)) for symbol, resolution, start in self._bars]
+        existing = {
+            (row.symbol, row.resolution, row.bucket_start): row
+            for row in PriceBar.query.filter(
+                tuple_(PriceBar.symbol, PriceBar.resolution, PriceBar.bucket_start).in_(keys)
+            ).all()
+        }
+
+        inserts = []
+        updates = []
+        for key, bar in zip(keys, self._bars.values()):
+            row = existing.get(key)
+            if row is None:
+                inserts.append({'symbol': key[0], 'resolution': key[1], 'bucket_start': key[2],
+                                'open': bar[0], 'high': bar[1], 'low': bar[2], 'close': bar[3], 'marks': bar[4]})
+                continue
+            merged = [row.open, row.high, row.low, row.close, row.marks or 0, float('-inf'), float('-inf')]
+            merge_bar(merged, bar)
+            updates.append({'id': row.id, 'high': merged[1], 'low': merged[2], 'close': merged[3], 'marks': merged[4]})
+
+        if inserts:
+            db.session.execute(insert(PriceBar), inserts)
+        if updates:
+            db.session.execute(update(PriceBar), updates)
+
+    def get_bars(self, symbol, resolution, start, end, limit=5000):
+        """OHLC bars for a symbol whose buckets start within [start, end], oldest first"""
+        bars = PriceBar.query.with_entities(
+            PriceBar.bucket_start, PriceBar.open, PriceBar.high, PriceBar.low, PriceBar.close, PriceBar.marks
+        ).filter(
+            PriceBar.symbol == symbol,
+            PriceBar.resolution == resolution,
+            PriceBar.bucket_start >= start,
+            PriceBar.bucket_start <= end
+        ).order_by(PriceBar.bucket_start).limit(limit).all()
+        return [
+            {'time': bucket_start.isoformat(), 'open': open_, 'high': high, 'low': low, 'close': close, 'marks': marks}
+            for bucket_start, open_, high, low, close, marks in bars
+        ]
+
+
+# Global instance
+price_store = PriceStore()
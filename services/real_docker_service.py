@@ -6,6 +6,10 @@ import logging
 from datetime import datetime
 import subprocess
 import os
+import threading
+from datetime import timezone
+from services.docker_client import docker_clients
+from services.single_flight import coalesced
 
 class RealDockerService:
     def __init__(self):
@@ -30,9 +34,158 @@ class RealDockerService:
                 'user': 'System'
             }
         }
+        
+        # Live container table, seeded from the daemon and kept current by events
+        self._live = {}
+        self._live_ready = False
+        self._live_version = 0
+        self._live_pid = None
+        self._live_lock = threading.Lock()
+        docker_clients.add_listener(self._on_docker_event, resync=self._seed_live_state)
+    
+    def _match_expected(self, name, container_id):
+        """Expected container name for a Docker name or id, if it is one we track"""
+        for container_name, expected in self.expected_containers.items():
+            if name == container_name or (container_id or '').startswith(expected['expected_id']):
+                return container_name
+        return None
+    
+    def _seed_live_state(self):
+        """Build the live table from one containers.list(all=True) call"""
+        client = docker_clients.get()
+        if client is None:
+            return False
+        
+        live = {}
+        for container in client.containers.list(all=True):
+            container_name = self._match_expected(container.name, container.id)
+            if container_name is None:
+                continue
+            state = container.attrs.get('State', {})
+            started_at = None
+            if state.get('Running') and state.get('StartedAt'):
+                # Docker reports nanoseconds; whole seconds are enough for uptime
+                started_at = datetime.strptime(state['StartedAt'][:19], '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
+            live[container_name] = {
+                'running': bool(state.get('Running')),
+                'state': state.get('Status', 'unknown'),
+                'health': state.get('Health', {}).get('Status') if state.get('Running') else None,
+                'started_at': started_at,
+                'container_id': container.id[:12],
+                'image': container.attrs.get('Config', {}).get('Image', self.expected_containers[container_name]['image'])
+            }
+        
+        with self._live_lock:
+            self._live = live
+            self._live_ready = True
+            self._live_pid = os.getpid()
+            self._live_version += 1
+        self.logger.info(f"Seeded live container state for {len(live)} containers")
+        return True
+    
+    def _on_docker_event(self, event):
+        """Apply a container event (start, die, restart, health_status) to the live table"""
+        action = event.get('Action') or event.get('status') or ''
+        actor = event.get('Actor', {})
+        container_name = self._match_expected(actor.get('Attributes', {}).get('name'), actor.get('ID') or event.get('id'))
+        if container_name is None:
+            return
+        
+        with self._live_lock:
+            entry = self._live.get(container_name)
+            if entry is None:
+                entry = self._live[container_name] = {
+                    'running': False, 'state': 'created', 'health': None, 'started_at': None,
+                    'container_id': (actor.get('ID') or '')[:12],
+                    'image': actor.get('Attributes', {}).get('image', self.expected_containers[container_name]['image'])
+                }
+            if action in ('start', 'restart', 'unpause'):
+                entry['running'] = True
+                entry['state'] = 'running'
+                if action != 'unpause':
+                    entry['started_at'] = datetime.fromtimestamp(event.get('time', datetime.utcnow().timestamp()), timezone.utc)
+                    entry['health'] = None
+            elif action in ('die', 'stop', 'kill', 'oom'):
+                entry['running'] = False
+                entry['state'] = 'exited'
+                entry['started_at'] = None
+                entry['health'] = None
+            elif action == 'pause':
+                entry['running'] = False
+                entry['state'] = 'paused'
+            elif action.startswith('health_status'):
+                entry['health'] = action.split(':', 1)[1].strip()
+            elif action == 'destroy':
+                del self._live[container_name]
+            else:
+                return
+            self._live_version += 1
+    
+    def _live_container_status(self):
+        """Container status from the live table, or None until it is seeded in this process"""
+        with self._live_lock:
+            ready = self._live_ready and self._live_pid == os.getpid()
+            live = {name: dict(entry) for name, entry in self._live.items()} if ready else None
+        if not ready:
+            # The table only fills in processes that reach the daemon
+            if docker_clients.get() is None:
+                return None
+            try:
+                seeded = self._seed_live_state()
+            except Exception as e:
+                # Serve the uploaded status instead; the next get() pings the daemon again
+                self.logger.warning(f"Error seeding live container state: {e}")
+                docker_clients.reset()
+                return None
+            if not seeded:
+                return None
+            return self._live_container_status()
+        
+        containers = {}
+        for container_name, expected in self.expected_containers.items():
+            entry = live.get(container_name)
+            if entry is None:
+                containers[container_name] = {
+                    'running': False,
+                    'status': 'Not Found',
+                    'uptime': 'N/A',
+                    'container_id': expected['expected_id'],
+                    'image': expected['image'],
+                    'user': expected['user']
+                }
+                continue
+            status = 'Running' if entry['running'] else entry['state'].capitalize()
+            if entry['health']:
+                status += f" ({entry['health']})"
+            containers[container_name] = {
+                'running': entry['running'],
+                'status': status,
+                'uptime': self._uptime_since(entry['started_at']) if entry['running'] else 'Stopped',
+                'container_id': entry['container_id'],
+                'image': entry['image'],
+                'user': expected['user']
+            }
+        return containers
+    
+    def _uptime_since(self, started_at):
+        if started_at is None:
+            return 'Unknown'
+        delta = datetime.now(timezone.utc) - started_at
+        hours = delta.seconds // 3600
+        if delta.days > 0:
+            return f"{delta.days} days, {hours} hours"
+        return f"{hours} hours, {delta.seconds % 3600 // 60} minutes"
     
     def get_real_container_status(self):
-        """Get real Docker container status from uploaded data or API"""
+        """Get real Docker container status from the live table, or uploaded data as a fallback"""
+        live = self._live_container_status()
+        if live is not None:
+            return live
+        return self._get_uploaded_container_status()
+    
+    @coalesced(ttl=5, version=lambda service: service.get_status_version())
+    def _get_uploaded_container_status(self):
+        """Container status from uploaded status files"""
         try:
             # Try to read from uploaded container status file
             status_file = './logs/container_status.json'
@@ -171,6 +324,16 @@ class RealDockerService:
         
         return containers
     
+    def get_status_version(self):
+        """Live table version and modification times of the uploaded status files, for cache validation"""
+        version = [self._live_version]
+        for status_file in ('./logs/container_status.json', './logs/docker_status.txt'):
+            try:
+                version.append(os.stat(status_file).st_mtime_ns)
+            except OSError:
+                version.append(None)
+        return tuple(version)
+    
     def save_container_status(self, status_data):
         """Save container status data to file"""
         try:
@@ -191,9 +354,10 @@ class RealDockerService:
             self.logger.error(f"Error saving container status: {e}")
             return False
     
-    def get_container_summary(self):
-        """Get summary of container status"""
-        containers = self.get_real_container_status()
+    def get_container_summary(self, containers=None):
+        """Get summary of container status (pass containers to avoid reading them again)"""
+        if containers is None:
+            containers = self.get_real_container_status()
         
         summary = {
             'total_containers': len(containers),
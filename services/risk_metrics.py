@@ -0,0 +1,187 @@
+"""
+Risk Metrics Service
+Drawdown, equity curve, Sharpe/Sortino, expectancy and streaks over closed
+trades, computed with vectorized NumPy operations on column arrays
+"""
+
+import logging
+import numpy as np
+from sqlalchemy import case, func, select
+
+from app import db
+from models import TradingSession
+
+# Closed trades are ordered and filtered by when they closed
+CLOSE_TIME = func.coalesce(TradingSession.closed_at, TradingSession.exit_time, TradingSession.created_at)
+
+SIDE_CODES = {'LONG': 1, 'SHORT': -1}
+
+# Crypto futures trade every day of the year
+PERIODS_PER_YEAR = 365
+
+
+def _longest_run(mask):
+    """Length of the longest run of True values"""
+    if not mask.any():
+        return 0
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    return int((ends - starts).max())
+
+
+def _downsample(count, max_points):
+    if count <= max_points:
+        return np.arange(count)
+    return np.unique(np.linspace(0, count - 1, max_points).astype(np.int64))
+
+
+def compute_metrics(pnl, closed_at, curve_points=0):
+    """
+    Risk metrics for one series of closed trades in close order.
+
+    pnl is a float64 array and closed_at a datetime64 array of the same
+    length. Sharpe and Sortino are annualized from daily PnL, with days
+    without closes counted as zero. With curve_points > 0 the equity curve
+    is included, downsampled to at most that many points.
+    """
+    count = len(pnl)
+    metrics = {
+        'trades': count,
+        'total_pnl': 0.0,
+        'win_rate': 0.0,
+        'avg_win': 0.0,
+        'avg_loss': 0.0,
+        'expectancy': 0.0,
+        'profit_factor': 0.0,
+        'max_drawdown': 0.0,
+        'sharpe_ratio': 0.0,
+        'sortino_ratio': 0.0,
+        'longest_win_streak': 0,
+        'longest_loss_streak': 0
+    }
+    if curve_points:
+        metrics['equity_curve'] = []
+    if count == 0:
+        return metrics
+
+    wins = pnl > 0
+    losses = ~wins
+    gross_profit = pnl[wins].sum()
+    gross_loss = -pnl[pnl < 0].sum()
+
+    # Equity curve and drawdown from the running peak (starting at zero)
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    drawdown = peak - equity
+
+    # Daily PnL, including flat days between the first and last close
+    days = closed_at.astype('datetime64[D]')
+    day_index = (days - days.min()).astype(np.int64)
+    daily = np.bincount(day_index, weights=pnl)
+    if len(daily) > 1:
+        std = daily.std(ddof=1)
+        if std > 0:
+            metrics['sharpe_ratio'] = float(daily.mean() / std * np.sqrt(PERIODS_PER_YEAR))
+        downside = np.sqrt(np.mean(np.minimum(daily, 0.0) ** 2))
+        if downside > 0:
+            metrics['sortino_ratio'] = float(daily.mean() / downside * np.sqrt(PERIODS_PER_YEAR))
+
+    win_count = int(wins.sum())
+    loss_count = int((pnl < 0).sum())
+    metrics.update({
+        'total_pnl': float(equity[-1]),
+        'win_rate': win_count / count * 100,
+        'avg_win': float(gross_profit / win_count) if win_count else 0.0,
+        'avg_loss': float(gross_loss / loss_count) if loss_count else 0.0,
+        'expectancy': float(pnl.mean()),
+        'profit_factor': float(gross_profit / gross_loss) if gross_loss > 0 else 0.0,
+        'max_drawdown': float(drawdown.max()),
+        'longest_win_streak': _longest_run(wins),
+        'longest_loss_streak': _longest_run(losses)
+    })
+
+    if curve_points:
+        points = _downsample(count, curve_points)
+        timestamps = np.datetime_as_string(closed_at[points], unit='s')
+        metrics['equity_curve'] = [
+            {'time': str(timestamp), 'equity': round(float(value), 2)}
+            for timestamp, value in zip(timestamps, equity[points])
+        ]
+    return metrics
+
+
+class RiskMetrics:
+    """Service computing per-user, per-side risk metrics over closed trades"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def _epoch_seconds(self, column):
+        """Dialect-specific Unix time of a timestamp column, so no datetime objects are built per row"""
+        if db.engine.dialect.name == 'postgresql':
+            return func.extract('epoch', column)
+        return (func.julianday(column) - 2440587.5) * 86400.0
+
+    def load_closed_trades(self, user=None, start_date=None):
+        """
+        Load closed trades as column arrays with one Core query, in close order.
+        Returns a dict of pnl (float64), closed_at (datetime64[us]), side
+        (int8, +1 long / -1 short) and user codes (int32) with the user names.
+        """
+        side_code = case(
+            *[(TradingSession.side == side, code) for side, code in SIDE_CODES.items()], else_=0
+        )
+        query = select(
+            func.coalesce(TradingSession.pnl, 0.0), self._epoch_seconds(CLOSE_TIME), side_code, TradingSession.user
+        ).where(TradingSession.status == 'CLOSED')
+        if user:
+            query = query.where(TradingSession.user == user)
+        if start_date is not None:
+            query = query.where(CLOSE_TIME >= start_date)
+        query = query.order_by(CLOSE_TIME, TradingSession.id)
+
+        # Execute on the Core connection; going through the ORM session would
+        # run every row through the ORM loading machinery
+        rows = db.session.connection().execute(query).all()
+        if not rows:
+            pnl, seconds, sides, users = (), (), (), ()
+        else:
+            pnl, seconds, sides, users = zip(*rows)
+
+        user_codes = {}
+        codes = [user_codes.setdefault(name, len(user_codes)) for name in users]
+        # julianday() is only precise to about a millisecond
+        micros = np.round(np.array(seconds, dtype=np.float64) * 1e3).astype(np.int64) * 1000
+        return {
+            'pnl': np.array(pnl, dtype=np.float64),
+            'closed_at': micros.astype('datetime64[us]'),
+            'side': np.array(sides, dtype=np.int8),
+            'user': np.array(codes, dtype=np.int32),
+            'user_names': list(user_codes)
+        }
+
+    def get_user_risk(self, user, start_date=None, curve_points=500):
+        """Overall, long and short risk metrics for a user ('all' for every user)"""
+        try:
+            trades = self.load_closed_trades(None if user == 'all' else user, start_date)
+            pnl, closed_at, side = trades['pnl'], trades['closed_at'], trades['side']
+            return {
+                'user': user,
+                'overall': compute_metrics(pnl, closed_at, curve_points),
+                'long': compute_metrics(pnl[side == 1], closed_at[side == 1]),
+                'short': compute_metrics(pnl[side == -1], closed_at[side == -1])
+            }
+        except Exception as e:
+            self.logger.error(f"Error computing risk metrics for {user}: {e}")
+            empty = np.array([], dtype=np.float64), np.array([], dtype='datetime64[us]')
+            return {
+                'user': user,
+                'overall': compute_metrics(*empty, curve_points),
+                'long': compute_metrics(*empty),
+                'short': compute_metrics(*empty)
+            }
+
+
+# Global instance
+risk_metrics = RiskMetrics()
@@ -0,0 +1,162 @@
+"""
+Request coalescing with stale-while-revalidate
+Concurrent callers of the same computation share one in-flight call, and
+callers that accept slightly old data get the previous value while it is
+recomputed in the background
+"""
+
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from flask import g, has_app_context
+
+DEFAULT_MAX_STALE = float(os.environ.get('SWR_MAX_STALE_SECONDS', 30))
+
+
+@contextmanager
+def app_context():
+    """Context for background refreshes of database-backed computations"""
+    from app import app, db
+
+    with app.app_context():
+        try:
+            yield
+        finally:
+            db.session.remove()
+
+
+class _Flight:
+    """One in-progress computation that several callers may wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Entry:
+    def __init__(self):
+        self.has_value = False
+        self.value = None
+        self.computed_at = 0.0
+        self.version = None
+        self.flight = None
+
+
+class SingleFlight:
+    """Per-key result cache with single-flight recomputation.
+
+    A value younger than ttl (and computed at the current version, if a
+    version function is given) is returned as is. An older value that is
+    still within max_stale is returned immediately while one background
+    thread recomputes it. Otherwise the caller waits for the in-flight
+    computation, or runs it itself if there is none; errors are raised to
+    every caller waiting on that computation.
+    """
+
+    def __init__(self, name):
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.stats = {'fresh': 0, 'stale': 0, 'computed': 0, 'coalesced': 0}
+
+    def get(self, key, compute, ttl, max_stale=None, version=None, context=None):
+        max_stale = DEFAULT_MAX_STALE if max_stale is None else max_stale
+        current_version = version() if version else None
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            if entry.has_value:
+                age = now - entry.computed_at
+                if age <= ttl and entry.version == current_version:
+                    self.stats['fresh'] += 1
+                    return entry.value
+                if age <= max_stale:
+                    self.stats['stale'] += 1
+                    if entry.flight is None:
+                        entry.flight = _Flight()
+                        threading.Thread(
+                            target=self._refresh, args=(entry, entry.flight, compute, current_version, context),
+                            name=f'swr-{self.name}', daemon=True
+                        ).start()
+                    if has_app_context():
+                        g.served_stale = True
+                    return entry.value
+
+            flight = entry.flight
+            leader = flight is None
+            if leader:
+                flight = entry.flight = _Flight()
+                self.stats['computed'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if leader:
+            self._run(entry, flight, compute, current_version)
+        else:
+            flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run(self, entry, flight, compute, version):
+        completed = False
+        try:
+            flight.value = compute()
+            completed = True
+        except Exception as e:
+            flight.error = e
+        finally:
+            # Also runs on BaseException (SystemExit, KeyboardInterrupt, a greenlet
+            # kill), so the key is released and waiters are woken with an error
+            if not completed and flight.error is None:
+                flight.error = RuntimeError(f"{self.name} computation was interrupted")
+            with self._lock:
+                if completed:
+                    entry.value = flight.value
+                    entry.version = version
+                    entry.computed_at = time.monotonic()
+                    entry.has_value = True
+                entry.flight = None
+            flight.done.set()
+
+    def _refresh(self, entry, flight, compute, version, context):
+        with (context() if context else nullcontext()):
+            self._run(entry, flight, compute, version)
+        if flight.error is not None:
+            self.logger.error(f"Background refresh of {self.name} failed: {flight.error}")
+
+
+def coalesced(ttl, max_stale=None, version=None, context=None):
+    """
+    Method decorator applying SingleFlight per instance and call arguments.
+
+    version is an optional callable taking the instance; a change in its
+    result makes cached values stale. context is a context manager factory
+    wrapped around background refreshes (e.g. app_context). Callers can pass
+    max_stale=0 to require a fresh value.
+    """
+    def decorator(method):
+        flight = SingleFlight(method.__qualname__)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, max_stale=max_stale, **kwargs):
+            key = (id(self), repr(args), repr(sorted(kwargs.items())))
+            return flight.get(
+                key,
+                lambda: method(self, *args, **kwargs),
+                ttl,
+                max_stale,
+                (lambda: version(self)) if version else None,
+                context
+            )
+
+        wrapper.flight = flight
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+"""
+Process-shared snapshot store
+One process publishes a JSON document; every gunicorn worker reads it
+"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import NamedTuple
+
+
+class Snapshot(NamedTuple):
+    version: int
+    updated_at: float
+    data: object
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was last published or confirmed"""
+        return time.time() - self.updated_at
+
+
+class SnapshotStore:
+    """Versioned JSON snapshot kept in a single file.
+
+    Writers build the new document in a temporary file and os.replace() it
+    over the old one, so readers never see a partial write and never lock.
+    Readers stat the file and only re-read it when it changed. The version
+    only increases when the data changes; confirming unchanged data just
+    touches the file so its age stays current.
+    """
+
+    def __init__(self, path):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self._cached_key = None
+        self._cached = None
+
+    def read(self):
+        """Return the current Snapshot, or None if nothing was published yet"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key != self._cached_key:
+            try:
+                with open(self.path, 'r') as f:
+                    document = json.load(f)
+                self._cached = Snapshot(document['version'], stat.st_mtime, document['data'])
+                self._cached_key = key
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning(f"Error reading snapshot {self.path}: {e}")
+                return self._cached
+        elif self._cached.updated_at != stat.st_mtime:
+            self._cached = self._cached._replace(updated_at=stat.st_mtime)
+        return self._cached
+
+    def publish(self, data):
+        """Publish data, bumping the version only if it differs from the current snapshot"""
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Writers serialize among themselves; readers are never blocked
+            with open(f"{self.path}.lock", 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                current = self.read()
+                if current is not None and current.data == data:
+                    os.utime(self.path)
+                    return current.version
+
+                version = (current.version if current else 0) + 1
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w') as f:
+                    json.dump({'version': version, 'data': data}, f)
+                os.replace(tmp_path, self.path)
+                return version
+        except Exception as e:
+            self.logger.error(f"Error publishing snapshot {self.path}: {e}")
+            return None
@@ -0,0 +1,331 @@
+"""
+Incremental TradingStats rollups
+Keeps daily, weekly and monthly rows per user current as trades open and
+close, so period statistics sum a few rollup rows instead of scanning trades
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, event, func, inspect, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app import db
+from models import TradingSession, TradingStats
+from services.data_version import mark_changed
+
+ROLLUP_PERIODS = ('daily', 'weekly', 'monthly')
+
+# Additive columns; everything else on a rollup row is derived from these
+SUMMED_FIELDS = (
+    'total_trades', 'successful_trades', 'failed_trades', 'losing_trades',
+    'long_trades', 'short_trades', 'long_successful', 'long_failed',
+    'short_successful', 'short_failed', 'total_pnl', 'total_volume',
+    'gross_profit', 'gross_loss'
+)
+
+
+def period_start(period, moment):
+    """Start of the daily/weekly (Monday)/monthly bucket containing moment"""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    if period == 'weekly':
+        day -= timedelta(days=day.weekday())
+    elif period == 'monthly':
+        day = day.replace(day=1)
+    return datetime.combine(day, datetime.min.time())
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _greatest(a, b):
+    return case((a > b, a), else_=b)
+
+
+def _ratio(numerator, denominator, scale=1):
+    return case((denominator > 0, numerator * scale / denominator), else_=0.0)
+
+
+class StatsRollup:
+    """Maintains TradingStats rollups in O(1) per trade event.
+
+    A trade is counted in the buckets of the day, week and month it was
+    opened in (created_at), matching how the raw period queries filter.
+    Closing it adds its realized PnL and win/loss to those same buckets.
+
+    Events are applied with INSERT ... ON CONFLICT DO UPDATE on the unique
+    (user, period, period_date) index, adding to the stored sums in the
+    database, so concurrent writers can neither lose an update nor create
+    a second row for a bucket.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def _new_row(self, user, period, period_date):
+        row = TradingStats(user=user, period=period, period_date=period_date)
+        for field in SUMMED_FIELDS:
+            setattr(row, field, 0)
+        row.win_rate = row.profit_factor = row.avg_win = row.avg_loss = 0.0
+        row.max_drawdown = row.peak_pnl = 0.0
+        return row
+
+    def _apply_open(self, row, side, volume):
+        row.total_trades = (row.total_trades or 0) + 1
+        if side == 'LONG':
+            row.long_trades = (row.long_trades or 0) + 1
+        elif side == 'SHORT':
+            row.short_trades = (row.short_trades or 0) + 1
+        row.total_volume = (row.total_volume or 0) + volume
+        row.last_updated = datetime.utcnow()
+
+    def _apply_close(self, row, side, pnl):
+        prefix = 'long' if side == 'LONG' else 'short' if side == 'SHORT' else None
+        if pnl > 0:
+            row.successful_trades = (row.successful_trades or 0) + 1
+            row.gross_profit = (row.gross_profit or 0) + pnl
+            outcome = 'successful'
+        else:
+            row.failed_trades = (row.failed_trades or 0) + 1
+            if pnl < 0:
+                row.losing_trades = (row.losing_trades or 0) + 1
+                row.gross_loss = (row.gross_loss or 0) - pnl
+            outcome = 'failed'
+        if prefix:
+            field = f'{prefix}_{outcome}'
+            setattr(row, field, (getattr(row, field) or 0) + 1)
+
+        # Realized equity curve of the bucket, in close order
+        row.total_pnl = (row.total_pnl or 0) + pnl
+        row.peak_pnl = max(row.peak_pnl or 0, row.total_pnl)
+        row.max_drawdown = max(row.max_drawdown or 0, row.peak_pnl - row.total_pnl)
+
+        closed = (row.successful_trades or 0) + (row.failed_trades or 0)
+        row.win_rate = (row.successful_trades or 0) / closed * 100 if closed else 0.0
+        row.avg_win = row.gross_profit / row.successful_trades if row.successful_trades else 0.0
+        row.avg_loss = row.gross_loss / row.losing_trades if row.losing_trades else 0.0
+        row.profit_factor = row.gross_profit / row.gross_loss if row.gross_loss else 0.0
+        row.last_updated = datetime.utcnow()
+
+    def _upsert_statement(self, dialect):
+        """
+        Upsert of one event's row: inserted as is for a new bucket, otherwise
+        its sums are added to the stored ones and the derived columns are
+        recomputed from the result
+        """
+        table = TradingStats.__table__
+        stmt = (postgresql if dialect == 'postgresql' else sqlite).insert(table)
+        stored, event = table.c, stmt.excluded
+        sums = {field: func.coalesce(stored[field], 0) + event[field] for field in SUMMED_FIELDS}
+        # The event's total_pnl is its realized PnL; peak and drawdown follow the bucket's equity curve
+        peak = _greatest(func.coalesce(stored.peak_pnl, 0), sums['total_pnl'])
+        return stmt.on_conflict_do_update(
+            index_elements=[stored.user, stored.period, stored.period_date],
+            set_={
+                **sums,
+                'peak_pnl': peak,
+                'max_drawdown': _greatest(func.coalesce(stored.max_drawdown, 0), peak - sums['total_pnl']),
+                'win_rate': _ratio(sums['successful_trades'], sums['successful_trades'] + sums['failed_trades'], 100.0),
+                'avg_win': _ratio(sums['gross_profit'], sums['successful_trades']),
+                'avg_loss': _ratio(sums['gross_loss'], sums['losing_trades']),
+                'profit_factor': _ratio(sums['gross_profit'], sums['gross_loss']),
+                'last_updated': event.last_updated
+            }
+        )
+
+    def _bucket_rows(self, opened, closed):
+        """
+        Rows to upsert per bucket, in close order. Opens only add to sums, so
+        they fold into any row; each row carries at most one close, because
+        the upsert steps the bucket's equity curve by a single close.
+        """
+        buckets = {}
+        for apply, events in ((self._apply_open, opened), (self._apply_close, closed)):
+            for user, side, created_at, amount in events:
+                for period in ROLLUP_PERIODS:
+                    key = (user, period, period_start(period, created_at))
+                    rows = buckets.setdefault(key, [])
+                    if not rows or (apply == self._apply_close and
+                                    rows[-1].successful_trades + rows[-1].failed_trades):
+                        rows.append(self._new_row(*key))
+                    apply(rows[-1], side, amount)
+        return list(buckets.values())
+
+    def record(self, session, opened=(), closed=()):
+        """
+        Apply opened and closed trades to their rollup rows in the given session.
+        Items are (user, side, created_at, volume) for opens and
+        (user, side, created_at, pnl) for closes.
+        """
+        buckets = self._bucket_rows(opened, closed)
+        if not buckets:
+            return
+        connection = session.connection()
+        statement = self._upsert_statement(connection.dialect.name)
+        columns = [column.name for column in TradingStats.__table__.columns if column.name != 'id']
+        # The n-th row of every bucket goes in the n-th statement. PostgreSQL
+        # may send an executemany as one multi-row INSERT, which must not
+        # touch a bucket twice, and later closes must see earlier ones.
+        for step in range(max(len(rows) for rows in buckets)):
+            connection.execute(statement, [
+                {column: getattr(rows[step], column) for column in columns}
+                for rows in buckets if step < len(rows)
+            ])
+
+    def record_inserted(self, session, rows):
+        """Roll up positions written with a bulk INSERT, which skips ORM flush events"""
+        opened = []
+        closed = []
+        for row in rows:
+            created_at = row.get('created_at') or datetime.utcnow()
+            volume = (row.get('entry_price') or 0) * (row.get('position_size') or 0)
+            opened.append((row['user'], row['side'], created_at, volume))
+            if row.get('status') == 'CLOSED':
+                closed.append((row['user'], row['side'], created_at, row.get('pnl') or 0.0))
+        self.record(session, opened, closed)
+
+    def rebuild(self, start_date=None):
+        """
+        Recompute rollup rows from raw trades, for every bucket from the ones
+        containing start_date onwards (or for all time). Used to backfill.
+        """
+        try:
+            floors = {period: period_start(period, start_date) if start_date else None
+                      for period in ROLLUP_PERIODS}
+            for period, floor in floors.items():
+                query = TradingStats.query.filter(TradingStats.period == period)
+                if floor is not None:
+                    query = query.filter(TradingStats.period_date >= floor)
+                query.delete(synchronize_session=False)
+
+            trades = TradingSession.query.filter(TradingSession.created_at.isnot(None))
+            if start_date:
+                trades = trades.filter(TradingSession.created_at >= min(floors.values()))
+            close_time = func.coalesce(TradingSession.closed_at, TradingSession.exit_time, TradingSession.created_at)
+            trades = trades.order_by(close_time, TradingSession.id).yield_per(1000)
+
+            rows = {}
+            for trade in trades:
+                volume = (trade.entry_price or 0) * (trade.position_size or 0)
+                for period, floor in floors.items():
+                    bucket = period_start(period, trade.created_at)
+                    if floor is not None and bucket < floor:
+                        continue
+                    key = (trade.user, period, bucket)
+                    row = rows.get(key)
+                    if row is None:
+                        row = rows[key] = self._new_row(*key)
+                    self._apply_open(row, trade.side, volume)
+                    if trade.status == 'CLOSED':
+                        self._apply_close(row, trade.side, trade.pnl or 0.0)
+
+            db.session.add_all(rows.values())
+            mark_changed(db.session, 'trades')
+            db.session.commit()
+            self.logger.info(f"Rebuilt {len(rows)} rollup rows" + (f" from {start_date}" if start_date else ""))
+
+        except Exception as e:
+            self.logger.error(f"Error rebuilding stats rollups: {e}")
+            db.session.rollback()
+
+    def ensure_unique_buckets(self):
+        """
+        Make idx_user_period unique on databases created before it was.
+        Duplicate all-time rows are dropped (update_statistics rewrites the
+        survivor) and duplicated rollup buckets are rebuilt from the trades.
+        """
+        indexes = {index['name']: index for index in inspect(db.engine).get_indexes(TradingStats.__table__.name)}
+        if indexes.get('idx_user_period', {}).get('unique'):
+            return
+
+        keys = (TradingStats.user, TradingStats.period, TradingStats.period_date)
+        duplicated = db.session.query(TradingStats.period).group_by(*keys).having(func.count() > 1).distinct().all()
+        if duplicated:
+            self.logger.warning(f"Removing duplicate TradingStats rows for periods {[row.period for row in duplicated]}")
+            keep = db.session.query(func.min(TradingStats.id)).group_by(*keys)
+            TradingStats.query.filter(
+                TradingStats.period.notin_(ROLLUP_PERIODS), TradingStats.id.notin_(keep)
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            if any(row.period in ROLLUP_PERIODS for row in duplicated):
+                self.rebuild()
+
+        index = next(index for index in TradingStats.__table__.indexes if index.name == 'idx_user_period')
+        if 'idx_user_period' in indexes:
+            index.drop(db.engine)
+        index.create(db.engine)
+        self.logger.info("Made idx_user_period unique")
+
+    def ensure_backfilled(self):
+        """Build rollups once for databases that have trades but no rollup rows yet"""
+        if TradingStats.query.filter_by(period='monthly').first() is None \
+                and TradingSession.query.first() is not None:
+            self.rebuild()
+
+    def get_period_totals(self, user, start_date, end_date=None):
+        """
+        Sum the rollup rows that exactly tile [start_date, end_date]: daily rows
+        up to the first month boundary, then whole monthly rows. end_date
+        defaults to today, in which case the current month's row is used.
+        """
+        today = datetime.utcnow().date()
+        end_date = end_date or today
+        days, months = [], []
+        cursor = start_date
+        while cursor <= end_date:
+            month_end = _next_month(cursor) - timedelta(days=1)
+            # There are no trades after today, so the current month's row can stand in for it
+            if cursor.day == 1 and (month_end <= end_date or end_date >= today):
+                months.append(datetime.combine(cursor, datetime.min.time()))
+                cursor = month_end + timedelta(days=1)
+            else:
+                days.append(datetime.combine(cursor, datetime.min.time()))
+                cursor += timedelta(days=1)
+
+        buckets = []
+        if days:
+            buckets.append(and_(TradingStats.period == 'daily', TradingStats.period_date.in_(days)))
+        if months:
+            buckets.append(and_(TradingStats.period == 'monthly', TradingStats.period_date.in_(months)))
+        if not buckets:
+            return dict.fromkeys(SUMMED_FIELDS, 0)
+
+        row = db.session.query(
+            *[func.coalesce(func.sum(getattr(TradingStats, field)), 0).label(field) for field in SUMMED_FIELDS]
+        ).filter(TradingStats.user == user, or_(*buckets)).one()
+        return row._asdict()
+
+
+stats_rollup = StatsRollup()
+
+
+def _closed_in_flush(obj):
+    history = inspect(obj).attrs.status.history
+    return 'CLOSED' in history.added and 'CLOSED' not in history.deleted
+
+
+@event.listens_for(Session, 'before_flush')
+def _roll_up_trade_changes(session, flush_context, instances):
+    opened = []
+    closing = []
+    for obj in session.new:
+        if isinstance(obj, TradingSession):
+            # Pin the column default now so the bucket matches the stored value
+            if obj.created_at is None:
+                obj.created_at = datetime.utcnow()
+            opened.append((obj.user, obj.side, obj.created_at, (obj.entry_price or 0) * (obj.position_size or 0)))
+            if obj.status == 'CLOSED':
+                closing.append(obj)
+    for obj in session.dirty:
+        if isinstance(obj, TradingSession) and _closed_in_flush(obj):
+            closing.append(obj)
+
+    # session.new and session.dirty are unordered; fold closes in the order rebuild() replays them
+    closing.sort(key=lambda obj: (obj.closed_at or obj.exit_time or obj.created_at or datetime.utcnow(),
+                                  obj.id or 0))
+    closed = [(obj.user, obj.side, obj.created_at or datetime.utcnow(), obj.pnl or 0.0) for obj in closing]
+
+    if opened or closed:
+        stats_rollup.record(session, opened, closed)
@@ -0,0 +1,196 @@
+"""
+Status Block History
+Stores every parsed strategy manager status block by log time, as periodic
+full keyframes and deltas against them, and answers as-of and range
+queries without re-reading the log
+"""
+
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import func, insert
+
+from app import db
+from models import StatusHistory
+from services.data_version import mark_changed
+
+# Counters the strategy manager zeroes at the weekly reset
+COUNTER_FIELDS = (
+    'buy_success_count', 'buy_stop_loss_count', 'sell_success_count', 'sell_stop_loss_count',
+    'live_trade_success_count', 'live_trade_failure_count'
+)
+
+# Changes in every block; blocks that differ only here are not stored
+CLOCK_FIELDS = ('current_time',)
+
+KEYFRAME_INTERVAL = 100
+
+
+def _comparable(status):
+    return {key: value for key, value in status.items() if key not in CLOCK_FIELDS}
+
+
+def is_reset(previous, status):
+    """True when any counter went down, as they do at the weekly reset"""
+    return any((status.get(field) or 0) < (previous.get(field) or 0) for field in COUNTER_FIELDS)
+
+
+def counter_increments(previous, status):
+    """Per-counter growth from previous to status, counting from zero after a reset"""
+    increments = {}
+    for field in COUNTER_FIELDS:
+        before, after = previous.get(field) or 0, status.get(field) or 0
+        increments[field] = after - before if after >= before else after
+    return increments
+
+
+def encode_blocks(blocks, chain=None, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Encode (recorded_at, status) blocks in log-time order as StatusHistory rows.
+
+    chain describes the last stored row and is returned updated, so encoding
+    can continue across calls. A block is stored in full when there is no
+    keyframe yet, after keyframe_interval deltas and whenever the counters
+    reset, so each week starts with a keyframe; otherwise only the fields
+    that differ from the keyframe are stored. Blocks that repeat the
+    previous one apart from the clock are dropped.
+    """
+    rows = []
+    for recorded_at, status in blocks:
+        if chain is not None and _comparable(status) == _comparable(chain['last']):
+            continue
+        if chain is None or chain['deltas'] >= keyframe_interval or is_reset(chain['last'], status):
+            rows.append({'recorded_at': recorded_at, 'keyframe_at': None, 'status': json.dumps(status)})
+            chain = {'keyframe_at': recorded_at, 'keyframe': status, 'deltas': 0}
+        else:
+            delta = {key: value for key, value in status.items() if chain['keyframe'].get(key) != value}
+            rows.append({'recorded_at': recorded_at, 'keyframe_at': chain['keyframe_at'], 'status': json.dumps(delta)})
+            chain['deltas'] += 1
+        chain['last'] = status
+        chain['last_at'] = recorded_at
+    return rows, chain
+
+
+class StatusHistoryStore:
+    """Appends status blocks to StatusHistory and reads them back.
+
+    Reconstructing any block takes at most two rows: the row itself and the
+    keyframe it is a delta against. Rows are never deleted, so the counter
+    history of previous weeks stays queryable after the weekly reset.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.logger = logging.getLogger(__name__)
+        self.keyframe_interval = keyframe_interval
+        self._lock = threading.Lock()
+        self._pid = None
+        self._chain = None
+
+    def _keyframes(self, moments):
+        """Decoded full blocks recorded at the given times, with one query"""
+        moments = {moment for moment in moments if moment is not None}
+        if not moments:
+            return {}
+        return {
+            row.recorded_at: json.loads(row.status)
+            for row in StatusHistory.query.filter(
+                StatusHistory.keyframe_at.is_(None), StatusHistory.recorded_at.in_(moments)
+            )
+        }
+
+    def _decode(self, row, keyframes):
+        status = json.loads(row.status)
+        if row.keyframe_at is None:
+            return status
+        return {**keyframes.get(row.keyframe_at, {}), **status}
+
+    def _latest_row(self, moment=None, inclusive=True):
+        query = StatusHistory.query
+        if moment is not None:
+            query = query.filter(StatusHistory.recorded_at <= moment if inclusive else StatusHistory.recorded_at < moment)
+        return query.order_by(StatusHistory.recorded_at.desc(), StatusHistory.id.desc()).first()
+
+    def _load_chain(self):
+        """Encoding state after the latest stored row"""
+        row = self._latest_row()
+        if row is None:
+            return None
+        keyframe_at = row.keyframe_at or row.recorded_at
+        keyframes = self._keyframes([keyframe_at])
+        deltas = StatusHistory.query.filter(StatusHistory.keyframe_at == keyframe_at).count()
+        return {'keyframe_at': keyframe_at, 'keyframe': keyframes.get(keyframe_at, {}), 'deltas': deltas,
+                'last': self._decode(row, keyframes), 'last_at': row.recorded_at}
+
+    def record(self, blocks):
+        """Store (recorded_at, status) blocks newer than the latest stored one; returns rows written"""
+        if not blocks:
+            return 0
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._chain = None
+            try:
+                # Another process (or the backfill) may have written since our last call
+                latest = db.session.query(func.max(StatusHistory.recorded_at)).scalar()
+                chain = self._chain
+                if chain is None or chain['last_at'] != latest:
+                    chain = self._load_chain()
+                if chain is not None:
+                    blocks = [block for block in blocks if block[0] > chain['last_at']]
+
+                rows, chain = encode_blocks(blocks, chain, self.keyframe_interval)
+                if rows:
+                    db.session.execute(insert(StatusHistory), rows)
+                    mark_changed(db.session, 'status')
+                    db.session.commit()
+                self._chain = chain
+                return len(rows)
+            except Exception as e:
+                self.logger.error(f"Error recording status history: {e}")
+                db.session.rollback()
+                self._chain = None
+                return 0
+
+    def as_of(self, moment):
+        """The status block in effect at moment (log time), or None"""
+        row = self._latest_row(moment)
+        if row is None:
+            return None
+        return {'recorded_at': row.recorded_at.isoformat(),
+                'status': self._decode(row, self._keyframes([row.keyframe_at]))}
+
+    def get_range(self, start, end, fields=None, limit=5000):
+        """
+        Status blocks recorded within [start, end], oldest first, optionally
+        narrowed to fields. counter_totals sums each counter's growth over
+        the range across weekly resets, starting from the block in effect at
+        start.
+        """
+        rows = StatusHistory.query.filter(
+            StatusHistory.recorded_at.between(start, end)
+        ).order_by(StatusHistory.recorded_at, StatusHistory.id).limit(limit).all()
+        baseline_row = self._latest_row(start, inclusive=False)
+        keyframes = self._keyframes([row.keyframe_at for row in rows]
+                                    + [baseline_row.keyframe_at if baseline_row else None])
+
+        previous = self._decode(baseline_row, keyframes) if baseline_row else None
+        totals = dict.fromkeys(COUNTER_FIELDS, 0)
+        resets = 0
+        snapshots = []
+        for row in rows:
+            status = self._decode(row, keyframes)
+            if previous is not None:
+                resets += is_reset(previous, status)
+                for field, increment in counter_increments(previous, status).items():
+                    totals[field] += increment
+            previous = status
+            if fields:
+                status = {field: status.get(field) for field in fields}
+            snapshots.append({'recorded_at': row.recorded_at.isoformat(), 'status': status})
+        return {'snapshots': snapshots, 'counter_totals': totals, 'resets': resets}
+
+
+# Global instance
+status_history = StatusHistoryStore()
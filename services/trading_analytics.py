@@ -1,78 +1,140 @@
+import base64
+import binascii
 import logging
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import func, case, and_, tuple_, update
 from app import db
 from models import TradingSession, TradingStats
+from services.data_version import current_version, mark_changed
+from services.single_flight import app_context, coalesced
+from services.stats_rollup import stats_rollup
 
 class TradingAnalytics:
+    USER_STATS_KEYS = [
+        'total_trades', 'successful_trades', 'failed_trades', 'long_trades', 'short_trades',
+        'total_pnl', 'open_positions', 'win_rate', 'avg_profit', 'avg_loss', 'profit_factor'
+    ]
+    TRADE_HISTORY_FILTERS = ('user', 'symbol', 'side', 'status')
+    ALL_TIME_FIELDS = (
+        'total_trades', 'successful_trades', 'failed_trades', 'long_trades', 'short_trades', 'total_pnl', 'win_rate'
+    )
+
     def __init__(self):
         pass
 
-    def get_user_stats(self, user):
-        """Get comprehensive trading statistics for a user"""
-        try:
-            # Get all trading sessions for user
-            sessions = TradingSession.query.filter_by(user=user).all()
-            
-            stats = {
-                'total_trades': len(sessions),
-                'successful_trades': len([s for s in sessions if s.status == 'CLOSED' and s.pnl > 0]),
-                'failed_trades': len([s for s in sessions if s.status == 'CLOSED' and s.pnl <= 0]),
-                'long_trades': len([s for s in sessions if s.side == 'LONG']),
-                'short_trades': len([s for s in sessions if s.side == 'SHORT']),
-                'total_pnl': sum([s.pnl for s in sessions if s.pnl]),
-                'open_positions': len([s for s in sessions if s.status == 'OPEN']),
-                'win_rate': 0.0,
-                'avg_profit': 0.0,
-                'avg_loss': 0.0,
-                'profit_factor': 0.0
-            }
-            
-            # Calculate win rate
-            closed_trades = [s for s in sessions if s.status == 'CLOSED']
-            if closed_trades:
-                winning_trades = [s for s in closed_trades if s.pnl > 0]
-                stats['win_rate'] = (len(winning_trades) / len(closed_trades)) * 100
-                
-                # Calculate average profit/loss
-                profits = [s.pnl for s in closed_trades if s.pnl > 0]
-                losses = [abs(s.pnl) for s in closed_trades if s.pnl < 0]
-                
-                if profits:
-                    stats['avg_profit'] = sum(profits) / len(profits)
-                if losses:
-                    stats['avg_loss'] = sum(losses) / len(losses)
-                
-                # Calculate profit factor
-                total_profits = sum(profits) if profits else 0
-                total_losses = sum(losses) if losses else 0
-                if total_losses > 0:
-                    stats['profit_factor'] = total_profits / total_losses
-            
-            return stats
+    def _aggregate_totals(self, users=None, start_date=None, end_date=None):
+        """
+        Per-user counts and PnL sums over trades created in [start_date,
+        end_date), from one GROUP BY query using conditional aggregates.
+        Returns {user: totals}.
+        """
+        pnl = func.coalesce(TradingSession.pnl, 0.0)
+        closed = TradingSession.status == 'CLOSED'
+        is_long = TradingSession.side == 'LONG'
+        is_short = TradingSession.side == 'SHORT'
+        
+        def count_if(*conditions):
+            return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+        
+        def sum_if(value, *conditions):
+            return func.coalesce(func.sum(case((and_(*conditions), value), else_=0.0)), 0.0)
+        
+        query = db.session.query(
+            TradingSession.user,
+            func.count(TradingSession.id).label('total_trades'),
+            count_if(closed, pnl > 0).label('successful_trades'),
+            count_if(closed, pnl <= 0).label('failed_trades'),
+            count_if(closed, pnl < 0).label('losing_trades'),
+            count_if(is_long).label('long_trades'),
+            count_if(is_short).label('short_trades'),
+            count_if(is_long, closed, pnl > 0).label('long_successful'),
+            count_if(is_long, closed, pnl <= 0).label('long_failed'),
+            count_if(is_short, closed, pnl > 0).label('short_successful'),
+            count_if(is_short, closed, pnl <= 0).label('short_failed'),
+            count_if(TradingSession.status == 'OPEN').label('open_positions'),
+            func.coalesce(func.sum(pnl), 0.0).label('total_pnl'),
+            sum_if(pnl, closed, pnl > 0).label('gross_profit'),
+            sum_if(-pnl, closed, pnl < 0).label('gross_loss')
+        )
+        if users is not None:
+            query = query.filter(TradingSession.user.in_(users))
+        if start_date is not None:
+            query = query.filter(TradingSession.created_at >= start_date)
+        if end_date is not None:
+            query = query.filter(TradingSession.created_at < end_date)
+        
+        return {row.user: row._asdict() for row in query.group_by(TradingSession.user).all()}
+    
+    def _aggregate_stats(self, users=None, start_date=None):
+        """Compute per-user trade statistics in the database. Returns {user: stats}."""
+        return {user: self._finish_stats(totals)
+                for user, totals in self._aggregate_totals(users, start_date).items()}
+    
+    def _finish_stats(self, totals):
+        """Build the stats dict from summed counts and PnL totals"""
+        stats = {
+            'total_trades': totals['total_trades'],
+            'successful_trades': totals['successful_trades'],
+            'failed_trades': totals['failed_trades'],
+            'long_trades': totals['long_trades'],
+            'short_trades': totals['short_trades'],
+            'long_successful': totals['long_successful'],
+            'long_failed': totals['long_failed'],
+            'short_successful': totals['short_successful'],
+            'short_failed': totals['short_failed'],
+            'total_pnl': totals['total_pnl'],
+            'open_positions': totals['open_positions'],
+            'win_rate': 0.0,
+            'avg_profit': 0.0,
+            'avg_loss': 0.0,
+            'profit_factor': 0.0
+        }
+        
+        # Calculate win rate and average profit/loss
+        closed_trades = totals['successful_trades'] + totals['failed_trades']
+        if closed_trades:
+            stats['win_rate'] = (totals['successful_trades'] / closed_trades) * 100
+            if totals['successful_trades']:
+                stats['avg_profit'] = totals['gross_profit'] / totals['successful_trades']
+            if totals['losing_trades']:
+                stats['avg_loss'] = totals['gross_loss'] / totals['losing_trades']
             
-        except Exception as e:
-            logging.error(f"Error getting user stats for {user}: {e}")
+            # Calculate profit factor
+            if totals['gross_loss'] > 0:
+                stats['profit_factor'] = totals['gross_profit'] / totals['gross_loss']
+        
+        return stats
+    
+    def _empty_user_stats(self):
+        return {key: 0.0 if key in ('total_pnl', 'win_rate', 'avg_profit', 'avg_loss', 'profit_factor') else 0
+                for key in self.USER_STATS_KEYS}
+    
+    @coalesced(ttl=30, version=lambda service: current_version('trades', 'marks'), context=app_context)
+    def get_users_stats(self, users):
+        """Get comprehensive trading statistics for several users with a single query"""
+        try:
+            aggregated = self._aggregate_stats(users)
             return {
-                'total_trades': 0,
-                'successful_trades': 0,
-                'failed_trades': 0,
-                'long_trades': 0,
-                'short_trades': 0,
-                'total_pnl': 0.0,
-                'open_positions': 0,
-                'win_rate': 0.0,
-                'avg_profit': 0.0,
-                'avg_loss': 0.0,
-                'profit_factor': 0.0
+                user: {key: aggregated[user][key] for key in self.USER_STATS_KEYS}
+                if user in aggregated else self._empty_user_stats()
+                for user in users
             }
+        except Exception as e:
+            logging.error(f"Error getting user stats for {users}: {e}")
+            return {user: self._empty_user_stats() for user in users}
+
+    def get_user_stats(self, user):
+        """Get comprehensive trading statistics for a user"""
+        return self.get_users_stats([user])[user]
 
+    @coalesced(ttl=30, version=lambda service: current_version('trades', 'marks'), context=app_context)
     def get_current_positions(self):
         """Get all current open positions"""
         try:
             positions = TradingSession.query.filter_by(status='OPEN').all()
             return [
                 {
+                    'id': pos.id,
                     'user': pos.user,
                     'symbol': pos.symbol,
                     'side': pos.side,
@@ -91,8 +153,8 @@ class TradingAnalytics:
         """Update trading statistics in database"""
         try:
             from datetime import datetime
-            for user in ['Yuva', 'Shan']:
-                stats = self.get_user_stats(user)
+            users_stats = self.get_users_stats(['Yuva', 'Shan'], max_stale=0)
+            for user, stats in users_stats.items():
                 
                 # Update or create stats record for 'all_time' period
                 db_stats = TradingStats.query.filter_by(
@@ -101,14 +163,16 @@ class TradingAnalytics:
                 ).first()
                 
                 if db_stats:
-                    db_stats.total_trades = stats['total_trades']
-                    db_stats.successful_trades = stats['successful_trades']
-                    db_stats.failed_trades = stats['failed_trades']
-                    db_stats.long_trades = stats['long_trades']
-                    db_stats.short_trades = stats['short_trades']
-                    db_stats.total_pnl = stats['total_pnl']
-                    db_stats.win_rate = stats['win_rate']
-                    db_stats.last_updated = datetime.utcnow()
+                    # Only write (and bump a data version) when an aggregate moved
+                    changes = {field: stats[field] for field in self.ALL_TIME_FIELDS
+                               if getattr(db_stats, field) != stats[field]}
+                    if changes:
+                        # total_pnl includes open positions, so it alone moves with every mark
+                        mark_changed(db.session, 'trades' if set(changes) - {'total_pnl'} else 'marks')
+                        db.session.execute(
+                            update(TradingStats).where(TradingStats.id == db_stats.id)
+                            .values(last_updated=datetime.utcnow(), **changes)
+                        )
                 else:
                     db_stats = TradingStats(
                         user=user,
@@ -172,43 +236,91 @@ class TradingAnalytics:
             logging.error(f"Error getting daily PnL data: {e}")
             return []
     
+    def get_period_start(self, period):
+        """Start datetime of a named rolling period"""
+        now = datetime.utcnow()
+        if period == 'today':
+            return now.replace(hour=0, minute=0, second=0, microsecond=0)
+        elif period == 'week':
+            return now - timedelta(days=7)
+        elif period == 'month':
+            return now - timedelta(days=30)
+        elif period == 'year':
+            return now - timedelta(days=365)
+        else:  # 'all'
+            return datetime(2020, 1, 1)  # Far back date
+    
+    def _trade_to_dict(self, trade):
+        return {
+            'id': trade.id,
+            'user': trade.user,
+            'symbol': trade.symbol,
+            'side': trade.side,
+            'entry_price': trade.entry_price,
+            'exit_price': trade.exit_price,
+            'position_size': trade.position_size,
+            'pnl': trade.pnl or 0.0,
+            'status': trade.status,
+            'created_at': trade.created_at.isoformat() if trade.created_at else None,
+            'closed_at': trade.closed_at.isoformat() if trade.closed_at else None
+        }
+    
+    @staticmethod
+    def encode_cursor(trade):
+        """Opaque keyset cursor for the position after this trade"""
+        raw = f"{trade.created_at.isoformat()}|{trade.id}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Return (created_at, id) from a cursor; raises ValueError if it is malformed"""
+        try:
+            created_at, trade_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+            return datetime.fromisoformat(created_at), int(trade_id)
+        except (UnicodeError, TypeError, binascii.Error) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
+    def _trade_history_query(self, period, cursor=None, **filters):
+        """
+        Trades in the period, newest first, ordered on (created_at, id) so a
+        cursor can resume strictly after the last row seen. Equality filters
+        on user/symbol/side/status line up with the existing indexes.
+        """
+        query = TradingSession.query.filter(TradingSession.created_at >= self.get_period_start(period))
+        for field in self.TRADE_HISTORY_FILTERS:
+            value = filters.get(field)
+            if value:
+                query = query.filter(getattr(TradingSession, field) == value)
+        if cursor:
+            query = query.filter(
+                tuple_(TradingSession.created_at, TradingSession.id) < tuple_(*self.decode_cursor(cursor))
+            )
+        return query.order_by(TradingSession.created_at.desc(), TradingSession.id.desc())
+    
+    def get_trade_history_page(self, period, limit=100, cursor=None, **filters):
+        """
+        One page of trade history. next_cursor is None on the last page.
+        Raises ValueError for a malformed cursor.
+        """
+        trades = self._trade_history_query(period, cursor, **filters).limit(limit + 1).all()
+        has_more = len(trades) > limit
+        trades = trades[:limit]
+        return {
+            'trades': [self._trade_to_dict(trade) for trade in trades],
+            'next_cursor': self.encode_cursor(trades[-1]) if has_more else None,
+            'limit': limit
+        }
+    
+    def iter_trade_history(self, period, cursor=None, batch_size=500, **filters):
+        """Yield trade dicts for the whole range, fetching batch_size rows at a time"""
+        query = self._trade_history_query(period, cursor, **filters).yield_per(batch_size)
+        for trade in query:
+            yield self._trade_to_dict(trade)
+    
     def get_trade_history_by_period(self, period):
         """Get trade history filtered by time period"""
         try:
-            from datetime import datetime, timedelta
-            
-            now = datetime.utcnow()
-            if period == 'today':
-                start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif period == 'week':
-                start_date = now - timedelta(days=7)
-            elif period == 'month':
-                start_date = now - timedelta(days=30)
-            elif period == 'year':
-                start_date = now - timedelta(days=365)
-            else:  # 'all'
-                start_date = datetime(2020, 1, 1)  # Far back date
-            
-            trades = TradingSession.query.filter(
-                TradingSession.created_at >= start_date
-            ).order_by(TradingSession.created_at.desc()).all()
-            
-            return [
-                {
-                    'id': trade.id,
-                    'user': trade.user,
-                    'symbol': trade.symbol,
-                    'side': trade.side,
-                    'entry_price': trade.entry_price,
-                    'exit_price': trade.exit_price,
-                    'position_size': trade.position_size,
-                    'pnl': trade.pnl or 0.0,
-                    'status': trade.status,
-                    'created_at': trade.created_at.isoformat() if trade.created_at else None,
-                    'closed_at': trade.closed_at.isoformat() if trade.closed_at else None
-                }
-                for trade in trades
-            ]
+            return list(self.iter_trade_history(period))
             
         except Exception as e:
             logging.error(f"Error getting trade history by period: {e}")
@@ -217,63 +329,34 @@ class TradingAnalytics:
     def get_user_stats_by_period(self, user, period):
         """Get user statistics for a specific time period"""
         try:
-            from datetime import datetime, timedelta
+            start_date = self.get_period_start(period)
             
-            now = datetime.utcnow()
-            if period == 'today':
-                start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            elif period == 'week':
-                start_date = now - timedelta(days=7)
-            elif period == 'month':
-                start_date = now - timedelta(days=30)
-            elif period == 'year':
-                start_date = now - timedelta(days=365)
-            else:  # 'all'
-                start_date = datetime(2020, 1, 1)
+            # Rollups cover whole days from the first midnight at or after start_date
+            boundary = datetime.combine(start_date.date(), datetime.min.time())
+            if boundary < start_date:
+                boundary += timedelta(days=1)
+            totals = stats_rollup.get_period_totals(user, boundary.date())
             
-            sessions = TradingSession.query.filter(
+            # They only hold realized PnL; open and other unclosed trades come from the live rows
+            totals['open_positions'], unclosed_pnl = db.session.query(
+                func.coalesce(func.sum(case((TradingSession.status == 'OPEN', 1), else_=0)), 0),
+                func.coalesce(func.sum(TradingSession.pnl), 0.0)
+            ).filter(
                 TradingSession.user == user,
-                TradingSession.created_at >= start_date
-            ).all()
+                TradingSession.status != 'CLOSED',
+                TradingSession.created_at >= boundary
+            ).one()
+            totals['total_pnl'] += unclosed_pnl
             
-            stats = {
-                'total_trades': len(sessions),
-                'successful_trades': len([s for s in sessions if s.status == 'CLOSED' and (s.pnl or 0) > 0]),
-                'failed_trades': len([s for s in sessions if s.status == 'CLOSED' and (s.pnl or 0) <= 0]),
-                'long_trades': len([s for s in sessions if s.side == 'LONG']),
-                'short_trades': len([s for s in sessions if s.side == 'SHORT']),
-                'long_successful': len([s for s in sessions if s.side == 'LONG' and s.status == 'CLOSED' and (s.pnl or 0) > 0]),
-                'long_failed': len([s for s in sessions if s.side == 'LONG' and s.status == 'CLOSED' and (s.pnl or 0) <= 0]),
-                'short_successful': len([s for s in sessions if s.side == 'SHORT' and s.status == 'CLOSED' and (s.pnl or 0) > 0]),
-                'short_failed': len([s for s in sessions if s.side == 'SHORT' and s.status == 'CLOSED' and (s.pnl or 0) <= 0]),
-                'total_pnl': sum([s.pnl or 0 for s in sessions]),
-                'open_positions': len([s for s in sessions if s.status == 'OPEN']),
-                'win_rate': 0.0,
-                'avg_profit': 0.0,
-                'avg_loss': 0.0,
-                'profit_factor': 0.0,
-                'period': period
-            }
-            
-            # Calculate win rate and other metrics
-            closed_trades = [s for s in sessions if s.status == 'CLOSED']
-            if closed_trades:
-                winning_trades = [s for s in closed_trades if (s.pnl or 0) > 0]
-                stats['win_rate'] = (len(winning_trades) / len(closed_trades)) * 100
-                
-                profits = [s.pnl for s in closed_trades if (s.pnl or 0) > 0]
-                losses = [abs(s.pnl) for s in closed_trades if (s.pnl or 0) < 0]
-                
-                if profits:
-                    stats['avg_profit'] = sum(profits) / len(profits)
-                if losses:
-                    stats['avg_loss'] = sum(losses) / len(losses)
-                
-                total_profits = sum(profits) if profits else 0
-                total_losses = sum(losses) if losses else 0
-                if total_losses > 0:
-                    stats['profit_factor'] = total_profits / total_losses
+            # The partial first day is read raw, so the window starts exactly at start_date
+            if start_date < boundary:
+                head = self._aggregate_totals([user], start_date, boundary).get(user, {})
+                for field, value in head.items():
+                    if field != 'user':
+                        totals[field] = totals.get(field, 0) + value
             
+            stats = self._finish_stats(totals)
+            stats['period'] = period
             return stats
             
         except Exception as e:
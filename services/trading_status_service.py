@@ -1,18 +1,42 @@
+import copy
 import logging
 from datetime import datetime
 import os
+import threading
+from flask import has_app_context
+from services.log_tail import LogTail
+from services.log_tokenizer import tokenize
+from services.snapshot_store import SnapshotStore
 
 class TradingStatusService:
     """Service to parse and provide real trading status from logs"""
     
-    def __init__(self):
+    LOG_PATHS = [
+        './logs/strategy.log',
+        '/log/strategy.log',
+        './strategy.log'
+    ]
+    CHECKPOINT_PATH = './logs/.strategy_status_checkpoint.json'
+    SNAPSHOT_PATH = './logs/.trading_status_snapshot.json'
+    
+    def __init__(self, checkpoint_path=None, snapshot_path=None):
         self.current_status = {}
         self.last_updated = None
+        self.status_version = 0
+        self._tail = LogTail(checkpoint_path or self.CHECKPOINT_PATH)
+        # Shared by all workers: the ingesting process publishes, the others read
+        self._store = SnapshotStore(snapshot_path or self.SNAPSHOT_PATH)
+        self._parse_state = None
+        # Serializes parsing between the ingestion thread and upload requests
+        self._parse_lock = threading.RLock()
+        self.last_line_count = 0
+        # Status blocks parsed but not yet written to the status history
+        self.completed_blocks = []
         
-    def parse_status_from_logs(self, log_content=None):
-        """Parse trading status from log content"""
-        # Default status structure
-        status = {
+    @staticmethod
+    def _default_status():
+        """Default status structure"""
+        return {
             'buy_coins_tracking': [],
             'sell_coins_tracking': [],
             'buy_success_count': 0,
@@ -31,178 +55,220 @@ class TradingStatusService:
             'next_weekly_reset': '',
             'mode': 'Live'  # Changed to Live mode for real logs
         }
+    
+    def parse_status_from_logs(self, log_content=None):
+        """Parse trading status from log content"""
+        if log_content:
+            # Explicit content (e.g. an upload) is parsed from scratch and
+            # the tail checkpoint is dropped so the file is re-synced next time
+            status = self._default_status()
+            _, self.last_line_count = self._parse_lines(status, log_content.split('\n'))
+            self._tail.rewind()
+            self._record_blocks()
+            return self._set_status(status)
         
-        # Try to read from actual log file first
-        if not log_content:
-            log_content = self._read_log_file()
+        # Try to read new lines from the actual log file first
+        log_path = self._find_log_file()
+        if log_path:
+            try:
+                return self._refresh_from_log_file(log_path)
+            except Exception as e:
+                logging.error(f"Error reading log file {log_path}: {e}")
+        
+        logging.warning("No log file found, using simulated data")
         
         # If still no log content, fall back to demo data
-        if not log_content:
-            # Demo mode with sample data
-            status.update({
-                'buy_coins_tracking': [
-                    {'symbol': 'AVAUSDT', 'entry': 0.5615, 'added': '2025-08-05 16:07:50'},
-                    {'symbol': 'STEEMUSDT', 'entry': 0.1343, 'added': '2025-08-05 16:08:15'}
-                ],
-                'sell_coins_tracking': [
-                    {'symbol': 'ZECUSDT', 'entry': 36.19, 'added': '2025-08-05 16:13:59'}
-                ],
-                'buy_success_count': 2,
-                'buy_stop_loss_count': 1,
-                'sell_success_count': 1,
-                'sell_stop_loss_count': 0,
-                'live_trade_success_count': 3,
-                'live_trade_failure_count': 1,
-                'api_calls_enabled': False,
-                'current_time': datetime.now().strftime('%A %Y-%m-%d %H:%M:%S'),
-                'next_weekly_reset': 'Monday 2025-08-11 05:30:00 IST',
-                'mode': 'Live'
-            })
-            
-            # Debug logging
-            logging.info(f"Parsed trading status: BUY coins: {len(status['buy_coins_tracking'])}, SELL coins: {len(status['sell_coins_tracking'])}")
-            logging.info(f"BUY tracking: {status['buy_coins_tracking']}")
-            logging.info(f"SELL tracking: {status['sell_coins_tracking']}")
-            
-            self.current_status = status
-            self.last_updated = datetime.now()
-            return status
+        status = self._default_status()
+        # Demo mode with sample data
+        status.update({
+            'buy_coins_tracking': [
+                {'symbol': 'AVAUSDT', 'entry': 0.5615, 'added': '2025-08-05 16:07:50'},
+                {'symbol': 'STEEMUSDT', 'entry': 0.1343, 'added': '2025-08-05 16:08:15'}
+            ],
+            'sell_coins_tracking': [
+                {'symbol': 'ZECUSDT', 'entry': 36.19, 'added': '2025-08-05 16:13:59'}
+            ],
+            'buy_success_count': 2,
+            'buy_stop_loss_count': 1,
+            'sell_success_count': 1,
+            'sell_stop_loss_count': 0,
+            'live_trade_success_count': 3,
+            'live_trade_failure_count': 1,
+            'api_calls_enabled': False,
+            'current_time': datetime.now().strftime('%A %Y-%m-%d %H:%M:%S'),
+            'next_weekly_reset': 'Monday 2025-08-11 05:30:00 IST',
+            'mode': 'Live'
+        })
         
-        try:
-            # Parse log content (simulate real log parsing)
-            lines = log_content.split('\n')
-            current_section = None  # Track if we're in BUY or SELL section
-            
-            for i, line in enumerate(lines):
-                if 'BUY Coins Tracking:' in line:
-                    current_section = 'BUY'
-                    count = int(line.split(':')[1].strip())
-                    status['buy_coins_tracking'] = []
-                    
-                elif 'SELL Coins Tracking:' in line:
-                    current_section = 'SELL'
-                    count = int(line.split(':')[1].strip())
-                    status['sell_coins_tracking'] = []
-                    
-                elif 'BUY Success Count:' in line:
-                    status['buy_success_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'BUY Stop Loss Count:' in line:
-                    status['buy_stop_loss_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'SELL Success Count:' in line:
-                    status['sell_success_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'SELL Stop Loss Count:' in line:
-                    status['sell_stop_loss_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'Live Trade Success Count:' in line:
-                    status['live_trade_success_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'Live Trade Failure Count:' in line:
-                    status['live_trade_failure_count'] = int(line.split(':')[1].strip())
-                    
-                elif 'BUY Container Running:' in line:
-                    status['buy_container_running'] = 'True' in line
-                    
-                elif 'SELL Container Running:' in line:
-                    status['sell_container_running'] = 'True' in line
-                    
-                elif 'API Calls Enabled:' in line:
-                    status['api_calls_enabled'] = 'True' in line
-                    
-                elif 'Weekly Reset In Progress:' in line:
-                    status['weekly_reset_in_progress'] = 'True' in line
-                    
-                elif 'Current IST Time:' in line:
-                    status['current_time'] = line.split(':', 1)[1].strip()
-                    
-                elif 'Next Weekly Reset:' in line:
-                    status['next_weekly_reset'] = line.split(':', 1)[1].strip()
-                    
-                # Parse coin entries and track context
-                elif line.strip().startswith('-') and 'Entry' in line:
-                    # Parse coin tracking lines like:
-                    # -   BABYUSDT: Entry 0.06034 (Added: 2025-08-05 16:07:50)
-                    parts = line.strip()[1:].strip().split(':')
-                    if len(parts) >= 2:
-                        symbol = parts[0].strip()
-                        entry_part = parts[1].strip()
-                        
-                        # Extract entry price and added time
-                        entry_price = 0.0
-                        added_time = ''
-                        
-                        if 'Entry' in entry_part:
-                            try:
-                                price_str = entry_part.split('Entry')[1].split('(')[0].strip()
-                                entry_price = float(price_str)
-                                
-                                # Extract added time
-                                if '(Added:' in entry_part:
-                                    added_time = entry_part.split('(Added:')[1].split(')')[0].strip()
-                                
-                                coin_data = {'symbol': symbol, 'entry': entry_price, 'added': added_time}
-                                
-                                # Use current section to determine where to add the coin
-                                if current_section == 'BUY':
-                                    status['buy_coins_tracking'].append(coin_data)
-                                elif current_section == 'SELL':
-                                    status['sell_coins_tracking'].append(coin_data)
-                                    
-                            except ValueError as e:
-                                logging.error(f"Error parsing coin entry: {e}")
-                                pass
-            
-            # Determine mode based on container status
-            if status['buy_container_running'] or status['sell_container_running']:
-                status['mode'] = 'Live'
-            else:
-                status['mode'] = 'Demo'
-                
-        except Exception as e:
-            logging.error(f"Error parsing trading status: {e}")
-            
+        # Debug logging
+        logging.info(f"Parsed trading status: BUY coins: {len(status['buy_coins_tracking'])}, SELL coins: {len(status['sell_coins_tracking'])}")
+        logging.info(f"BUY tracking: {status['buy_coins_tracking']}")
+        logging.info(f"SELL tracking: {status['sell_coins_tracking']}")
+        
+        self.last_line_count = 0
+        return self._publish(status)
+    
+    def parse_status_from_upload(self, lines, log_path):
+        """
+        Parse lines of an uploaded log as they are streamed to log_path, then
+        checkpoint the tail at its end so the file is not read again
+        """
+        with self._parse_lock:
+            status = self._default_status()
+            block = {'ts': None}
+            section, self.last_line_count = self._parse_lines(status, lines, block=block)
+            self._parse_state = {'status': status, 'section': section, 'block': block}
+            self._tail.mark_read(log_path, self._parse_state)
+            self._record_blocks()
+            return self._set_status(copy.deepcopy(status))
+    
+    def _refresh_from_log_file(self, log_path):
+        """Apply only the lines appended to the log file since the last read"""
+        with self._parse_lock:
+            return self._refresh_locked(log_path)
+    
+    def _refresh_locked(self, log_path):
+        # An upload handled by another worker checkpoints the new file with its
+        # parsed status; resume from that rather than from our in-memory state
+        if self._tail.reload_if_changed():
+            self._parse_state = None
+        
+        # Resume from the in-memory status, or from the one persisted with the
+        # checkpoint after a restart; without either the file is read in full
+        previous = self._parse_state or self._tail.state
+        if not previous:
+            self._tail.rewind()
+        
+        reset, lines = self._tail.read(log_path)
+        if reset or not previous:
+            status = self._default_status()
+            section = None
+            block = {'ts': None}
+        else:
+            status = previous['status']
+            section = previous['section']
+            block = previous.get('block') or {'ts': None}
+        
+        section, line_count = self._parse_lines(status, lines, section, block)
+        self._parse_state = {'status': status, 'section': section, 'block': block}
+        self._tail.commit(self._parse_state)
+        self.last_line_count = line_count
+        self._record_blocks()
+        
+        if line_count:
+            logging.info(f"Parsed {line_count} new lines from {log_path}")
+        return self._set_status(copy.deepcopy(status))
+    
+    @staticmethod
+    def _apply_mode(status):
+        """Determine mode based on container status"""
+        if status['buy_container_running'] or status['sell_container_running']:
+            status['mode'] = 'Live'
+        else:
+            status['mode'] = 'Demo'
+        return status
+    
+    def _set_status(self, status):
+        """Finalize and publish a parsed status"""
+        return self._publish(self._apply_mode(status))
+    
+    def _record_blocks(self):
+        """Write completed status blocks to the status history (needs an app context)"""
+        if not self.completed_blocks or not has_app_context():
+            return
+        from services.status_history import status_history
+        blocks, self.completed_blocks = self.completed_blocks, []
+        status_history.record(blocks)
+    
+    def _publish(self, status):
+        """Make a parsed status current here and in the shared snapshot"""
         self.current_status = status
         self.last_updated = datetime.now()
+        version = self._store.publish(status)
+        if version is not None:
+            self.status_version = version
         return status
     
-    def _read_log_file(self):
-        """Read log content from file"""
-        log_paths = [
-            './logs/strategy.log',
-            '/log/strategy.log',
-            './strategy.log'
-        ]
-        
-        for log_path in log_paths:
+    def _parse_lines(self, status, lines, current_section=None, block=None):
+        """
+        Feed log lines into the status state machine, returning (section, line count).
+        Each status block closed by the next status header is queued in
+        completed_blocks with its log time; block carries the open block's
+        log time from one call to the next.
+        """
+        block = block if block is not None else {'ts': None}
+        line_count = 0
+        for line in lines:
+            line_count += 1
             try:
-                if os.path.exists(log_path):
-                    with open(log_path, 'r') as f:
-                        content = f.read()
-                        logging.info(f"Successfully read log file from {log_path}")
-                        return content
+                token = tokenize(line)
+                if token.kind == 'status_header':
+                    if block['ts']:
+                        recorded_at = datetime.strptime(block['ts'], '%Y-%m-%d %H:%M:%S')
+                        self.completed_blocks.append((recorded_at, self._apply_mode(copy.deepcopy(status))))
+                    block['ts'] = None
+                elif block['ts'] is None and token.kind in ('status', 'coin'):
+                    block['ts'] = token.log_ts or (token.docker_ts and f"{token.docker_ts[:10]} {token.docker_ts[11:19]}")
+                current_section = self._parse_line(status, token, current_section)
             except Exception as e:
-                logging.error(f"Error reading log file {log_path}: {e}")
-                continue
+                logging.error(f"Error parsing trading status line: {e}")
+        return current_section, line_count
+    
+    def _parse_line(self, status, token, current_section):
+        """Apply one tokenized log line to status; current_section tracks BUY or SELL coin lists"""
+        if token.kind == 'status':
+            if token.field == 'buy_coins_tracking':
+                current_section = 'BUY'
+                status['buy_coins_tracking'] = []
+            elif token.field == 'sell_coins_tracking':
+                current_section = 'SELL'
+                status['sell_coins_tracking'] = []
+            elif token.field in status and token.value is not None:
+                status[token.field] = token.value
+                
+        # Coin tracking lines like:
+        # -   BABYUSDT: Entry 0.06034 (Added: 2025-08-05 16:07:50)
+        elif token.kind == 'coin':
+            # Use current section to determine where to add the coin
+            if current_section == 'BUY':
+                status['buy_coins_tracking'].append(token.value)
+            elif current_section == 'SELL':
+                status['sell_coins_tracking'].append(token.value)
         
-        logging.warning("No log file found, using simulated data")
+        return current_section
+    
+    def upload_path(self):
+        """Where an uploaded strategy log goes: the file ingestion tails"""
+        return self._find_log_file() or self.LOG_PATHS[0]
+    
+    def _find_log_file(self):
+        """Return the first existing strategy log path"""
+        for log_path in self.LOG_PATHS:
+            if os.path.exists(log_path):
+                return log_path
         return None
     
+    def empty_status(self):
+        """The status shown before any has been parsed"""
+        return self._apply_mode(self._default_status())
+    
     def get_current_status(self):
         """Get current trading status"""
-        if not self.current_status or not self.last_updated:
-            return self.parse_status_from_logs()
-        
-        # Refresh if data is older than 5 minutes
-        if (datetime.now() - self.last_updated).seconds > 300:
-            return self.parse_status_from_logs()
-            
+        # Serve the shared snapshot kept fresh by the ingestion worker, even
+        # when stale: only the ingestion worker parses the log, and its lag
+        # is reported by /api/ingestion-status
+        snapshot = self._store.read()
+        if snapshot is None:
+            return self.current_status or self.empty_status()
+        if snapshot.version != self.status_version or not self.current_status:
+            self.current_status = snapshot.data
+            self.status_version = snapshot.version
+        self.last_updated = datetime.fromtimestamp(snapshot.updated_at)
         return self.current_status
     
-    def get_mode_indicator(self):
+    def get_mode_indicator(self, status=None):
         """Get trading mode with color indicator"""
-        status = self.get_current_status()
+        status = status or self.get_current_status()
         mode = status.get('mode', 'Demo')
         
         if mode == 'Live':
@@ -220,9 +286,9 @@ class TradingStatusService:
                 'status': 'Simulation'
             }
     
-    def get_container_status_summary(self):
+    def get_container_status_summary(self, status=None):
         """Get container status summary"""
-        status = self.get_current_status()
+        status = status or self.get_current_status()
         
         buy_running = status.get('buy_container_running', False)
         sell_running = status.get('sell_container_running', False)
@@ -240,9 +306,9 @@ class TradingStatusService:
             }
         }
     
-    def get_trading_counts(self):
+    def get_trading_counts(self, status=None):
         """Get formatted trading counts"""
-        status = self.get_current_status()
+        status = status or self.get_current_status()
         
         return {
             'demo_counts': {
@@ -256,17 +322,3 @@ class TradingStatusService:
                 'failure': status.get('live_trade_failure_count', 0)
             }
         }
-    
-    def _determine_tracking_context(self, lines, current_index):
-        """Determine if we're in BUY or SELL tracking context by looking at previous lines"""
-        # Look backwards from current line to find the most recent context
-        for i in range(current_index - 1, max(0, current_index - 10), -1):
-            if i < len(lines):
-                line = lines[i]
-                if 'BUY Coins Tracking:' in line:
-                    return 'BUY'
-                elif 'SELL Coins Tracking:' in line:
-                    return 'SELL'
-        
-        # Default to BUY if no context found
-        return 'BUY'
\ No newline at end of file
@@ -33,9 +33,11 @@ def initialize_database():
 
 def check_docker_containers():
     """Check if required Docker containers are available"""
-    import docker
+    from services.docker_client import docker_clients
     try:
-        client = docker.from_env()
+        client = docker_clients.get()
+        if client is None:
+            raise RuntimeError("Docker daemon is not reachable")
         required_containers = [
             'Yuva_Positions_trading_bot',
             'Shan_Positions_trading_bot', 
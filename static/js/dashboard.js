@@ -9,8 +9,10 @@ document.addEventListener('DOMContentLoaded', function() {
     updateCurrentTime();
     setInterval(updateCurrentTime, 1000);
     
-    // Auto-refresh data every 30 seconds
-    refreshInterval = setInterval(refreshData, 30000);
+    // Live updates are pushed over SSE; fall back to polling without EventSource
+    if (!initializeSSE()) {
+        refreshInterval = setInterval(refreshData, 30000);
+    }
     
     // Initialize tooltips
     var tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
@@ -50,12 +52,10 @@ async function refreshData() {
         const result = await response.json();
         
         if (result.status === 'success') {
-            // Reload the page to update all data
-            setTimeout(() => {
-                window.location.reload();
-            }, 1000);
-            
+            // Reload the page to update all data once the ingestion cycle has run
+            await waitForIngestion(result.request);
             showNotification('Data refreshed successfully', 'success');
+            window.location.reload();
         } else {
             showNotification('Failed to refresh data: ' + result.message, 'error');
         }
@@ -67,6 +67,21 @@ async function refreshData() {
     }
 }
 
+// Resolve once the ingestion cycle serving a refresh request has finished (or after timeoutMs)
+async function waitForIngestion(request, timeoutMs = 60000) {
+    const deadline = Date.now() + timeoutMs;
+    while (request != null && Date.now() < deadline) {
+        try {
+            const response = await fetch('/api/ingestion-status');
+            const stats = await response.json();
+            if (stats.served >= request) return;
+        } catch (error) {
+            console.error('Error checking ingestion status:', error);
+        }
+        await new Promise(resolve => setTimeout(resolve, 500));
+    }
+}
+
 // Show loading state
 function showLoadingState() {
     const refreshBtn = document.querySelector('button[onclick="refreshData()"]');
@@ -299,37 +314,141 @@ function calculateProfitFactor(profits, losses) {
     return profits / losses;
 }
 
-// Real-time updates using Server-Sent Events (if implemented)
+// Real-time updates using Server-Sent Events
 function initializeSSE() {
-    if (typeof(EventSource) !== "undefined") {
-        const source = new EventSource("/api/stream");
-        
-        source.onmessage = function(event) {
-            const data = JSON.parse(event.data);
-            handleRealtimeUpdate(data);
-        };
-        
-        source.onerror = function(event) {
-            console.error("SSE connection error:", event);
-        };
+    if (typeof(EventSource) === "undefined") {
+        return false;
     }
+    
+    const source = new EventSource("/api/stream");
+    
+    source.addEventListener('status', event => applyStatusDelta(JSON.parse(event.data)));
+    source.addEventListener('positions', event => applyPositionsDelta(JSON.parse(event.data)));
+    source.addEventListener('containers', event => applyContainersDelta(JSON.parse(event.data)));
+    source.addEventListener('log', event => appendLogEntry(JSON.parse(event.data)));
+    source.addEventListener('resync', () => {
+        // The server dropped us for falling behind; reload once to resync
+        source.close();
+        window.location.reload();
+    });
+    
+    source.onerror = function(event) {
+        // EventSource reconnects on its own using the server's retry hint,
+        // except after an error response (503 when the server is at its stream limit)
+        console.error("SSE connection error:", event);
+        if (source.readyState === EventSource.CLOSED && !refreshInterval) {
+            refreshInterval = setInterval(refreshData, 30000);
+        }
+    };
+    
+    return true;
+}
+
+// Patch status counters tagged with data-live="status.<key>"
+function applyStatusDelta(delta) {
+    Object.entries(delta.changed).forEach(([key, value]) => {
+        document.querySelectorAll(`[data-live="status.${key}"]`).forEach(element => {
+            element.textContent = value;
+        });
+    });
 }
 
-// Handle real-time updates
-function handleRealtimeUpdate(data) {
-    switch(data.type) {
-        case 'container_status':
-            updateContainerStatus();
-            break;
-        case 'trading_stats':
-            updateTradingStats();
-            break;
-        case 'new_trade':
-            showNotification(`New trade: ${data.symbol} ${data.side}`, 'info');
-            break;
-        default:
-            console.log('Unknown update type:', data.type);
+// Patch P&L of open positions in place; add or remove rows as positions open or close
+function applyPositionsDelta(delta) {
+    const tbody = document.getElementById('positions-body');
+    if (!tbody) return;
+    
+    delta.removed.forEach(id => {
+        const row = tbody.querySelector(`tr[data-position-id="${id}"]`);
+        if (row) row.remove();
+    });
+    
+    Object.entries(delta.changed).forEach(([id, position]) => {
+        let row = tbody.querySelector(`tr[data-position-id="${id}"]`);
+        if (!row) {
+            row = createPositionRow(id, position);
+            tbody.prepend(row);
+        }
+        const pnlElement = row.querySelector('[data-field="pnl"]');
+        if (pnlElement) {
+            const pnl = position.pnl || 0;
+            pnlElement.className = pnl >= 0 ? 'pnl-positive' : 'pnl-negative';
+            pnlElement.textContent = (pnl >= 0 ? '+' : '') + formatCurrency(pnl);
+        }
+    });
+}
+
+// Escape a value for interpolation into HTML markup
+function escapeHtml(value) {
+    return String(value ?? '').replace(/[&<>"']/g, char => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[char]);
+}
+
+// Build a table row for a position opened after the page was rendered
+function createPositionRow(id, position) {
+    const symbol = escapeHtml(position.symbol);
+    const side = escapeHtml(position.side);
+    const row = document.createElement('tr');
+    row.setAttribute('data-position-id', id);
+    row.innerHTML = `
+        <td>
+            <div class="d-flex align-items-center">
+                <div class="symbol-badge me-3">${escapeHtml(String(position.symbol).substring(0, 3))}</div>
+                <div>
+                    <div class="fw-bold text-white">${escapeHtml(position.coin_name || position.symbol)}</div>
+                    <div class="small text-muted">${symbol} • ${side} Position</div>
+                </div>
+            </div>
+        </td>
+        <td><span class="trader-badge">${escapeHtml(position.user)}</span></td>
+        <td><span class="status-badge status-${side.toLowerCase()}">${side}</span></td>
+        <td><div class="price-display text-white">${formatCurrency(position.entry_price, 4)}</div></td>
+        <td><div class="size-display">${formatNumber(position.position_size)}</div></td>
+        <td><span data-field="pnl"></span></td>
+        <td><span class="status-badge status-open">OPEN</span></td>
+        <td><div class="time-display">${escapeHtml(position.created_at)}</div></td>
+    `;
+    return row;
+}
+
+// Patch container badges tagged with data-container="<name>"
+function applyContainersDelta(delta) {
+    Object.entries(delta.changed).forEach(([name, container]) => {
+        document.querySelectorAll(`[data-container="${CSS.escape(name)}"]`).forEach(badge => {
+            const state = container.running ? 'running' : 'stopped';
+            badge.classList.remove('badge-running', 'badge-stopped');
+            badge.classList.add(`badge-${state}`);
+            badge.innerHTML = `<span class="status-indicator status-${state}"></span> ${escapeHtml(container.status)}`;
+        });
+    });
+}
+
+// Append a new log-reader entry to the live log panel
+function appendLogEntry(log) {
+    const logsContainer = document.getElementById('container-logs');
+    if (!logsContainer) return;
+    
+    const logDiv = document.createElement('div');
+    logDiv.className = 'mb-1 log-entry';
+    logDiv.setAttribute('data-type', log.type || 'general');
+    
+    const timestamp = document.createElement('span');
+    timestamp.className = 'text-muted';
+    timestamp.textContent = log.timestamp ? log.timestamp.substring(0, 19) : '';
+    
+    const message = document.createElement('span');
+    message.className = log.level === 'warning' ? 'text-warning' : (log.level === 'success' ? 'text-success' : 'text-light');
+    message.textContent = log.message || log.raw_message || '';
+    
+    logDiv.append(timestamp, ' - ', message);
+    logsContainer.appendChild(logDiv);
+    
+    // Keep the panel bounded
+    while (logsContainer.children.length > 200) {
+        logsContainer.removeChild(logsContainer.firstChild);
     }
+    logsContainer.scrollTop = logsContainer.scrollHeight;
 }
 
 // Export functions for use in other scripts
@@ -39,7 +39,7 @@ source venv/bin/activate
 # Install Python dependencies
 echo "📦 Installing Python packages..."
 pip install --upgrade pip
-pip install flask flask-sqlalchemy gunicorn docker python-dotenv sqlalchemy werkzeug
+pip install flask flask-sqlalchemy gunicorn numpy docker python-dotenv sqlalchemy werkzeug
 
 # Create systemd service file
 echo "⚙️ Creating systemd service..."